@@ -0,0 +1,42 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import User
+
+# Async versions of the JSON endpoints in views.py, routed instead of them
+# when ASYNC_VIEWS is set. Responses are identical.
+
+
+@csrf_exempt
+@login_required
+async def follow(request, pk):
+    """
+    Handle user follow/unfollow functionality.
+
+    :param request: The HTTP request objects containing user data.
+    :param pk (int): Primary key of the user to follow/unfollow.
+    :raises Http404: If the user with the specified pk doesn't exist.
+    :return: A JsonResponse Contains success/error message and updated followers count.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST request required."}, status=400)
+
+    # Validate current user
+    current = await request.auser()
+    user = await aget_object_or_404(User.objects.only("pk"), pk=pk)
+    if user.pk == current.pk:
+        return JsonResponse({"error": "You cannot follow yourself."}, status=400)
+
+    # Handle follow/unfollow action
+    if await user.followers.filter(pk=current.pk).aexists():
+        await user.followers.aremove(current)
+        message = "Unfollowed"
+    else:
+        await user.followers.aadd(current)
+        message = "Followed"
+
+    # Read back the counter maintained by the follow signal
+    followers = await User.objects.values_list("follower_count", flat=True).aget(pk=pk)
+    return JsonResponse({"message": message, "followers": followers}, status=200)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from accounts.suggestions import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute who to follow suggestions: users followed by the people "
+        "each user follows, ranked by how many of them do. Run it periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of users computed per query.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Number of suggestions stored per user.",
+        )
+
+    def handle(self, *args, **options):
+        stored = rebuild(options["batch_size"], options["limit"])
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} follow suggestions."))
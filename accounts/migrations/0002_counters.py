@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-18 18:01
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, column):
+    rows = (
+        model.objects.filter(**{column: OuterRef("pk")})
+        .order_by()
+        .values(column)
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    User = apps.get_model("accounts", "User")
+    User.objects.update(
+        follower_count=count_of(User.followers.through, "from_user"),
+        following_count=count_of(User.followers.through, "to_user"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="follower_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="photo_digest",
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 18:27
+
+import accounts.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_photo_digest"),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name="user",
+            managers=[
+                ("objects", accounts.models.ProfileManager()),
+            ],
+        ),
+    ]
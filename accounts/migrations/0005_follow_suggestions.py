@@ -0,0 +1,72 @@
+# Generated by Django 5.2 on 2026-10-18 18:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0004_user_queryset"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FollowSuggestion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("mutual_count", models.PositiveIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "suggested",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="follow_suggestions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["user", "-mutual_count", "suggested"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-mutual_count", "suggested"],
+                        name="follow_suggestion_rank_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "suggested"), name="unique_follow_suggestion"
+                    )
+                ],
+            },
+        ),
+        # Followers and following lists, most recent follows first
+        migrations.RunSQL(
+            "CREATE INDEX accounts_user_followers_from_recent_idx "
+            "ON accounts_user_followers (from_user_id, id)",
+            "DROP INDEX accounts_user_followers_from_recent_idx",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX accounts_user_followers_to_recent_idx "
+            "ON accounts_user_followers (to_user_id, id)",
+            "DROP INDEX accounts_user_followers_to_recent_idx",
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0005_follow_suggestions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
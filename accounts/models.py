@@ -1,22 +1,104 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models import Exists, OuterRef, Value
+
+from hub import images
+
+
+# Reusable query building blocks for user profiles
+class UserQuerySet(models.QuerySet):
+    def with_follow_state(self, user):
+        """
+        Annotate ``is_following`` telling whether ``user`` follows each user.
+
+        The check is a correlated EXISTS on the followers through table, so
+        the follower list is never loaded no matter how long it is.
+
+        :param user: The requesting user, possibly anonymous.
+        :return: QuerySet annotated with a boolean ``is_following``.
+        """
+        if not user.is_authenticated:
+            return self.annotate(is_following=Value(False))
+        follows = self.model.followers.through.objects.filter(
+            from_user=OuterRef("pk"), to_user=user
+        )
+        return self.annotate(is_following=Exists(follows))
+
+
+# Default user manager with the profile queries, named for migrations
+class ProfileManager(UserManager.from_queryset(UserQuerySet)):
+    pass
 
 
 # User entity
 class User(AbstractUser):
     photo = models.ImageField(blank=True, upload_to="media")
+    photo_digest = models.CharField(max_length=32, blank=True, editable=False)
     followers = models.ManyToManyField(
         "self", symmetrical=False, related_name="following", blank=True
     )
+    follower_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped by profile edits, follows and project deletions
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ProfileManager()
 
     def serializer(self):
         return {
             "id": self.id,
             "username": self.username,
             "photo": self.photo,
-            "followers": self.followers.count(),
-            "following": self.following.count(),
+            "followers": self.follower_count,
+            "following": self.following_count,
         }
 
+    def summary(self):
+        return {"id": self.id, "username": self.username, "photo": self.photo_url(64)}
+
+    # Resized renditions of the photo, None until they are rendered
+    @property
+    def photo_derivatives(self):
+        if self.photo and self.photo_digest:
+            return images.Derivatives(images.AVATAR, self.photo_digest)
+        return None
+
+    def photo_url(self, width):
+        if self.photo_derivatives:
+            return self.photo_derivatives.url(width)
+        return self.photo.url if self.photo else None
+
     def is_valid_follower(self):
         return not self.following.filter(pk=self.pk).exists()
+
+
+# A row (from_user, to_user) means to_user follows from_user
+Follow = User.followers.through
+
+
+# Friend of friends suggested by the suggest_follows command
+class FollowSuggestion(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="follow_suggestions"
+    )
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    # Number of users followed by user who follow suggested
+    mutual_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["user", "-mutual_count", "suggested"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "suggested"], name="unique_follow_suggestion"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-mutual_count", "suggested"],
+                name="follow_suggestion_rank_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.suggested.username} suggested to {self.user.username}"
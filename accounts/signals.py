@@ -0,0 +1,15 @@
+from hub.counters import M2MCounter
+
+from .models import User
+
+
+# A row (from_user, to_user) means to_user follows from_user. The feed doesn't
+# show follows, the dashboard reads the counters in its version stamps.
+follow_counter = M2MCounter(
+    User.followers.field,
+    source_counter="follower_count",
+    target_counter="following_count",
+    stamp=False,
+)
+
+follow_counter.connect()
@@ -0,0 +1,92 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+
+from .models import Follow, FollowSuggestion, User
+
+
+def friends_of_friends(user_ids, limit=20):
+    """
+    Rank the users followed by the people each user follows.
+
+    One grouped self-join counts, for every user of the batch, how many of
+    the people they follow follow each candidate. Candidates the user
+    already follows, and the user themselves, are dropped.
+
+    :param user_ids: Primary keys of the users to compute suggestions for.
+    :param limit (int): Suggestions kept per user.
+    :return: Dictionary mapping user ids to lists of (suggested id, mutual
+        count), best first.
+    """
+    # (user, candidate, mutual): user follows someone who follows candidate
+    rows = (
+        User.objects.filter(followers__followers__in=user_ids)
+        .values_list("followers__followers", "pk")
+        .annotate(mutual=Count("*"))
+        .order_by()
+    )
+    followed = set(
+        Follow.objects.filter(to_user__in=user_ids).values_list(
+            "to_user_id", "from_user_id"
+        )
+    )
+
+    candidates = defaultdict(list)
+    for user_id, candidate_id, mutual in rows:
+        if candidate_id != user_id and (user_id, candidate_id) not in followed:
+            candidates[user_id].append((-mutual, candidate_id))
+    return {
+        user_id: [
+            (candidate_id, -rank) for rank, candidate_id in sorted(ranked)[:limit]
+        ]
+        for user_id, ranked in candidates.items()
+    }
+
+
+def rebuild(batch_size=500, limit=20):
+    """
+    Replace every user's stored follow suggestions.
+
+    Users are processed in batches of primary keys, each batch swapped in
+    its own transaction so readers never see a half written list.
+
+    :param batch_size (int): Users computed per self-join.
+    :param limit (int): Suggestions kept per user.
+    :return: Number of suggestions stored.
+    """
+    stored = 0
+    user_ids = list(User.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start : start + batch_size]
+        ranked = friends_of_friends(batch, limit)
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(user__in=batch).delete()
+            created = FollowSuggestion.objects.bulk_create(
+                FollowSuggestion(
+                    user_id=user_id, suggested_id=suggested_id, mutual_count=mutual
+                )
+                for user_id, suggestions in ranked.items()
+                for suggested_id, mutual in suggestions
+            )
+        stored += len(created)
+    return stored
+
+
+def suggestions_for(user, limit=10):
+    """
+    Return the stored suggestions of ``user``, best first.
+
+    Users followed since the last rebuild are skipped.
+
+    :param user: The requesting user.
+    :param limit (int): Maximum number of suggestions.
+    :return: List of FollowSuggestion with ``suggested`` joined in.
+    """
+    follows = Follow.objects.filter(from_user=OuterRef("suggested"), to_user=user)
+    return list(
+        FollowSuggestion.objects.filter(user=user)
+        .filter(~Exists(follows))
+        .select_related("suggested")
+        .order_by("-mutual_count", "suggested")[:limit]
+    )
@@ -0,0 +1,16 @@
+from hub import images
+from jobs.queue import register
+
+from .models import User
+
+
+@register
+def render_photo(user_id):
+    """
+    Render the avatar renditions of a user's photo.
+
+    :param user_id (int): Primary key of the user, gone users are skipped.
+    """
+    user = User.objects.filter(pk=user_id).only("pk", "photo").first()
+    if user is not None:
+        images.derive(user, "photo", images.AVATAR)
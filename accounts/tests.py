@@ -1,6 +1,17 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from io import BytesIO, StringIO
 
-from .models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from . import async_views, suggestions
+from .models import FollowSuggestion, User
+from projects.models import Project
 
 
 class UserTestCase(TestCase):
@@ -24,3 +35,274 @@ class UserTestCase(TestCase):
         """User is following themselves, should be invalid."""
         user = User.objects.get(username="foo")
         self.assertFalse(user.is_valid_follower())
+
+    def test_follow_counters(self):
+        """Following updates both follower and following counters."""
+        foo = User.objects.get(username="foo")
+        bar = User.objects.get(username="bar")
+        baz = User.objects.get(username="baz")
+        self.assertEqual(bar.follower_count, 1)
+        self.assertEqual(baz.following_count, 1)
+
+        foo.followers.add(bar, baz)
+        bar.following.remove(foo)
+        foo.refresh_from_db()
+        baz.refresh_from_db()
+        self.assertEqual(foo.follower_count, 2)
+        self.assertEqual(baz.following_count, 2)
+        self.assertEqual(foo.serializer()["followers"], 2)
+
+
+class DashboardTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username="owner")
+        self.visitor = User.objects.create(username="visitor")
+        self.client.force_login(self.visitor)
+
+    def dashboard(self, **params):
+        return self.client.get(reverse("accounts:dashboard", args=["owner"]), params)
+
+    def test_follow_state(self):
+        """The follow button reflects an EXISTS check on the followers."""
+        self.owner.followers.add(
+            *[User.objects.create(username=f"fan{i}") for i in range(5)]
+        )
+        self.assertFalse(self.dashboard().context["is_following"])
+
+        self.owner.followers.add(self.visitor)
+        response = self.dashboard()
+        self.assertTrue(response.context["is_following"])
+        self.assertEqual(response.context["profile"]["followers"], 6)
+        self.assertContains(response, "Unfollow")
+
+    def test_not_modified(self):
+        """Repeat visits get a 304 until the profile or its projects change."""
+        url = reverse("accounts:dashboard", args=["owner"])
+        project = Project.objects.create(owner=self.owner, title="P")
+        etag = self.dashboard()["ETag"]
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        for change in (
+            lambda: self.owner.followers.add(self.visitor),
+            lambda: self.owner.following.add(self.visitor),
+            lambda: project.viewers.add(self.visitor),
+            lambda: project.stars.add(self.visitor),
+            project.delete,
+        ):
+            change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+
+    def test_constant_queries(self):
+        """
+        Session, user, version stamps, profile and one page of projects,
+        however many.
+        """
+        for count in (1, 30):
+            Project.objects.bulk_create(
+                Project(owner=self.owner, title=f"P{i}") for i in range(count)
+            )
+            self.owner.followers.add(self.visitor)
+            with self.assertNumQueries(5):
+                self.dashboard()
+
+    def test_paginated(self):
+        """Projects are shown 20 at a time, newest first."""
+        for i in range(25):
+            Project.objects.create(owner=self.owner, title=f"P{i}")
+        page = self.dashboard().context["page_obj"]
+        self.assertEqual(len(page), 20)
+        self.assertEqual(page[0].title, "P24")
+
+        page = self.dashboard(cursor=page.next_cursor).context["page_obj"]
+        self.assertEqual([p.title for p in page], ["P4", "P3", "P2", "P1", "P0"])
+        self.assertFalse(page.has_next())
+
+    def test_visitor_cannot_edit(self):
+        Project.objects.create(owner=self.owner, title="P")
+        self.assertNotContains(self.dashboard(), "visibility-select")
+        self.client.force_login(self.owner)
+        self.assertContains(self.dashboard(), "visibility-select")
+
+
+class FollowListTestCase(TestCase):
+    def setUp(self):
+        self.star = User.objects.create(username="star")
+        self.fans = [User.objects.create(username=f"fan{i}") for i in range(5)]
+        for fan in self.fans:
+            self.star.followers.add(fan)
+        self.client.force_login(self.fans[0])
+
+    def test_followers_pages(self):
+        """Followers come newest follow first, a cursor at a time."""
+        url = reverse("accounts:followers", args=[self.star.pk])
+        data = self.client.get(url, {"limit": 3}).json()
+        self.assertEqual(
+            [user["username"] for user in data["users"]], ["fan4", "fan3", "fan2"]
+        )
+        data = self.client.get(url, {"limit": 3, "cursor": data["next"]}).json()
+        self.assertEqual([user["username"] for user in data["users"]], ["fan1", "fan0"])
+        self.assertIsNone(data["next"])
+
+    def test_following(self):
+        url = reverse("accounts:following", args=[self.fans[0].pk])
+        data = self.client.get(url).json()
+        self.assertEqual(data["users"], [self.star.summary()])
+
+    def test_bad_limit(self):
+        url = reverse("accounts:followers", args=[self.star.pk])
+        self.assertEqual(self.client.get(url, {"limit": "x"}).status_code, 400)
+
+    def test_toggle_single_lookup(self):
+        """Toggling a follow never loads the follower list."""
+        url = reverse("accounts:follow", args=[self.star.pk])
+        with self.assertNumQueries(10):
+            data = self.client.post(url).json()
+        self.assertEqual(data, {"message": "Unfollowed", "followers": 4})
+
+
+class SuggestionTestCase(TestCase):
+    def setUp(self):
+        # reader follows a and b, a and b both follow c, b follows d
+        self.reader, self.a, self.b, self.c, self.d = [
+            User.objects.create(username=name)
+            for name in ("reader", "a", "b", "c", "d")
+        ]
+        self.a.followers.add(self.reader)
+        self.b.followers.add(self.reader)
+        self.c.followers.add(self.a, self.b)
+        self.d.followers.add(self.b)
+        # b follows reader back, who must not be suggested to themselves
+        self.reader.followers.add(self.b)
+
+    def test_ranked_by_mutuals(self):
+        ranked = suggestions.friends_of_friends([self.reader.pk])
+        self.assertEqual(ranked[self.reader.pk], [(self.c.pk, 2), (self.d.pk, 1)])
+
+    def test_rebuild_replaces(self):
+        """The command swaps in fresh suggestions for every user."""
+        FollowSuggestion.objects.create(
+            user=self.reader, suggested=self.a, mutual_count=9
+        )
+        call_command("suggest_follows", batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            list(
+                FollowSuggestion.objects.filter(user=self.reader).values_list(
+                    "suggested__username", "mutual_count"
+                )
+            ),
+            [("c", 2), ("d", 1)],
+        )
+        # a follows c, who follows nobody, and b follows reader who follows a
+        self.assertEqual(
+            list(
+                FollowSuggestion.objects.filter(user=self.b).values_list(
+                    "suggested__username", flat=True
+                )
+            ),
+            ["a"],
+        )
+
+    def test_endpoint_skips_followed(self):
+        """Users followed since the last rebuild are not suggested again."""
+        suggestions.rebuild()
+        self.client.force_login(self.reader)
+        url = reverse("accounts:suggestions")
+        self.assertEqual(
+            self.client.get(url).json()["users"],
+            [{**self.c.summary(), "mutual": 2}, {**self.d.summary(), "mutual": 1}],
+        )
+
+        self.c.followers.add(self.reader)
+        users = self.client.get(url).json()["users"]
+        self.assertEqual([user["username"] for user in users], ["d"])
+
+        response = self.client.get(reverse("projects:timeline"))
+        self.assertContains(response, "Who to follow")
+
+
+def jpeg(size=(64, 64), **options):
+    buffer = BytesIO()
+    Image.new("RGB", size, "orange").save(buffer, format="JPEG", **options)
+    return buffer.getvalue()
+
+
+class PhotoUploadTestCase(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create(username="foo")
+        self.client.force_login(self.user)
+
+    def upload(self, content, name="photo.jpg"):
+        return self.client.post(
+            reverse("accounts:update_photo"),
+            {"photo": SimpleUploadedFile(name, content)},
+        )
+
+    def test_metadata_stripped(self):
+        """Photos are re-encoded without EXIF and rendered to avatars."""
+        exif = Image.Exif()
+        exif[0x010F] = "Camera maker"
+        response = self.upload(jpeg(exif=exif.tobytes()))
+        self.assertEqual(response.status_code, 200)
+
+        self.user.refresh_from_db()
+        with Image.open(self.user.photo.path) as image:
+            self.assertEqual(image.format, "JPEG")
+            self.assertNotIn("exif", image.info)
+        self.assertTrue(self.user.photo_digest)
+
+    def test_format_sniffed(self):
+        """The content decides the format, not the file name."""
+        response = self.upload(b"<?php echo 'hello'; ?>", name="photo.png")
+        self.assertEqual(response.json(), {"error": "Unsupported file."})
+
+        png = BytesIO()
+        Image.new("RGBA", (8, 8)).save(png, format="PNG")
+        response = self.upload(png.getvalue(), name="photo.jpg")
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.photo.name.endswith(".png"))
+
+    @override_settings(MAX_UPLOAD_SIZE=1024)
+    def test_too_large(self):
+        """Reading stops once a file passes the size limit."""
+        response = self.upload(jpeg(size=(512, 512), quality=100))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("larger than", response.json()["error"])
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.photo)
+
+    @override_settings(MAX_IMAGE_PIXELS=100 * 100)
+    def test_too_many_pixels(self):
+        """Images declaring too many pixels are refused before decoding."""
+        response = self.upload(jpeg(size=(101, 100)))
+        self.assertEqual(response.json(), {"error": "Image dimensions are too large."})
+
+
+class AsyncFollowTestCase(TestCase):
+    async def test_follow(self):
+        """The async endpoint toggles following and reports the counter."""
+        star = await User.objects.acreate(username="star")
+        fan = await User.objects.acreate(username="fan")
+        request = AsyncRequestFactory().post("/")
+
+        async def auser():
+            return fan
+
+        request.user, request.auser = fan, auser
+        response = await async_views.follow(request, star.pk)
+        self.assertEqual(
+            json.loads(response.content), {"message": "Followed", "followers": 1}
+        )
+        response = await async_views.follow(request, star.pk)
+        self.assertEqual(
+            json.loads(response.content), {"message": "Unfollowed", "followers": 0}
+        )
@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 app_name = "accounts"
 
+# Frequent JSON endpoints have async versions for ASGI deployments
+api = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
     path("login/", views.login_view, name="login"),
     path("logout/", views.logout_view, name="logout"),
@@ -11,5 +15,8 @@ urlpatterns = [
     # API Routes
     path("user/<str:username>/dashboard/", views.dashboard, name="dashboard"),
     path("user/update_photo/", views.update_photo, name="update_photo"),
-    path("user/<int:pk>/follow/", views.follow, name="follow"),
+    path("user/<int:pk>/follow/", api.follow, name="follow"),
+    path("user/<int:pk>/followers/", views.followers, name="followers"),
+    path("user/<int:pk>/following/", views.following, name="following"),
+    path("user/suggestions/", views.suggestions, name="suggestions"),
 ]
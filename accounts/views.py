@@ -1,16 +1,24 @@
 from django.shortcuts import get_object_or_404, render
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
 from django.db import IntegrityError
+from django.db.models import Max, Sum
 from django.http import HttpResponseRedirect, JsonResponse
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
 
+from hub import uploads
+from hub.conditional import versioned
+from hub.instrumentation import query_budget
 from projects.models import Project
+from projects.pagination import CursorPaginator
 
 
-from .models import User
+from . import tasks
+from .models import Follow, User
+from .suggestions import suggestions_for
 
 
 def login_view(request):
@@ -87,33 +95,56 @@ def register(request):
         return render(request, "accounts/register.html")
 
 
+def dashboard_versions(request, username):
+    # Follows and views leave updated_at alone, their counts are stamps of
+    # their own. The projects are read from one index range.
+    row = (
+        User.objects.filter(username=username)
+        .annotate(
+            projects_updated=Max("projects__updated_at"),
+            project_viewers=Sum("projects__viewer_count"),
+        )
+        .values_list(
+            "updated_at",
+            "follower_count",
+            "following_count",
+            "projects_updated",
+            "project_viewers",
+        )
+    )
+    return row.first()
+
+
+@query_budget(5)
 @login_required
+@versioned(dashboard_versions)
 def dashboard(request, username):
     """
-    Display user profile with their projects and following status.
+    Display user profile with a page of their projects and following status.
 
     :param request: The HTTP request object.
     :param username (string): Username of the profile to display.
     :raises Http404: If the user with the specified username doesn't exist.
     :return: Rendered dashboard template with user projects and profile data.
     """
-    # Get user object
-    user = get_object_or_404(User, username=username)
-
-    # Get user projects
-    projects = Project.objects.filter(owner=user)
+    # Get user object and whether the current user follows them
+    user = get_object_or_404(
+        User.objects.with_follow_state(request.user), username=username
+    )
 
-    # Check if the user already follow or not
-    is_following = request.user in user.followers.all()
+    # Get a page of user projects, their counters are columns of the rows
+    paginator = CursorPaginator(Project.objects.filter(owner=user), 20)
+    page_obj = paginator.get_page(request.GET.get("cursor"))
 
     # Render user dashboard
     return render(
         request,
         "accounts/dashboard.html",
         {
-            "projects": projects,
+            "page_obj": page_obj,
             "profile": user.serializer(),
-            "is_following": is_following,
+            "photo_derivatives": user.photo_derivatives,
+            "is_following": user.is_following,
         },
     )
 
@@ -125,28 +156,31 @@ def update_photo(request):
     Update the authenticated user's profile photo.
 
     :param request: The HTTP request object containing the uploaded image.
-    :raises OSError: If the uploaded file is not a valid image.
     :return: JsonResponse with success message and status 200 on success.
     :return: JsonResponse with error message and status 400 on failure.
     """
     if request.method != "POST":
         return JsonResponse({"error": "POST request is required."}, status=400)
 
+    # Files too large or not images are dropped while reading the request
+    if error := uploads.upload_error(request):
+        return JsonResponse({"error": error}, status=400)
+
     # Get the image file from the client-side
     image = request.FILES.get("photo")
     if not image:
         return JsonResponse({"error": "No image file provided."}, status=400)
 
-    # Save image if it's valid
+    # Save image if it's valid, re-encoded without its metadata
     try:
-        from PIL import Image
+        request.user.photo = uploads.clean_image(image)
+    except ValidationError as error:
+        return JsonResponse({"error": error.messages[0]}, status=400)
+    request.user.save()
 
-        with Image.open(image):
-            request.user.photo = image
-            request.user.save()
-            return JsonResponse({"message": "Image uploaded successfully."}, status=200)
-    except OSError:
-        return JsonResponse({"error": "Unsupported file."}, status=400)
+    # Render the resized avatars served in place of the upload, in the background
+    tasks.render_photo.enqueue(user_id=request.user.pk)
+    return JsonResponse({"message": "Image uploaded successfully."}, status=200)
 
 
 @csrf_exempt
@@ -168,15 +202,103 @@ def follow(request, pk):
     if user == request.user:
         return JsonResponse({"error": "You cannot follow yourself."}, status=400)
 
-    # Handle follow/unfollow action
-    if request.user in user.followers.all():
+    # Handle follow/unfollow action, one lookup on the unique follow index
+    if user.followers.filter(pk=request.user.pk).exists():
         user.followers.remove(request.user)
-        return JsonResponse(
-            {"message": "Unfollowed", "followers": user.followers.count()},
-            status=200,
-        )
+        message = "Unfollowed"
     else:
         user.followers.add(request.user)
-        return JsonResponse(
-            {"message": "Followed", "followers": user.followers.count()}, status=200
-        )
+        message = "Followed"
+
+    # Read back the counter maintained by the follow signal
+    user.refresh_from_db(fields=["follower_count"])
+    return JsonResponse(
+        {"message": message, "followers": user.follower_count}, status=200
+    )
+
+
+def follow_page(request, follows, side):
+    """
+    Build the JSON page of a followers or following list.
+
+    :param request: The HTTP request object, GET takes ``cursor`` and ``limit``.
+    :param follows: QuerySet of follow rows of the profile.
+    :param side (string): Follow row field holding the listed users.
+    :return: JsonResponse with a page of users and the next cursor.
+    :return: JsonResponse with error message on failure or other methods.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "GET request required."}, status=400)
+
+    # Let the client choose the page size within bounds
+    try:
+        limit = min(max(int(request.GET.get("limit", 20)), 1), 50)
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer."}, status=400)
+
+    # Most recent follows first, walking the (user, id) follow indexes
+    paginator = CursorPaginator(follows.select_related(side), limit, ordering=("-id",))
+    page_obj = paginator.get_page(request.GET.get("cursor"))
+    return JsonResponse(
+        {
+            "users": [getattr(follow, side).summary() for follow in page_obj],
+            "next": page_obj.next_cursor,
+        },
+        status=200,
+    )
+
+
+@login_required
+def followers(request, pk):
+    """
+    List the users following a specific user.
+
+    :param request: The HTTP request object, GET takes ``cursor`` and ``limit``.
+    :param pk (int): Primary key of the user.
+    :raises Http404: If the user doesn't exist.
+    :return: JsonResponse with a page of followers and the next cursor.
+    """
+    user = get_object_or_404(User.objects.only("pk"), pk=pk)
+    return follow_page(request, Follow.objects.filter(from_user=user), "to_user")
+
+
+@login_required
+def following(request, pk):
+    """
+    List the users a specific user follows.
+
+    :param request: The HTTP request object, GET takes ``cursor`` and ``limit``.
+    :param pk (int): Primary key of the user.
+    :raises Http404: If the user doesn't exist.
+    :return: JsonResponse with a page of followed users and the next cursor.
+    """
+    user = get_object_or_404(User.objects.only("pk"), pk=pk)
+    return follow_page(request, Follow.objects.filter(to_user=user), "from_user")
+
+
+@login_required
+def suggestions(request):
+    """
+    List who the current user could follow, from the precomputed suggestions.
+
+    :param request: The HTTP request object, GET takes ``limit``.
+    :return: JsonResponse with suggested users and their mutual follow count.
+    :return: JsonResponse with error message on failure or other methods.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "GET request required."}, status=400)
+
+    try:
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 20)
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer."}, status=400)
+
+    return JsonResponse(
+        {
+            "users": [
+                {**suggestion.suggested.summary(), "mutual": suggestion.mutual_count}
+                for suggestion in suggestions_for(request.user, limit)
+            ]
+        },
+        status=200,
+    )
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hub.settings")
 
 application = get_asgi_application()
+
+# Served processes write buffered project views from a background thread
+from projects.tracking import view_buffer  # noqa: E402
+
+view_buffer.start()
@@ -0,0 +1,140 @@
+from collections import Counter, defaultdict
+
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed
+
+from .conditional import touch
+
+
+def adjusted(counter, delta):
+    """
+    Build an F-expression that moves a counter column by ``delta``.
+
+    Decrements are clamped at zero so a drifted counter never violates the
+    unsigned column constraint, ``reconcile_counters`` repairs the drift.
+
+    :param counter (string): Name of the counter column.
+    :param delta (int): Amount to add, negative to subtract.
+    :return: Expression usable in ``QuerySet.update``.
+    """
+    if delta < 0:
+        return Greatest(F(counter) + delta, Value(0))
+    return F(counter) + delta
+
+
+class M2MCounter:
+    """
+    Keep denormalized counter columns in step with a many-to-many relation.
+
+    Every row added to or removed from the through table adjusts
+    ``source_counter`` on the model declaring the field and ``target_counter``
+    on the related model with a single F-expression UPDATE per distinct delta.
+    The same UPDATE bumps the model's ``auto_now`` columns, like ``save``,
+    unless ``stamp`` is False.
+
+    :param field: The ManyToManyField to track, e.g. ``Project.stars.field``.
+    :param source_counter (string): Counter column on the declaring model.
+    :param target_counter (string): Counter column on the related model.
+    :param condition: Q object on the declaring model, only rows whose source
+        object matches it are counted.
+    :param stamp (bool): Whether counting changes ``updated_at``, False for
+        counters the pages read directly in their version stamps, so they
+        don't make the feed and other pages look changed.
+    """
+
+    def __init__(
+        self,
+        field,
+        source_counter=None,
+        target_counter=None,
+        condition=None,
+        stamp=True,
+    ):
+        self.through = field.remote_field.through
+        self.source_model = field.model
+        self.target_model = field.related_model
+        self.source_column = field.m2m_column_name()
+        self.target_column = field.m2m_reverse_name()
+        self.source_counter = source_counter
+        self.target_counter = target_counter
+        self.condition = condition
+        self.stamp = stamp
+        self.key = f"_pending_{self.through._meta.db_table}"
+
+    def connect(self):
+        m2m_changed.connect(
+            self.changed, sender=self.through, dispatch_uid=self.key, weak=False
+        )
+
+    def increment(self, pairs):
+        """
+        Count newly inserted through rows.
+
+        :param pairs (list): (source pk, target pk) tuples that were added.
+        """
+        self._apply(pairs, 1)
+
+    def decrement(self, pairs):
+        """
+        Count deleted through rows.
+
+        :param pairs (list): (source pk, target pk) tuples that were removed.
+        """
+        self._apply(pairs, -1)
+
+    def changed(self, sender, instance, action, reverse, pk_set, **kwargs):
+        # Rows about to be removed are looked up first, the signal only
+        # carries the requested keys, not the ones that actually exist.
+        if action in ("pre_remove", "pre_clear"):
+            setattr(instance, self.key, self._existing(instance, reverse, pk_set))
+        elif action in ("post_remove", "post_clear"):
+            self.decrement(getattr(instance, self.key, []))
+            setattr(instance, self.key, [])
+        elif action == "post_add" and pk_set:
+            # Django only reports the keys it really inserted on post_add
+            if reverse:
+                self.increment([(pk, instance.pk) for pk in pk_set])
+            else:
+                self.increment([(instance.pk, pk) for pk in pk_set])
+
+    def _existing(self, instance, reverse, pk_set):
+        own, other = (
+            (self.target_column, self.source_column)
+            if reverse
+            else (self.source_column, self.target_column)
+        )
+        rows = self.through._default_manager.filter(**{own: instance.pk})
+        if pk_set is not None:
+            rows = rows.filter(**{f"{other}__in": pk_set})
+        pks = rows.values_list(other, flat=True)
+        if reverse:
+            return [(pk, instance.pk) for pk in pks]
+        return [(instance.pk, pk) for pk in pks]
+
+    def _apply(self, pairs, sign):
+        if pairs and self.condition is not None:
+            counted = set(
+                self.source_model._default_manager.filter(
+                    self.condition, pk__in={pair[0] for pair in pairs}
+                ).values_list("pk", flat=True)
+            )
+            pairs = [pair for pair in pairs if pair[0] in counted]
+        if not pairs:
+            return
+        for model, counter, index in (
+            (self.source_model, self.source_counter, 0),
+            (self.target_model, self.target_counter, 1),
+        ):
+            if counter is None:
+                continue
+
+            # Group objects by delta so each distinct delta is one UPDATE
+            by_delta = defaultdict(list)
+            for pk, total in Counter(pair[index] for pair in pairs).items():
+                by_delta[total * sign].append(pk)
+            stamps = touch(model) if self.stamp else {}
+            for delta, pks in by_delta.items():
+                model._default_manager.filter(pk__in=pks).update(
+                    **{counter: adjusted(counter, delta)}, **stamps
+                )
@@ -0,0 +1,158 @@
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .conditional import touch
+
+logger = logging.getLogger(__name__)
+
+# Encodings written for every rendition, browsers pick WebP when supported
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+
+
+# Fixed set of widths an image field is rendered at
+class Spec:
+    def __init__(self, name, widths, crop=False):
+        self.name = name
+        self.widths = tuple(sorted(widths))
+        self.crop = crop
+
+    def path(self, digest, width, extension):
+        return f"derivatives/{self.name}/{digest}-{width}.{extension}"
+
+
+# Square avatars, shown from 24px to 80px at 1x and 2x
+AVATAR = Spec("avatar", (48, 96, 160), crop=True)
+
+# Project previews, shown up to the width of the detail column
+PREVIEW = Spec("preview", (480, 960, 1600))
+
+
+class Derivatives:
+    """
+    URLs of the renditions of one image.
+
+    :param spec: The Spec the image was rendered with.
+    :param digest (string): Content hash of the original file.
+    """
+
+    def __init__(self, spec, digest):
+        self.spec = spec
+        self.digest = digest
+
+    def url(self, width, extension="jpeg"):
+        """
+        Return the smallest rendition at least ``width`` pixels wide.
+
+        :param width (int): Displayed width in device pixels.
+        :param extension (string): "webp" or "jpeg".
+        :return: URL of the rendition, the largest one if none is wide enough.
+        """
+        fitting = [w for w in self.spec.widths if w >= width] or [self.spec.widths[-1]]
+        return default_storage.url(self.spec.path(self.digest, fitting[0], extension))
+
+    def srcset(self, extension="jpeg"):
+        return ", ".join(
+            f"{default_storage.url(self.spec.path(self.digest, width, extension))} "
+            f"{width}w"
+            for width in self.spec.widths
+        )
+
+
+def resize(image, spec, width):
+    if spec.crop:
+        return ImageOps.fit(image, (width, width), Image.Resampling.LANCZOS)
+    resized = image.copy()
+    # Never upscale, tall images are bounded to four times the width
+    resized.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+    return resized
+
+
+def encode(image, extension):
+    if extension == "jpeg" and image.mode != "RGB":
+        # JPEG has no alpha channel, flatten onto white
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, **FORMATS[extension])
+    return buffer.getvalue()
+
+
+def render(field_file, spec, storage=None):
+    """
+    Write every rendition of an uploaded image.
+
+    Files are named after the hash of the original content, so they can be
+    cached forever and an unchanged image is never rendered twice.
+
+    :param field_file: FieldFile of the original image.
+    :param spec: The Spec to render.
+    :param storage: Storage to write to, the default storage when None.
+    :raises OSError: If the file can't be read or decoded as an image.
+    :return: Content hash identifying the renditions.
+    """
+    storage = storage or default_storage
+    with field_file.open("rb") as original:
+        data = original.read()
+    digest = hashlib.sha256(data).hexdigest()[:32]
+
+    missing = [
+        (width, extension)
+        for width in spec.widths
+        for extension in FORMATS
+        if not storage.exists(spec.path(digest, width, extension))
+    ]
+    if not missing:
+        return digest
+
+    with Image.open(BytesIO(data)) as image:
+        # Apply the camera rotation before EXIF is dropped by re-encoding
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        for width in sorted({width for width, _ in missing}):
+            resized = resize(image, spec, width)
+            for extension in FORMATS:
+                if (width, extension) in missing:
+                    storage.save(
+                        spec.path(digest, width, extension),
+                        ContentFile(encode(resized, extension)),
+                    )
+    return digest
+
+
+def derive(instance, field_name, spec):
+    """
+    Render an instance's image field and store the hash in ``<field>_digest``.
+
+    A missing or unreadable image clears the hash, templates then fall back
+    to the original file.
+
+    :param instance: Saved model instance.
+    :param field_name (string): Name of the ImageField.
+    :param spec: The Spec to render.
+    :return: The stored hash, empty when nothing was rendered.
+    """
+    field_file = getattr(instance, field_name)
+    digest = ""
+    if field_file:
+        try:
+            digest = render(field_file, spec)
+        except (OSError, Image.DecompressionBombError):
+            logger.warning(
+                "Cannot render %s of %r", field_name, instance, exc_info=True
+            )
+
+    digest_field = f"{field_name}_digest"
+    setattr(instance, digest_field, digest)
+    instance._meta.model._default_manager.filter(pk=instance.pk).update(
+        **{digest_field: digest}, **touch(instance._meta.model)
+    )
+    return digest
@@ -0,0 +1,192 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger("hub.queries")
+
+# Runs of placeholders, e.g. the values of an IN list, collapse to one
+PLACEHOLDERS = re.compile(r"%s(\s*,\s*%s)+")
+
+# Recorder of the request being handled, copied into sync_to_async threads
+current_recorder = ContextVar("current_recorder", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """
+    Declare the maximum number of queries a view should run.
+
+    The instrumentation middleware compares the recorded count with it and
+    warns or raises depending on ``QUERY_BUDGET_ACTION``.
+
+    :param limit (int): Number of queries allowed per request.
+    :return: Decorator marking the view, which is returned unchanged.
+    """
+
+    def decorator(view):
+        view.query_budget = limit
+        return view
+
+    return decorator
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting queries, their time and SQL shapes.
+
+    The SQL Django sends still has its parameters as placeholders, so two
+    queries with the same shape only differed by their values, the N+1
+    pattern when repeated in one request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[PLACEHOLDERS.sub("%s, ...", sql)] += 1
+
+    def repeated(self, threshold):
+        return {sql: n for sql, n in self.shapes.most_common() if n >= threshold}
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every connection, passing queries to the
+    recorder of the current request, if it is sampled.
+    """
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def instrument(connection, **kwargs):
+    """
+    Install ``record_query`` on a connection once, outermost so wrappers
+    pushed and popped by other code are left alone. Receiver of
+    ``connection_created``, which covers the connections of the threads
+    running an async view's queries.
+
+    :param connection: DatabaseWrapper to instrument.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record the queries of sampled requests.
+
+    Enabled by ``QUERY_INSTRUMENTATION``. A ``QUERY_SAMPLE_RATE`` share of
+    requests get a ``Server-Timing`` header and one JSON log line on the
+    ``hub.queries`` logger with the query count, SQL time and repeated query
+    shapes. Views declaring a ``query_budget`` are checked against it, every
+    request is recorded when ``QUERY_BUDGET_ACTION`` is "raise". Serves sync
+    and async requests alike, the queries async views run in other threads
+    are recorded too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(instrument, dispatch_uid="hub.instrumentation")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        recorder, started, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        recorder, started, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    def sampled(self):
+        strict = settings.QUERY_BUDGET_ACTION == "raise"
+        return strict or random.random() < settings.QUERY_SAMPLE_RATE
+
+    def start(self, request):
+        # Connections of this thread opened before the receiver was connected
+        for connection in connections.all(initialized_only=True):
+            instrument(connection)
+        request.query_budget = None
+        recorder = QueryRecorder()
+        return recorder, time.perf_counter(), current_recorder.set(recorder)
+
+    def finish(self, request, response, recorder, started):
+        elapsed = time.perf_counter() - started
+
+        response["Server-Timing"] = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+            f"total;dur={elapsed * 1000:.1f}"
+        )
+        repeated = recorder.repeated(settings.QUERY_REPEAT_THRESHOLD)
+        logger.log(
+            logging.WARNING if repeated else logging.INFO,
+            json.dumps(
+                {
+                    "path": request.path,
+                    "view": getattr(request.resolver_match, "view_name", None),
+                    "status": response.status_code,
+                    "queries": recorder.count,
+                    "db_ms": round(recorder.duration * 1000, 1),
+                    "total_ms": round(elapsed * 1000, 1),
+                    "repeated": repeated,
+                }
+            ),
+        )
+        self.check_budget(request, recorder.count)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, "query_budget", None)
+
+    def check_budget(self, request, count):
+        budget = getattr(request, "query_budget", None)
+        if budget is None or count <= budget:
+            return
+        message = f"{request.path} ran {count} queries, its budget is {budget}."
+        if settings.QUERY_BUDGET_ACTION == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
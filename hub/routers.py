@@ -0,0 +1,144 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+PRIMARY = "default"
+
+# Set while a request is handled, None in commands, workers and shells
+request_state = ContextVar("request_state", default=None)
+
+
+class RequestState:
+    """
+    Database routing state of one request.
+
+    :param replica (string): Replica alias serving the request's reads, None
+        when they must go to the primary.
+    """
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to a replica and writes to the primary.
+
+    Only safe requests handled by ``StickyPrimaryMiddleware`` read from
+    replicas, one per request so it never sees a replica going back in time.
+    Commands and background jobs read before they write, they stay on the
+    primary. Once a request writes, or inside a transaction, reads go to the
+    primary too.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = request_state.get()
+        if (
+            state is None
+            or state.replica is None
+            or connections[PRIMARY].in_atomic_block
+        ):
+            return PRIMARY
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = request_state.get()
+        if state is not None:
+            state.wrote = True
+            state.replica = None
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas copy the primary's schema, they are never migrated
+        return db not in settings.DATABASE_REPLICAS
+
+
+@contextmanager
+def primary():
+    """
+    Read from the primary inside the block, for work that reads then writes
+    but runs within a request reading a replica, e.g. flushing buffered views.
+    Its writes don't pin the request's user.
+    """
+    token = request_state.set(None)
+    try:
+        yield
+    finally:
+        request_state.reset(token)
+
+
+class StickyPrimaryMiddleware:
+    """
+    Pin the reads of a user who just wrote to the primary.
+
+    Replicas lag behind the primary, so after a request writes, a cookie
+    keeps the user's requests on the primary for
+    ``REPLICA_STICKY_SECONDS`` and they see their own changes. Unsafe methods
+    decide their writes from what they read, they never use a replica.
+    Serves sync and async requests alike, so async views stay in the event
+    loop, and is left out when there are no ``DATABASE_REPLICAS``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    cookie_name = "primary_until"
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.route(request)
+        token = request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_state.reset(token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        # Queries of async views run through sync_to_async, which copies the
+        # context, so they see the state set here
+        state = self.route(request)
+        token = request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_state.reset(token)
+        return self.pin(state, response)
+
+    def route(self, request):
+        replicas = settings.DATABASE_REPLICAS
+        pinned = (
+            self.cookie_name in request.COOKIES
+            or request.method not in self.safe_methods
+        )
+        return RequestState(None if pinned else random.choice(replicas))
+
+    def pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                self.cookie_name,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -38,6 +38,7 @@ CSRF_TRUSTED_ORIGINS = os.getenv("DJANGO_CSRF_TRUSTED_ORIGINS", "https://127.0.0
 INSTALLED_APPS = [
     "accounts",
     "projects",
+    "jobs",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -47,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "hub.instrumentation.QueryInstrumentationMiddleware",
+    "hub.routers.StickyPrimaryMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -92,6 +95,30 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default database, listed comma separated by host in
+# DATABASE_REPLICA_HOSTS or by name in DATABASE_REPLICA_NAMES (SQLite files).
+# Other settings are the primary's unless DATABASE_REPLICA_USER, _PASSWORD or
+# _PORT are set. Requests read from a replica until they write, then stick to
+# the primary for REPLICA_STICKY_SECONDS, see hub.routers.
+REPLICA_HOSTS = [h for h in os.getenv("DATABASE_REPLICA_HOSTS", "").split(",") if h]
+REPLICA_NAMES = [n for n in os.getenv("DATABASE_REPLICA_NAMES", "").split(",") if n]
+for index in range(max(len(REPLICA_HOSTS), len(REPLICA_NAMES))):
+    primary = DATABASES["default"]
+    DATABASES[f"replica{index + 1}"] = {
+        **primary,
+        "NAME": REPLICA_NAMES[index] if index < len(REPLICA_NAMES) else primary["NAME"],
+        "HOST": REPLICA_HOSTS[index] if index < len(REPLICA_HOSTS) else primary["HOST"],
+        "USER": os.getenv("DATABASE_REPLICA_USER", primary["USER"]),
+        "PASSWORD": os.getenv("DATABASE_REPLICA_PASSWORD", primary["PASSWORD"]),
+        "PORT": os.getenv("DATABASE_REPLICA_PORT", primary["PORT"]),
+        # Tests read and write one database
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["hub.routers.PrimaryReplicaRouter"]
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+
 AUTH_USER_MODEL = "accounts.User"
 
 # Password validation
@@ -141,3 +168,97 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # URL for login page
 LOGIN_URL = "accounts:login"
+
+# Personal timeline
+# Owners with more followers than this are merged in when a timeline is read
+# instead of being pushed into every follower's timeline on write.
+TIMELINE_FANOUT_LIMIT = int(os.getenv("TIMELINE_FANOUT_LIMIT", "10000"))
+# Number of recent projects copied into a timeline on a new follow
+TIMELINE_BACKFILL = int(os.getenv("TIMELINE_BACKFILL", "20"))
+
+# Project view tracking
+# Unique views are buffered in memory and written once this many are pending
+# and every this many seconds, by a background thread in served processes.
+VIEW_BUFFER_SIZE = int(os.getenv("VIEW_BUFFER_SIZE", "500"))
+VIEW_BUFFER_INTERVAL = float(os.getenv("VIEW_BUFFER_INTERVAL", "5"))
+# "exact" stores one viewer row per user, "approximate" keeps only constant
+# size HyperLogLog sketches and "both" maintains the two side by side.
+VIEW_COUNTING = os.getenv("VIEW_COUNTING", "exact")
+
+# Uploads
+# Every uploaded file is an image, a file is dropped without being stored as
+# soon as it exceeds MAX_UPLOAD_SIZE bytes or doesn't start like an accepted
+# format.
+FILE_UPLOAD_HANDLERS = [
+    "hub.uploads.BoundedUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(5 * 1024 * 1024)))
+# Images are refused before decoding when their header declares more pixels
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(40_000_000)))
+
+# Background jobs
+# Jobs run inline when JOBS_EAGER is true, otherwise they are stored and run
+# by `manage.py worker` processes.
+JOBS_EAGER = os.getenv("JOBS_EAGER", "true").lower() in ("1", "true")
+# Failed jobs are retried after JOBS_RETRY_DELAY * 2 ** (attempts - 1) seconds
+JOBS_RETRY_DELAY = int(os.getenv("JOBS_RETRY_DELAY", "10"))
+JOBS_MAX_RETRY_DELAY = int(os.getenv("JOBS_MAX_RETRY_DELAY", "3600"))
+# Running jobs older than this many seconds belong to a dead worker
+JOBS_TIMEOUT = int(os.getenv("JOBS_TIMEOUT", "600"))
+# Completed jobs are kept this many days for the admin
+JOBS_RETENTION_DAYS = int(os.getenv("JOBS_RETENTION_DAYS", "7"))
+
+# Serving
+# Under ASGI (uvicorn hub.asgi:application) the star, review, visibility and
+# follow endpoints are routed to their async versions when this is true.
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "false").lower() in ("1", "true")
+
+# Query instrumentation
+# When enabled, a QUERY_SAMPLE_RATE share of requests get a Server-Timing
+# header and a JSON line on the "hub.queries" logger with their query count,
+# SQL time and the query shapes repeated QUERY_REPEAT_THRESHOLD times or more.
+QUERY_INSTRUMENTATION = os.getenv("QUERY_INSTRUMENTATION", "false").lower() in (
+    "1",
+    "true",
+)
+QUERY_SAMPLE_RATE = float(os.getenv("QUERY_SAMPLE_RATE", "0.01"))
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+# Views over their @query_budget log a warning with "warn", "raise" records
+# every request and fails it, which is what the tests use.
+QUERY_BUDGET_ACTION = os.getenv("QUERY_BUDGET_ACTION", "warn")
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "hub.queries": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+# Trending
+# Stars, unique views and reviews of the last TRENDING_WINDOW_DAYS days count
+# towards a project's trending score, each losing half its weight every
+# TRENDING_HALF_LIFE_HOURS. `manage.py trending` re-bases the scores.
+TRENDING_WINDOW_DAYS = int(os.getenv("TRENDING_WINDOW_DAYS", "7"))
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+
+# Caches
+# Template fragments rendered by {% cache ... using="fragments" %} are keyed
+# by version stamps and never deleted, stale entries expire after the day the
+# tags set or are evicted. They live in process memory unless
+# FRAGMENT_CACHE_DIR points to a directory shared by every worker.
+FRAGMENT_CACHE_DIR = os.getenv("FRAGMENT_CACHE_DIR")
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "fragments": {
+        "BACKEND": (
+            "django.core.cache.backends.filebased.FileBasedCache"
+            if FRAGMENT_CACHE_DIR
+            else "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": FRAGMENT_CACHE_DIR or "fragments",
+        "OPTIONS": {"MAX_ENTRIES": 10_000},
+    },
+}
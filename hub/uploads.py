@@ -0,0 +1,150 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from PIL import Image, ImageOps
+
+# Leading bytes of the accepted formats, as (offset, bytes) parts
+SIGNATURES = (
+    ("JPEG", ((0, b"\xff\xd8\xff"),)),
+    ("PNG", ((0, b"\x89PNG\r\n\x1a\n"),)),
+    ("GIF", ((0, b"GIF87a"),)),
+    ("GIF", ((0, b"GIF89a"),)),
+    ("WEBP", ((0, b"RIFF"), (8, b"WEBP"))),
+)
+
+# Format written when re-encoding each accepted format, GIF loses animation
+OUTPUTS = {
+    "JPEG": ("JPEG", "jpg", {"quality": 90}),
+    "PNG": ("PNG", "png", {"optimize": True}),
+    "GIF": ("PNG", "png", {"optimize": True}),
+    "WEBP": ("WEBP", "webp", {"quality": 90}),
+}
+
+
+def sniff(header):
+    """
+    Identify an image format from its first bytes, ignoring the file name.
+
+    :param header (bytes): At least the first 12 bytes of the file.
+    :return: Pillow format name, or None if the format isn't accepted.
+    """
+    for name, parts in SIGNATURES:
+        if all(header[offset:].startswith(part) for offset, part in parts):
+            return name
+    return None
+
+
+class BoundedUploadHandler(FileUploadHandler):
+    """
+    First upload handler, drops an upload as soon as it is known to be
+    rejected instead of spooling it to memory or disk.
+
+    Uploads larger than ``MAX_UPLOAD_SIZE`` or not starting like a supported
+    image are skipped, the reason is left on ``request.upload_error``. The
+    rest of the body is still parsed, so the CSRF token and the other form
+    fields reach the view, which shows the error on the form.
+    """
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        self.request.upload_error = None
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.header = b""
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.MAX_UPLOAD_SIZE:
+            self.reject(self.too_large())
+
+        # Check the signature once the first bytes have arrived
+        if len(self.header) < 12:
+            self.header += raw_data[: 12 - len(self.header)]
+            if len(self.header) >= 12 and sniff(self.header) is None:
+                self.reject("Unsupported file.")
+        return raw_data
+
+    def file_complete(self, file_size):
+        # Too late to skip the file, the error is enough to refuse it
+        if file_size and len(self.header) < 12 and sniff(self.header) is None:
+            self.request.upload_error = "Unsupported file."
+        return None
+
+    def reject(self, message):
+        self.request.upload_error = message
+        raise SkipFile()
+
+    def too_large(self):
+        return f"File is larger than {settings.MAX_UPLOAD_SIZE // 1024 // 1024} MB."
+
+
+def upload_error(request):
+    """
+    Return why the upload handler dropped a file of ``request``.
+
+    :param request: The HTTP request object.
+    :return: Error message, or None if nothing was dropped.
+    """
+    request.FILES  # Parse the body if that didn't happen yet
+    return getattr(request, "upload_error", None)
+
+
+def clean_image(upload):
+    """
+    Validate an uploaded image and re-encode it without metadata.
+
+    The format is taken from the file's bytes and the pixel count from its
+    header, so nothing is decoded before both are known to be acceptable.
+    Decoding and encoding then happen once, dropping EXIF, XMP and other
+    metadata after applying the camera rotation.
+
+    :param upload: UploadedFile from ``request.FILES`` or a form.
+    :raises ValidationError: If the file is too large, not an accepted image
+        format, has too many pixels or can't be decoded.
+    :return: New SimpleUploadedFile holding the re-encoded image.
+    """
+    if upload.size > settings.MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            f"File is larger than {settings.MAX_UPLOAD_SIZE // 1024 // 1024} MB.",
+            code="file_too_large",
+        )
+
+    upload.seek(0)
+    kind = sniff(upload.read(12))
+    upload.seek(0)
+    if kind is None:
+        raise ValidationError("Unsupported file.", code="invalid_image")
+
+    try:
+        # Opening only parses the header, pixels are not decoded yet
+        with Image.open(upload, formats=[kind]) as image:
+            width, height = image.size
+            if width * height > settings.MAX_IMAGE_PIXELS:
+                raise ValidationError(
+                    "Image dimensions are too large.", code="too_many_pixels"
+                )
+            image = ImageOps.exif_transpose(image)
+            if kind == "JPEG":
+                if image.mode not in ("L", "RGB"):
+                    image = image.convert("RGB")
+            elif image.mode == "P" or "transparency" in image.info:
+                image = image.convert("RGBA")
+
+            # Encoders copy some metadata from info, keep none of it
+            image.info = {}
+
+            output, extension, options = OUTPUTS[kind]
+            buffer = BytesIO()
+            image.save(buffer, format=output, **options)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as error:
+        raise ValidationError("Unsupported file.", code="invalid_image") from error
+
+    name = upload.name.rsplit(".", 1)[0] or "image"
+    return SimpleUploadedFile(
+        f"{name}.{extension}", buffer.getvalue(), content_type=f"image/{extension}"
+    )
@@ -0,0 +1,24 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_at", "finished_at")
+    list_filter = ("status", "name")
+    search_fields = ("name",)
+    readonly_fields = ("locked_by", "locked_at", "created_at", "finished_at")
+    actions = ("retry_now",)
+
+    @admin.action(description="Run selected jobs again now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.QUEUED,
+            run_at=timezone.now(),
+            attempts=0,
+            last_error="",
+            finished_at=None,
+        )
+        self.message_user(request, f"{updated} jobs queued.")
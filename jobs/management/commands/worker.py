@@ -0,0 +1,66 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = "Run queued jobs until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no job is due instead of waiting for more.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when no job is due.",
+        )
+        parser.add_argument(
+            "--recover-interval",
+            type=float,
+            default=60.0,
+            help="Seconds between checks for jobs of dead workers.",
+        )
+
+    def handle(self, *args, **options):
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        done = failed = 0
+        recovered_at = 0.0
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() - recovered_at >= options["recover_interval"]:
+                queue.recover()
+                recovered_at = time.monotonic()
+
+            job = queue.claim(worker)
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+
+            if queue.perform(job):
+                done += 1
+            else:
+                failed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Worker {worker} ran {done} jobs, {failed} failed.")
+        )
+
+    def stop(self, signum, frame):
+        # Finish the current job, then exit
+        self.stopping = True
@@ -0,0 +1,41 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+# Deferred call of a registered function, claimed and run by workers
+class Job(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.QUEUED
+    )
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["run_at", "id"]
+        indexes = [
+            # Workers only ever scan queued jobs that are due
+            models.Index(
+                fields=["run_at", "id"],
+                condition=Q(status="queued"),
+                name="job_ready_idx",
+            ),
+            models.Index(fields=["status", "locked_at"], name="job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"job {self.pk}: {self.name} ({self.status})"
@@ -0,0 +1,177 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Registered job functions by name
+REGISTRY = {}
+
+
+def register(func=None, *, name=None, max_attempts=5):
+    """
+    Register a function that can be run as a job.
+
+    The function receives the job's keyword arguments, which must be JSON
+    serializable. It gains an ``enqueue(**kwargs)`` shortcut.
+
+    Usage: @register or @register(name="...", max_attempts=3)
+
+    :param func: The function to register.
+    :param name (string): Job name, defaults to "<module>.<function>".
+    :param max_attempts (int): Runs before the job is marked failed.
+    :return: The function itself.
+    """
+
+    def decorator(func):
+        job_name = name or f"{func.__module__}.{func.__qualname__}"
+        REGISTRY[job_name] = func
+        func.job_name = job_name
+        func.max_attempts = max_attempts
+        func.enqueue = lambda **kwargs: enqueue(job_name, **kwargs)
+        return func
+
+    return decorator(func) if func else decorator
+
+
+def enqueue(name, *, run_at=None, delay=None, **kwargs):
+    """
+    Schedule a registered function.
+
+    The job row is written in the caller's transaction, so it only becomes
+    visible to workers if the surrounding changes are committed. With
+    ``JOBS_EAGER`` the function runs immediately instead.
+
+    :param name (string): Registered job name.
+    :param run_at (datetime): Earliest time to run, now when None.
+    :param delay (timedelta): Alternatively, how long to wait before running.
+    :param kwargs: Arguments passed to the function.
+    :raises KeyError: If no function is registered under ``name``.
+    :return: The created Job, or None when run eagerly.
+    """
+    func = REGISTRY[name]
+    if settings.JOBS_EAGER:
+        func(**kwargs)
+        return None
+
+    if run_at is None:
+        run_at = timezone.now() + (delay or timedelta())
+    return Job.objects.create(
+        name=name, kwargs=kwargs, run_at=run_at, max_attempts=func.max_attempts
+    )
+
+
+def claim(worker):
+    """
+    Take the next due job for ``worker``.
+
+    PostgreSQL locks the candidate row with FOR UPDATE SKIP LOCKED, so
+    concurrent workers never wait on each other. Databases without SKIP
+    LOCKED, such as SQLite, flip the status with a compare-and-set UPDATE
+    that only one worker can win.
+
+    :param worker (string): Name recorded on the claimed job.
+    :return: The claimed Job marked running, or None if nothing is due.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.Status.QUEUED, run_at__lte=now)
+    claimed = {
+        "status": Job.Status.RUNNING,
+        "locked_by": worker,
+        "locked_at": now,
+        "attempts": F("attempts") + 1,
+    }
+
+    features = connections[router.db_for_write(Job)].features
+    if features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = due.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**claimed)
+    else:
+        for pk in due.values_list("pk", flat=True)[:10]:
+            if Job.objects.filter(pk=pk, status=Job.Status.QUEUED).update(**claimed):
+                break
+        else:
+            return None
+        job = Job(pk=pk)
+
+    job.refresh_from_db()
+    return job
+
+
+def perform(job):
+    """
+    Run a claimed job and record the outcome.
+
+    A failing job is queued again with exponential backoff until it has been
+    tried ``max_attempts`` times, then it is marked failed.
+
+    :param job: Job returned by ``claim``.
+    :return: True if the function completed.
+    """
+    try:
+        func = REGISTRY[job.name]
+        func(**job.kwargs)
+    except Exception:
+        logger.exception("Job %s (%s) failed", job.pk, job.name)
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.Status.QUEUED
+            job.run_at = timezone.now() + backoff(job.attempts)
+        else:
+            job.status = Job.Status.FAILED
+            job.finished_at = timezone.now()
+        job.save(update_fields=["status", "run_at", "last_error", "finished_at"])
+        return False
+
+    job.status = Job.Status.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at"])
+    return True
+
+
+def backoff(attempts):
+    """
+    Delay before the next try of a job that failed ``attempts`` times.
+    """
+    seconds = settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.JOBS_MAX_RETRY_DELAY))
+
+
+def recover():
+    """
+    Queue again jobs left running by a worker that died, and drop finished
+    jobs past their retention.
+
+    A job that already used all its attempts is marked failed instead, it may
+    be what kills its worker, e.g. by running out of memory.
+
+    :return: Tuple of (jobs queued again, jobs deleted).
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.Status.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_TIMEOUT),
+    )
+    exhausted = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.Status.FAILED,
+        finished_at=now,
+        last_error="The worker stopped while running the job.",
+    )
+    if exhausted:
+        logger.error("Marked %d jobs failed after their worker stopped", exhausted)
+    requeued = stale.update(status=Job.Status.QUEUED, run_at=now)
+    deleted, _ = Job.objects.filter(
+        status=Job.Status.DONE,
+        finished_at__lt=now - timedelta(days=settings.JOBS_RETENTION_DAYS),
+    ).delete()
+    return requeued, deleted
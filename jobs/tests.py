@@ -0,0 +1,119 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+
+calls = []
+
+
+@queue.register(name="tests.record", max_attempts=2)
+def record(value):
+    calls.append(value)
+
+
+@queue.register(name="tests.explode")
+def explode():
+    raise RuntimeError("boom")
+
+
+@override_settings(JOBS_EAGER=False, JOBS_RETRY_DELAY=10)
+class QueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        """Jobs are stored, claimed once and marked done."""
+        job = record.enqueue(value=1)
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertEqual(calls, [])
+
+        claimed = queue.claim("w1")
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, Job.Status.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(queue.claim("w2"))
+
+        self.assertTrue(queue.perform(claimed))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.DONE)
+        self.assertEqual(calls, [1])
+
+    def test_schedule(self):
+        """Jobs are not claimed before their time."""
+        queue.enqueue("tests.record", delay=timedelta(minutes=5), value=1)
+        self.assertIsNone(queue.claim("w1"))
+        later = timezone.now() + timedelta(minutes=6)
+        with patch("django.utils.timezone.now", return_value=later):
+            self.assertIsNotNone(queue.claim("w1"))
+
+    def test_retry_with_backoff(self):
+        """Failures are retried later, then marked failed."""
+        job = queue.enqueue("tests.explode")
+        job.max_attempts = 2
+        job.save()
+
+        with self.assertLogs("jobs.queue", "ERROR"):
+            self.assertFalse(queue.perform(queue.claim("w1")))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertIn("RuntimeError: boom", job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=9))
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs("jobs.queue", "ERROR"):
+            self.assertFalse(queue.perform(queue.claim("w1")))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(queue.backoff(3), timedelta(seconds=40))
+
+    def test_recover(self):
+        """Jobs of dead workers run again, old finished jobs are dropped."""
+        stale = record.enqueue(value=1)
+        old = record.enqueue(value=2)
+        Job.objects.filter(pk=stale.pk).update(
+            status=Job.Status.RUNNING,
+            locked_at=timezone.now() - timedelta(hours=1),
+        )
+        Job.objects.filter(pk=old.pk).update(
+            status=Job.Status.DONE,
+            finished_at=timezone.now() - timedelta(days=30),
+        )
+        self.assertEqual(queue.recover(), (1, 1))
+        self.assertEqual(queue.claim("w1").pk, stale.pk)
+
+    def test_recover_exhausted(self):
+        """A job that keeps killing its worker is not retried forever."""
+        job = record.enqueue(value=1)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.RUNNING,
+            attempts=job.max_attempts,
+            locked_at=timezone.now() - timedelta(hours=1),
+        )
+        with self.assertLogs("jobs.queue", "ERROR"):
+            self.assertEqual(queue.recover(), (0, 0))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertTrue(job.last_error)
+        self.assertIsNone(queue.claim("w1"))
+
+    def test_worker_command(self):
+        """The worker runs every due job and exits with --once."""
+        record.enqueue(value=1)
+        record.enqueue(value=2)
+        out = StringIO()
+        call_command("worker", once=True, stdout=out)
+        self.assertEqual(calls, [1, 2])
+        self.assertIn("ran 2 jobs, 0 failed", out.getvalue())
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager(self):
+        """Eager mode runs jobs inline without storing them."""
+        self.assertIsNone(record.enqueue(value=3))
+        self.assertEqual(calls, [3])
+        self.assertFalse(Job.objects.exists())
@@ -0,0 +1,157 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+
+from . import tasks, timeline
+from .models import Project, Review
+from .stars import toggle_star
+from .views import review_page
+
+# Async versions of the JSON endpoints in views.py, routed instead of them
+# when ASYNC_VIEWS is set. Responses are identical.
+
+
+@csrf_exempt
+@login_required
+async def reviews(request, pk):
+    """
+    List the reviews of a specific project or add a new one.
+
+    :param request: The HTTP request object, GET takes ``cursor`` and ``limit``,
+        POST carries the review content.
+    :param pk (int): Primary key of the project.
+    :raises Http404: If the project doesn't exist.
+    :return: JsonResponse with a page of reviews and the next cursor on GET.
+    :return: JsonResponse with the created review and status 201 on POST.
+    :return: JsonResponse with error message on failure or other methods.
+    """
+    user = await request.auser()
+
+    # Get the project or return a 404 error
+    project = await aget_object_or_404(
+        Project.objects.only("pk", "is_public", "owner_id"), pk=pk
+    )
+
+    if request.method == "GET":
+        # Private projects are only readable by their owner
+        if not project.is_public and user.pk != project.owner_id:
+            return JsonResponse({"error": "This project is private."}, status=403)
+
+        # Let the client choose the page size within bounds
+        try:
+            limit = min(max(int(request.GET.get("limit", 10)), 1), 50)
+        except ValueError:
+            return JsonResponse({"error": "limit must be an integer."}, status=400)
+
+        page_obj = await sync_to_async(review_page)(
+            project, request.GET.get("cursor"), limit
+        )
+        return JsonResponse(
+            {
+                "reviews": [review.serializer() for review in page_obj],
+                "next": page_obj.next_cursor,
+            },
+            status=200,
+        )
+
+    # Allow only GET and POST requests
+    if request.method != "POST":
+        return JsonResponse({"error": "GET or POST request is required."}, status=400)
+
+    # Load and validate the review content
+    data = json.loads(request.body)
+    content = data.get("content")
+    if not content or len(content) > 1000:
+        return JsonResponse(
+            {"error": "Review must be between 1 and 1000 characters."}, status=400
+        )
+
+    # Create the new review
+    review = await Review.objects.acreate(user=user, project=project, content=content)
+
+    # Return the created review so the client can render it
+    return JsonResponse(
+        {"message": "Review added successfully.", "review": review.serializer()},
+        status=201,
+    )
+
+
+@csrf_exempt
+@login_required
+async def stars(request, pk):
+    """
+    Toggle star status for a specific project.
+
+    :param request: The HTTP request object.
+    :param pk (int): Primary key of the project to star/unstar.
+    :raises Http404: If the project doesn't exist.
+    :return: JsonResponse with updated star status and count.
+    :return: JsonResponse with error message on non-POST requests.
+    """
+    # Allow only POST request
+    if request.method != "POST":
+        return JsonResponse({"error": "POST request required."}, status=400)
+
+    user = await request.auser()
+
+    # Check if the project exists
+    project = await aget_object_or_404(Project.objects.only("pk"), pk=pk)
+
+    # The toggle runs in one transaction, which needs a sync thread
+    starred, count = await sync_to_async(toggle_star)(project.pk, user.pk)
+    return JsonResponse({"starred": starred, "count": count}, status=200)
+
+
+@csrf_exempt
+@login_required
+async def visibility(request, pk):
+    """
+    Change the visibility status of a project.
+
+    :param request: The HTTP request object containing visibility data.
+    :param pk (int): Primary key of the project to update.
+    :raises Http404: If the project doesn't exist.
+    :return: JsonResponse with success message and updated visibility status.
+    :return: JsonResponse with error message if user isn't the owner or on non-PUT requests.
+    """
+    # Allow only PUT request
+    if request.method != "PUT":
+        return JsonResponse({"error": "PUT request required."}, status=405)
+
+    user = await request.auser()
+
+    # Get the current project
+    project = await aget_object_or_404(
+        Project.objects.only("pk", "is_public", "owner_id"), pk=pk
+    )
+
+    # Check if the request user is the owner
+    if user.pk != project.owner_id:
+        return JsonResponse(
+            {"error": "You don't have permission to edit this project"}, status=403
+        )
+
+    # access request body data
+    data = json.loads(request.body)
+
+    # Change visibility
+    was_public = project.is_public
+    project.is_public = data.get("visibility") == "public"
+
+    # Save changes, auto_now columns are only written when listed
+    await project.asave(update_fields=["is_public", "updated_at"])
+
+    # Keep followers' timelines in step with the visibility
+    if project.is_public and not was_public:
+        await sync_to_async(tasks.fan_out.enqueue)(project_id=project.pk)
+    elif was_public and not project.is_public:
+        await sync_to_async(timeline.retract)(project)
+
+    return JsonResponse(
+        {"message": "visibility changes successfully.", "is_public": project.is_public},
+        status=200,
+    )
@@ -1,4 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+
+from hub import uploads
 
 from .models import Project
 
@@ -86,3 +89,10 @@ class ProjectForm(forms.ModelForm):
                 }
             ),
         }
+
+    def clean_image(self):
+        image = self.cleaned_data.get("image")
+        # Only new uploads are checked, stored images were cleaned on upload
+        if isinstance(image, UploadedFile):
+            return uploads.clean_image(image)
+        return image
@@ -0,0 +1,108 @@
+import hashlib
+import math
+import struct
+
+# 2**14 registers give a standard error of 1.04 / sqrt(16384), about 0.8%
+PRECISION = 14
+
+DENSE = 0
+SPARSE = 1
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch estimating the number of distinct items added to it.
+
+    The serialized form is sparse (3 bytes per touched register) while few
+    registers are set and switches to one byte per register once that is
+    smaller, so it never grows past ``2 ** precision + 2`` bytes.
+
+    :param precision (int): Number of index bits, the sketch has 2**p registers.
+    """
+
+    def __init__(self, precision=PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Load a sketch produced by ``to_bytes``, an empty value gives an empty
+        sketch.
+
+        :param data (bytes): Serialized sketch.
+        :raises ValueError: If the data is not a serialized sketch.
+        :return: HyperLogLog instance.
+        """
+        if not data:
+            return cls()
+        data = bytes(data)
+        sketch = cls(precision=data[0])
+        if data[1] == DENSE:
+            if len(data) != sketch.size + 2:
+                raise ValueError("Truncated HyperLogLog sketch.")
+            sketch.registers[:] = data[2:]
+        elif data[1] == SPARSE:
+            for index, rank in struct.iter_unpack(">HB", data[2:]):
+                sketch.registers[index] = rank
+        else:
+            raise ValueError("Unknown HyperLogLog encoding.")
+        return sketch
+
+    def to_bytes(self):
+        """
+        Serialize the sketch in its smallest encoding.
+
+        :return: bytes
+        """
+        touched = [(i, rank) for i, rank in enumerate(self.registers) if rank]
+        if len(touched) * 3 < self.size:
+            body = b"".join(struct.pack(">HB", i, rank) for i, rank in touched)
+            return bytes((self.precision, SPARSE)) + body
+        return bytes((self.precision, DENSE)) + bytes(self.registers)
+
+    def add(self, item):
+        """
+        Add an item, adding it again has no effect.
+
+        :param item: Any value with a stable ``str`` form, e.g. a user id.
+        """
+        digest = hashlib.blake2b(str(item).encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, "big")
+        index = value >> (64 - self.precision)
+        rest = value & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def merge(self, other):
+        """
+        Fold another sketch into this one, the result estimates the union.
+
+        :param other: HyperLogLog with the same precision.
+        :raises ValueError: If the precisions differ.
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision.")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        """
+        Estimate the number of distinct items added.
+
+        :return: int
+        """
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-rank for rank in self.registers)
+
+        # Linear counting is more accurate while many registers are empty
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
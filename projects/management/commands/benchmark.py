@@ -0,0 +1,343 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from accounts.models import User
+from hub.instrumentation import QueryRecorder
+from projects.models import Project, Review, Technology
+from projects.tracking import view_buffer
+
+from .loadtest import percentile
+from .reconcile_counters import rebuild_counters
+
+# Rows created at scale 1, every count is multiplied by the scale factor
+SIZES = {
+    "users": 100_000,
+    "technologies": 500,
+    "projects": 50_000,
+    "stars": 1_000_000,
+    "viewers": 1_000_000,
+    "reviews": 200_000,
+    "follows": 500_000,
+}
+
+# Technologies linked to each project
+TECHNOLOGIES_PER_PROJECT = 3
+
+# Password of every seeded user
+PASSWORD = "benchmark"
+
+
+def sizes_for(scale):
+    return {name: max(int(size * scale), 2) for name, size in SIZES.items()}
+
+
+def skewed(rng, count):
+    """
+    Pick an index in ``range(count)``, low indexes far more often, so a few
+    projects and users collect most stars, views and followers.
+    """
+    return int(count * rng.random() ** 3)
+
+
+def unique_pairs(rng, total, left, right, skew_right=False):
+    """
+    Draw ``total`` distinct (left, right) index pairs, without self pairs
+    when both sides are the same table. One side is skewed, the left one
+    unless ``skew_right``, the other is uniform.
+    """
+    total = min(total, left * right - (left if left == right else 0))
+    pairs = set()
+    while len(pairs) < total:
+        if skew_right:
+            a, b = rng.randrange(left), skewed(rng, right)
+        else:
+            a, b = skewed(rng, left), rng.randrange(right)
+        if left != right or a != b:
+            pairs.add((a, b))
+    return sorted(pairs)
+
+
+def seed(scale=0.01, seed=0, batch_size=5000):
+    """
+    Fill an empty database with a deterministic synthetic dataset.
+
+    The same scale and seed always produce the same rows and relations.
+    Counter columns are rebuilt once at the end instead of being maintained
+    by signals, which ``bulk_create`` doesn't send.
+
+    :param scale (float): Fraction of ``SIZES`` to create.
+    :param seed (int): Seed of the random generator.
+    :param batch_size (int): Rows per INSERT.
+    :return: Dictionary of the number of rows created per kind.
+    """
+    rng = random.Random(seed)
+    sizes = sizes_for(scale)
+    password = make_password(PASSWORD, salt="benchmark")
+
+    users = User.objects.bulk_create(
+        (
+            User(username=f"user{i}", email=f"user{i}@example.com", password=password)
+            for i in range(sizes["users"])
+        ),
+        batch_size=batch_size,
+    )
+    user_ids = [user.pk for user in users]
+
+    technologies = Technology.objects.bulk_create(
+        (
+            Technology(name=f"Technology {i}", key=f"technology {i}")
+            for i in range(sizes["technologies"])
+        ),
+        batch_size=batch_size,
+    )
+    technology_ids = [technology.pk for technology in technologies]
+
+    projects = Project.objects.bulk_create(
+        (
+            Project(
+                owner_id=user_ids[skewed(rng, len(user_ids))],
+                title=f"Project {i}",
+                overview=f"Synthetic project number {i}",
+                description="Lorem ipsum dolor sit amet. " * rng.randint(1, 20),
+                is_public=rng.random() < 0.9,
+            )
+            for i in range(sizes["projects"])
+        ),
+        batch_size=batch_size,
+    )
+    project_ids = [project.pk for project in projects]
+
+    Project.technologies.through.objects.bulk_create(
+        (
+            Project.technologies.through(
+                project_id=project_id, technology_id=technology_ids[index]
+            )
+            for project_id in project_ids
+            for index in {
+                skewed(rng, len(technology_ids))
+                for _ in range(TECHNOLOGIES_PER_PROJECT)
+            }
+        ),
+        batch_size=batch_size,
+    )
+
+    for name, through in (
+        ("stars", Project.stars.through),
+        ("viewers", Project.viewers.through),
+    ):
+        through.objects.bulk_create(
+            (
+                through(project_id=project_ids[p], user_id=user_ids[u])
+                for p, u in unique_pairs(
+                    rng, sizes[name], len(project_ids), len(user_ids)
+                )
+            ),
+            batch_size=batch_size,
+        )
+
+    Review.objects.bulk_create(
+        (
+            Review(
+                project_id=project_ids[skewed(rng, len(project_ids))],
+                user_id=user_ids[rng.randrange(len(user_ids))],
+                content=f"Review {i}",
+            )
+            for i in range(sizes["reviews"])
+        ),
+        batch_size=batch_size,
+    )
+
+    # from_user is followed by to_user, popular users gather most followers
+    User.followers.through.objects.bulk_create(
+        (
+            User.followers.through(
+                from_user_id=user_ids[followed], to_user_id=user_ids[follower]
+            )
+            for follower, followed in unique_pairs(
+                rng, sizes["follows"], len(user_ids), len(user_ids), skew_right=True
+            )
+        ),
+        batch_size=batch_size,
+    )
+
+    rebuild_counters()
+    return sizes
+
+
+def scenarios(rng, count):
+    """
+    Build the requests timed for each view, as (method, url) lists.
+
+    Targets are drawn like real traffic: mostly popular projects and users.
+    The benchmark user is the first one, who is also the most followed.
+
+    :param rng: Random generator.
+    :param count (int): Requests per view.
+    :return: Dictionary mapping view names to their requests.
+    """
+    projects = list(
+        Project.objects.public().order_by("pk").values_list("pk", flat=True)
+    )
+    users = list(User.objects.order_by("pk").values_list("pk", "username"))
+    others = users[1:]
+
+    def pick(items):
+        return [items[skewed(rng, len(items))] for _ in range(count)]
+
+    return {
+        "index": [("GET", reverse("projects:index"))] * count,
+        "detail": [
+            ("GET", reverse("projects:detail", args=[pk])) for pk in pick(projects)
+        ],
+        "dashboard": [
+            ("GET", reverse("accounts:dashboard", args=[username]))
+            for _, username in pick(users)
+        ],
+        "stars": [
+            ("POST", reverse("projects:stars", args=[pk])) for pk in pick(projects)
+        ],
+        "follow": [
+            ("POST", reverse("accounts:follow", args=[pk])) for pk, _ in pick(others)
+        ],
+    }
+
+
+def measure(client, requests, warmup=5):
+    """
+    Send requests through the test client and time each one.
+
+    :param client: Logged in test Client.
+    :param requests: List of (method, url) tuples.
+    :param warmup (int): Leading requests sent but not recorded.
+    :return: Dictionary of latency percentiles, query counts and errors.
+    """
+    for method, url in requests[:warmup]:
+        getattr(client, method.lower())(url)
+
+    latencies, queries, errors = [], [], 0
+    for method, url in requests:
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = getattr(client, method.lower())(url)
+        latencies.append(time.perf_counter() - started)
+        queries.append(recorder.count)
+        errors += response.status_code >= 400
+    view_buffer.flush()
+
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "queries_mean": round(statistics.mean(queries), 2),
+        "queries_max": max(queries),
+        "errors": errors,
+    }
+
+
+def run_benchmarks(requests=200, seed=0, views=None):
+    """
+    Time the main views against the seeded data.
+
+    :param requests (int): Requests per view.
+    :param seed (int): Seed choosing the requested projects and users.
+    :param views: Names of the views to time, all of them when None.
+    :return: Dictionary mapping view names to ``measure`` results.
+    """
+    client = Client()
+    client.force_login(User.objects.order_by("pk").first())
+    rng = random.Random(seed)
+    return {
+        name: measure(client, plan)
+        for name, plan in scenarios(rng, requests).items()
+        if views is None or name in views
+    }
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with synthetic data and time the feed, "
+        "detail, dashboard, star and follow views. Scale 1 is 100k users, 50k "
+        "projects and 1M stars. Results are printed as JSON to compare commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=float,
+            default=0.01,
+            help="Fraction of the full dataset to create.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--view",
+            action="append",
+            choices=["index", "detail", "dashboard", "stars", "follow"],
+            help="Only time this view, can be repeated.",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the test database and reuse its data on the next run.",
+        )
+        parser.add_argument("--output", help="Write the JSON results to a file.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options["keepdb"]
+        )
+        try:
+            if not User.objects.exists():
+                started = time.perf_counter()
+                seed(options["scale"], options["seed"])
+                self.stderr.write(f"Seeded in {time.perf_counter() - started:.1f}s.")
+            results = {
+                "revision": revision(),
+                "database": connection.vendor,
+                "scale": options["scale"],
+                "seed": options["seed"],
+                "rows": {
+                    "users": User.objects.count(),
+                    "projects": Project.objects.count(),
+                    "stars": Project.stars.through.objects.count(),
+                },
+                "views": run_benchmarks(
+                    options["requests"], options["seed"], options["view"]
+                ),
+            }
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        self.stdout.write(output)
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import re
+import statistics
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Endpoints exercised for every target, {project} and {user} are substituted
+ENDPOINTS = {
+    "stars": ("POST", "/project/{project}/stars/"),
+    "reviews": ("GET", "/project/{project}/reviews/?limit=10"),
+    "follow": ("POST", "/user/{user}/follow/"),
+}
+
+
+async def fetch(base, method, path, headers=None, body=b""):
+    """
+    Send one HTTP/1.1 request on a fresh connection.
+
+    :return: Tuple of (status, headers dict of lists, body bytes).
+    """
+    url = urlsplit(base)
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    lines = [
+        f"{method} {path} HTTP/1.1",
+        f"Host: {url.netloc}",
+        "Connection: close",
+        f"Content-Length: {len(body)}",
+        *(f"{name}: {value}" for name, value in (headers or {}).items()),
+    ]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+
+    head, _, content = raw.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    received = {}
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        received.setdefault(name.strip().lower(), []).append(value.strip())
+    return int(status_line.split()[1]), received, content
+
+
+def cookies(headers):
+    return dict(
+        re.match(r"([^=]+)=([^;]*)", value).groups()
+        for value in headers.get("set-cookie", [])
+    )
+
+
+async def login(base, username, password):
+    """
+    Sign in through the login form and return the session cookie header.
+    """
+    _, headers, _ = await fetch(base, "GET", "/login/")
+    csrf = cookies(headers).get("csrftoken", "")
+    body = urlencode(
+        {"username": username, "password": password, "csrfmiddlewaretoken": csrf}
+    ).encode()
+    status, headers, _ = await fetch(
+        base,
+        "POST",
+        "/login/",
+        {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Cookie": f"csrftoken={csrf}",
+            "Referer": f"{base}/login/",
+        },
+        body,
+    )
+    session = cookies(headers).get("sessionid")
+    if status != 302 or not session:
+        raise CommandError(f"Cannot sign in to {base} as {username}.")
+    return f"sessionid={session}"
+
+
+async def hammer(base, method, path, cookie, total, concurrency):
+    """
+    Send ``total`` requests with at most ``concurrency`` in flight.
+
+    :return: Tuple of (latencies in seconds, error count, elapsed seconds).
+    """
+    latencies, errors = [], 0
+    remaining = iter(range(total))
+
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status, _, _ = await fetch(base, method, path, {"Cookie": cookie})
+            except OSError:
+                status = 0
+            latencies.append(time.perf_counter() - started)
+            errors += status >= 400 or status == 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the JSON endpoints of running servers and compare their "
+        "throughput and latency. Start the WSGI and ASGI servers first, e.g. "
+        "`gunicorn hub.wsgi:application -w 4 -b :8000` and "
+        "`ASYNC_VIEWS=true uvicorn hub.asgi:application --workers 4 --port 8001`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            action="append",
+            required=True,
+            help="name=base URL of a server, e.g. wsgi=http://127.0.0.1:8000.",
+        )
+        parser.add_argument("--username", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument(
+            "--project", type=int, required=True, help="Project to star and read."
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="User to follow, the follow test is skipped without it.",
+        )
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument(
+            "--json", action="store_true", help="Print the results as JSON."
+        )
+
+    def handle(self, *args, **options):
+        targets = [target.split("=", 1) for target in options["target"]]
+        if any(len(target) != 2 for target in targets):
+            raise CommandError("Targets must look like name=http://host:port.")
+        results = asyncio.run(self.run(targets, options))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{'target':<10}{'endpoint':<10}{'req/s':>10}{'p50 ms':>10}"
+            f"{'p99 ms':>10}{'errors':>8}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['target']:<10}{row['endpoint']:<10}{row['rps']:>10.1f}"
+                f"{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['errors']:>8}"
+            )
+
+    async def run(self, targets, options):
+        results = []
+        for name, base in targets:
+            base = base.rstrip("/")
+            cookie = await login(base, options["username"], options["password"])
+            for endpoint, (method, path) in ENDPOINTS.items():
+                if "{user}" in path and not options["user"]:
+                    continue
+                path = path.format(project=options["project"], user=options["user"])
+                latencies, errors, elapsed = await hammer(
+                    base,
+                    method,
+                    path,
+                    cookie,
+                    options["requests"],
+                    options["concurrency"],
+                )
+                results.append(
+                    {
+                        "target": name,
+                        "endpoint": endpoint,
+                        "rps": len(latencies) / elapsed,
+                        "p50_ms": statistics.median(latencies) * 1000,
+                        "p99_ms": percentile(latencies, 0.99) * 1000,
+                        "errors": errors,
+                    }
+                )
+        return results
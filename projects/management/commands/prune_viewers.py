@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from projects.models import Project, ViewSketch
+from projects.tracking import fold_viewers
+
+
+class Command(BaseCommand):
+    help = "Delete exact viewer rows and expired daily viewer sketches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=30,
+            help="Number of daily sketches kept per project.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of projects whose viewer rows are pruned at once.",
+        )
+
+    def handle(self, *args, **options):
+        if settings.VIEW_COUNTING != "approximate":
+            self.stdout.write(
+                "Nothing pruned, viewer rows and sketches are only pruned when "
+                "VIEW_COUNTING is 'approximate'."
+            )
+            return
+
+        # Daily sketches older than the window are never merged again
+        since = timezone.now().date() - timedelta(days=options["keep_days"])
+        deleted, _ = ViewSketch.objects.filter(day__lt=since).delete()
+        self.stdout.write(f"Deleted {deleted} expired daily sketches.")
+
+        # Exact viewer rows are no longer read once counting is approximate,
+        # their viewers are kept in the all-time sketches
+        through = Project.viewers.through
+        total = 0
+        while batch := list(
+            through.objects.values_list("project_id", flat=True)
+            .order_by("project_id")
+            .distinct()[: options["batch_size"]]
+        ):
+            fold_viewers(batch)
+            total += through.objects.filter(project_id__in=batch).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} viewer rows."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from projects import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of all projects."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of projects written per batch.",
+        )
+
+    def handle(self, *args, **options):
+        total = search.rebuild(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} projects."))
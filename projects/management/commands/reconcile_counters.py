@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import User
+from projects.models import Project, Review, Technology
+
+
+def count_of(model, column, **filters):
+    """
+    Build a correlated COUNT(*) over ``model`` rows pointing at the outer row.
+
+    :param model: Model holding the foreign key, usually a through table.
+    :param column (string): Foreign key on ``model`` referencing the outer row.
+    :param filters: Extra lookups restricting the counted rows.
+    :return: Expression evaluating to the number of matching rows.
+    """
+    rows = (
+        model.objects.filter(**{column: OuterRef("pk")}, **filters)
+        .order_by()
+        .values(column)
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def counters():
+    """
+    Map every model with denormalized counters to their recount expressions.
+    """
+    projects = {
+        "star_count": count_of(Project.stars.through, "project"),
+        "viewer_count": count_of(Project.viewers.through, "project"),
+        "review_count": count_of(Review, "project"),
+    }
+
+    # Approximate viewer counts come from sketches, the rows may be pruned
+    if settings.VIEW_COUNTING == "approximate":
+        del projects["viewer_count"]
+
+    return {
+        Project: projects,
+        User: {
+            "follower_count": count_of(User.followers.through, "from_user"),
+            "following_count": count_of(User.followers.through, "to_user"),
+        },
+        Technology: {
+            "public_project_count": count_of(
+                Project.technologies.through, "technology", project__is_public=True
+            ),
+        },
+    }
+
+
+def rebuild_counters(batch_size=10000):
+    """
+    Recompute every counter column from the underlying rows.
+
+    Rows are rewritten in primary key ranges so a large table is never locked
+    by one long UPDATE.
+
+    :param batch_size (int): Number of primary keys covered per UPDATE.
+    :return: Dictionary mapping each model to the number of rows rewritten.
+    """
+    rebuilt = {}
+    for model, expressions in counters().items():
+        last = model.objects.aggregate(last=Max("pk"))["last"] or 0
+        rebuilt[model] = 0
+        for start in range(0, last + 1, batch_size):
+            rebuilt[model] += model.objects.filter(
+                pk__gte=start, pk__lt=start + batch_size
+            ).update(**expressions)
+    return rebuilt
+
+
+class Command(BaseCommand):
+    help = "Rebuild star, viewer, review, follow and technology counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of primary keys updated per statement.",
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_counters(options["batch_size"])
+        for model, total in rebuilt.items():
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Rebuilt counters for {total} {model._meta.verbose_name_plural}."
+                )
+            )
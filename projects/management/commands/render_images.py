@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from hub import images
+from projects.models import Project
+
+# Image fields with resized renditions, and the spec they are rendered with
+FIELDS = (
+    (User, "photo", images.AVATAR),
+    (Project, "image", images.PREVIEW),
+)
+
+
+class Command(BaseCommand):
+    help = "Render resized WebP and JPEG copies of existing photos and images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Also re-check images that were already rendered.",
+        )
+
+    def handle(self, *args, **options):
+        for model, field_name, spec in FIELDS:
+            rows = model.objects.exclude(**{field_name: ""}).order_by("pk")
+            if not options["all"]:
+                rows = rows.filter(**{f"{field_name}_digest": ""})
+
+            rendered = failed = 0
+            for instance in rows.only("pk", field_name).iterator(chunk_size=100):
+                if images.derive(instance, field_name, spec):
+                    rendered += 1
+                else:
+                    failed += 1
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Rendered {rendered} {model._meta.verbose_name_plural}, "
+                    f"{failed} failed."
+                )
+            )
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from projects import similar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the similar projects of projects whose technologies or "
+        "visibility changed. Run it periodically, with --all now and then."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every project, not only the changed ones.",
+        )
+        parser.add_argument(
+            "--neighbours",
+            type=int,
+            default=similar.NEIGHBOURS,
+            help="Number of similar projects stored per project.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of projects computed and written at once.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = similar.refresh(
+            options["all"], options["neighbours"], options["chunk_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recomputed {total} projects in {time.perf_counter() - started:.1f}s."
+            )
+        )
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from projects import trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild trending scores from the events of the last "
+        "TRENDING_WINDOW_DAYS days and drop older events. Run it periodically, "
+        "stars, views and reviews update the scores in between."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of projects written per UPDATE.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = trending.recompute(options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scored {total} trending projects in {time.perf_counter() - started:.1f}s."
+            )
+        )
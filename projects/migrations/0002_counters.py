@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-18 18:01
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, column):
+    rows = (
+        model.objects.filter(**{column: OuterRef("pk")})
+        .order_by()
+        .values(column)
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    Project = apps.get_model("projects", "Project")
+    Review = apps.get_model("projects", "Review")
+    Project.objects.update(
+        star_count=count_of(Project.stars.through, "project"),
+        viewer_count=count_of(Project.viewers.through, "project"),
+        review_count=count_of(Review, "project"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="star_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="viewer_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
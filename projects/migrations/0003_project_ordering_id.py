@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 18:03
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0002_counters"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="project",
+            options={"ordering": ["-timestamp", "-id"]},
+        ),
+    ]
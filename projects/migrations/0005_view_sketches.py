@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-18 18:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0004_timeline"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ViewSketch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(blank=True, null=True)),
+                ("sketch", models.BinaryField(default=b"")),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="view_sketches",
+                        to="projects.project",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["project", "-day"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("project", "day"), name="unique_daily_view_sketch"
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("day__isnull", True)),
+                        fields=("project",),
+                        name="unique_total_view_sketch",
+                    ),
+                ],
+            },
+        ),
+    ]
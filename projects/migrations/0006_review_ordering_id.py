@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 18:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0005_view_sketches"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="review",
+            options={"ordering": ["-created_at", "-id"]},
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE projects_search USING fts5("
+            "title, overview, description, key_learning, technologies, "
+            "tokenize = 'porter unicode61')"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "ALTER TABLE projects_project ADD COLUMN search_document tsvector"
+        )
+        schema_editor.execute(
+            "CREATE INDEX projects_search_document_idx ON projects_project "
+            "USING GIN (search_document)"
+        )
+
+
+def uninstall(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS projects_search")
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "ALTER TABLE projects_project DROP COLUMN IF EXISTS search_document"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0006_review_ordering_id"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
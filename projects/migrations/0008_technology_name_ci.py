@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 18:10
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+def merge_case_duplicates(apps, schema_editor):
+    # Keep the oldest spelling of each name and move its projects over
+    Technology = apps.get_model("projects", "Technology")
+    Through = apps.get_model("projects", "Project").technologies.through
+    keep = {}
+    for pk, name in Technology.objects.order_by("pk").values_list("pk", "name"):
+        kept = keep.setdefault(name.lower(), pk)
+        if kept == pk:
+            continue
+        existing = set(
+            Through.objects.filter(technology_id=kept).values_list(
+                "project_id", flat=True
+            )
+        )
+        Through.objects.filter(technology_id=pk, project_id__in=existing).delete()
+        Through.objects.filter(technology_id=pk).update(technology_id=kept)
+        Technology.objects.filter(pk=pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0007_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="technology",
+            constraint=models.UniqueConstraint(
+                Lower("name"), name="unique_technology_name_ci"
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-18 18:12
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Project = apps.get_model("projects", "Project")
+    Technology = apps.get_model("projects", "Technology")
+    rows = (
+        Project.technologies.through.objects.filter(
+            technology=OuterRef("pk"), project__is_public=True
+        )
+        .order_by()
+        .values("technology")
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+    Technology.objects.update(
+        public_project_count=Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0008_technology_name_ci"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="technology",
+            name="public_project_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="technology",
+            index=models.Index(
+                fields=["-public_project_count", "name"], name="technology_popular_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
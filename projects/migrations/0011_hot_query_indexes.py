@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 18:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0010_image_digest"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["-timestamp", "-id"],
+                name="project_public_recent_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                fields=["owner", "-timestamp", "-id"], name="project_owner_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["project", "-created_at", "-id"],
+                name="review_project_recent_idx",
+            ),
+        ),
+    ]
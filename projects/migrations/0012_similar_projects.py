@@ -0,0 +1,77 @@
+# Generated by Django 5.2 on 2026-10-18 18:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0011_hot_query_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarProject",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+            ],
+            options={
+                "ordering": ["project_id", "-score", "similar_id"],
+            },
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="similar_stale",
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                condition=models.Q(("similar_stale", True)),
+                fields=["id"],
+                name="project_similar_stale_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="similarproject",
+            name="project",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="similar_projects",
+                to="projects.project",
+            ),
+        ),
+        migrations.AddField(
+            model_name="similarproject",
+            name="similar",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="projects.project",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="similarproject",
+            index=models.Index(
+                fields=["project", "-score", "similar"], name="similar_project_rank_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="similarproject",
+            constraint=models.UniqueConstraint(
+                fields=("project", "similar"), name="unique_similar_project"
+            ),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.2 on 2026-10-18 18:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0012_similar_projects"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrendingEpoch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("started_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="TrendingEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("star", "Star"),
+                            ("view", "View"),
+                            ("review", "Review"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="trending_score",
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                condition=models.Q(("is_public", True), ("trending_score__gt", 0)),
+                fields=["-trending_score", "-id"],
+                name="project_trending_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="trendingevent",
+            name="project",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="trending_events",
+                to="projects.project",
+            ),
+        ),
+        migrations.AddField(
+            model_name="trendingevent",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trendingevent",
+            index=models.Index(
+                fields=["project", "user"], name="trending_event_user_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 18:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0013_trending"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["updated_at"],
+                name="project_public_updated_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                fields=["owner", "updated_at"], name="project_owner_updated_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 18:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0014_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="edited_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+def fill_keys(apps, schema_editor):
+    # Names only differing by case outside ASCII slipped past the LOWER()
+    # constraint, keep the oldest spelling and move its projects over
+    Technology = apps.get_model("projects", "Technology")
+    Through = apps.get_model("projects", "Project").technologies.through
+    keep = {}
+    for technology in Technology.objects.order_by("pk"):
+        key = technology.name.casefold()[:200]
+        kept = keep.setdefault(key, technology.pk)
+        if kept == technology.pk:
+            technology.key = key
+            technology.save(update_fields=["key"])
+            continue
+        existing = set(
+            Through.objects.filter(technology_id=kept).values_list(
+                "project_id", flat=True
+            )
+        )
+        Through.objects.filter(
+            technology_id=technology.pk, project_id__in=existing
+        ).delete()
+        Through.objects.filter(technology_id=technology.pk).update(technology_id=kept)
+        technology.delete()
+        Technology.objects.filter(pk=kept).update(
+            public_project_count=Through.objects.filter(
+                technology_id=kept, project__is_public=True
+            ).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0015_project_edited_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="technology",
+            name="key",
+            field=models.CharField(default="", editable=False, max_length=200),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_keys, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name="technology",
+            name="unique_technology_name_ci",
+        ),
+        migrations.AlterField(
+            model_name="technology",
+            name="key",
+            field=models.CharField(editable=False, max_length=200, unique=True),
+        ),
+    ]
@@ -1,15 +1,85 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Value
+from django.utils import timezone
+from django.utils.timesince import timesince
 
 from accounts.models import User
+from hub import images
 
 
 # Technology model related to a project
 class Technology(models.Model):
     name = models.CharField(max_length=200, unique=True)
 
+    # Case folded name, set on save. The database's LOWER() only folds ASCII
+    # letters on some engines, so names are never compared with it.
+    key = models.CharField(max_length=200, unique=True, editable=False)
+
+    # Number of public projects using the technology, kept by signals
+    public_project_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-public_project_count", "name"],
+                name="technology_popular_idx",
+            )
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.key = self.make_key(self.name)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def make_key(name):
+        """
+        Return the key of a technology name, equal for names that only differ
+        by case in any alphabet.
+
+        :param name (string): Display name.
+        :return: Case folded name.
+        """
+        return name.casefold()[:200]
+
+
+# Reusable query building blocks for project listings
+class ProjectQuerySet(models.QuerySet):
+    def public(self):
+        return self.filter(is_public=True)
+
+    def with_star_state(self, user):
+        """
+        Annotate ``is_starred`` telling whether ``user`` starred each project.
+
+        The check is a correlated EXISTS on the stars through table, so the
+        stargazer list is never loaded no matter how many stars a project has.
+
+        :param user: The requesting user, possibly anonymous.
+        :return: QuerySet annotated with a boolean ``is_starred``.
+        """
+        if not user.is_authenticated:
+            return self.annotate(is_starred=Value(False))
+        stars = self.model.stars.through.objects.filter(
+            project=OuterRef("pk"), user=user
+        )
+        return self.annotate(is_starred=Exists(stars))
+
+    def feed(self, user):
+        """
+        Build the main feed: public projects of other users with their owner
+        joined in and star state annotated, ready for a single page query.
+
+        :param user: The requesting user, possibly anonymous.
+        :return: QuerySet of feed projects.
+        """
+        projects = self.public().select_related("owner")
+        if user.is_authenticated:
+            projects = projects.exclude(owner=user)
+        return projects.with_star_state(user)
+
 
 # Project created by a user
 class Project(models.Model):
@@ -20,6 +90,7 @@ class Project(models.Model):
     video_url = models.URLField(blank=True)
     github_url = models.URLField(blank=True)
     image = models.ImageField(blank=True, upload_to="media")
+    image_digest = models.CharField(max_length=32, blank=True, editable=False)
     objectives = models.TextField(blank=True)
     key_learning = models.TextField(blank=True)
     is_public = models.BooleanField(default=True)
@@ -30,14 +101,125 @@ class Project(models.Model):
         User, related_name="viewed_projects", blank=True, editable=False
     )
     stars = models.ManyToManyField(User, related_name="starred_projects", blank=True)
+    star_count = models.PositiveIntegerField(default=0, editable=False)
+    viewer_count = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    # Set when the technologies or visibility change, until similar projects
+    # are recomputed by the similar_projects command
+    similar_stale = models.BooleanField(default=True, editable=False)
+    # Decayed activity relative to TrendingEpoch, kept by projects.trending
+    trending_score = models.FloatField(default=0, editable=False)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Bumped by edits and by counter updates, versions the rendered pages
+    updated_at = models.DateTimeField(auto_now=True)
+    # Bumped by edits and tag changes only, versions cached template fragments
+    edited_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = ProjectQuerySet.as_manager()
 
     class Meta:
-        ordering = ["-timestamp"]
+        ordering = ["-timestamp", "-id"]
+        indexes = [
+            # Main feed, newest public projects first
+            models.Index(
+                fields=["-timestamp", "-id"],
+                condition=models.Q(is_public=True),
+                name="project_public_recent_idx",
+            ),
+            # A user's projects on their dashboard, newest first
+            models.Index(
+                fields=["owner", "-timestamp", "-id"], name="project_owner_recent_idx"
+            ),
+            models.Index(
+                fields=["id"],
+                condition=models.Q(similar_stale=True),
+                name="project_similar_stale_idx",
+            ),
+            # Trending feed, public projects with recent activity
+            models.Index(
+                fields=["-trending_score", "-id"],
+                condition=models.Q(is_public=True, trending_score__gt=0),
+                name="project_trending_idx",
+            ),
+            # Latest change of the feed and of a user's projects
+            models.Index(
+                fields=["updated_at"],
+                condition=models.Q(is_public=True),
+                name="project_public_updated_idx",
+            ),
+            models.Index(
+                fields=["owner", "updated_at"], name="project_owner_updated_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"project: {self.title}, created by {self.owner.username}."
 
+    # Resized renditions of the preview image, None until they are rendered
+    @property
+    def image_derivatives(self):
+        if self.image and self.image_digest:
+            return images.Derivatives(images.PREVIEW, self.image_digest)
+        return None
+
+
+# Public project sharing technologies with another, scored by cosine similarity
+class SimilarProject(models.Model):
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="similar_projects"
+    )
+    similar = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ["project_id", "-score", "similar_id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project", "similar"], name="unique_similar_project"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["project", "-score", "similar"], name="similar_project_rank_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.similar_id} is similar to {self.project_id}"
+
+
+# Star, unique view or review counted towards a project's trending score
+class TrendingEvent(models.Model):
+    class Kind(models.TextChoices):
+        STAR = "star"
+        VIEW = "view"
+        REVIEW = "review"
+
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="trending_events"
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+", null=True, blank=True
+    )
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "user"], name="trending_event_user_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.kind} on {self.project_id} at {self.created_at}"
+
+
+# Time trending scores are expressed relative to, moved by each recompute
+class TrendingEpoch(models.Model):
+    started_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Trending scores since {self.started_at}"
+
 
 # User adds a review on a project
 class Review(models.Model):
@@ -49,7 +231,77 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            # A project's reviews, newest first
+            models.Index(
+                fields=["project", "-created_at", "-id"],
+                name="review_project_recent_idx",
+            )
+        ]
 
     def __str__(self):
         return f"Review by {self.user.username} on {self.project.title}"
+
+    def serializer(self):
+        return {
+            "id": self.id,
+            "content": self.content,
+            "created_at": self.created_at.isoformat(),
+            "timesince": timesince(self.created_at),
+            "user": {
+                "username": self.user.username,
+                "photo": self.user.photo_url(64),
+            },
+        }
+
+
+# Public project pushed into a follower's personal timeline
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="timeline")
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    # Copy of project.timestamp so a page is one range scan on the index
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-timestamp", "-project_id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "project"], name="unique_timeline_entry"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-timestamp", "-project"], name="timeline_recent_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.project.title} in {self.user.username}'s timeline"
+
+
+# HyperLogLog sketch of a project's viewers, all-time when day is empty
+class ViewSketch(models.Model):
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="view_sketches"
+    )
+    day = models.DateField(null=True, blank=True)
+    sketch = models.BinaryField(default=b"")
+
+    class Meta:
+        ordering = ["project", "-day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project", "day"], name="unique_daily_view_sketch"
+            ),
+            models.UniqueConstraint(
+                fields=["project"],
+                condition=models.Q(day__isnull=True),
+                name="unique_total_view_sketch",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Viewers of {self.project_id} on {self.day or 'all days'}"
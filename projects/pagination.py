@@ -0,0 +1,175 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+# A single page of results produced by CursorPaginator
+class CursorPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over a queryset.
+
+    Pages are located with a WHERE clause on the ordering columns instead of
+    OFFSET, and no COUNT(*) is issued, so every page costs the same however
+    deep it is. The ordering must be unique, end it with the primary key.
+
+    :param queryset: The QuerySet to paginate.
+    :param per_page (int): Maximum number of objects on a page.
+    :param ordering (tuple): Field names, prefixed with "-" for descending.
+    """
+
+    def __init__(self, queryset, per_page, ordering=("-timestamp", "-id")):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip("-")) for name in ordering
+        ]
+
+    def get_page(self, cursor=None):
+        """
+        Return the page for ``cursor``, falling back to the first page when the
+        cursor is missing or malformed.
+
+        :param cursor (string): Opaque token from a previous page.
+        :return: CursorPage with next and previous tokens.
+        """
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
+
+    def page(self, cursor=None):
+        """
+        Return the page for ``cursor``.
+
+        :param cursor (string): Opaque token from a previous page.
+        :raises InvalidCursor: If the token can't be decoded.
+        :return: CursorPage with next and previous tokens.
+        """
+        if not cursor:
+            rows = list(self.queryset.order_by(*self.ordering)[: self.per_page + 1])
+            return CursorPage(
+                rows[: self.per_page],
+                next_cursor=self._next(rows),
+            )
+
+        values, backwards = self.decode(cursor)
+        rows = self.queryset.filter(self._seek(values, backwards))
+        if backwards:
+            # Walk the ordering in reverse, then flip the page back around
+            rows = list(rows.order_by(*self._reversed())[: self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[: self.per_page][::-1]
+            return CursorPage(
+                rows,
+                next_cursor=self.encode(rows[-1]) if rows else None,
+                previous_cursor=self.encode(rows[0], backwards=True)
+                if more
+                else None,
+            )
+
+        rows = list(rows.order_by(*self.ordering)[: self.per_page + 1])
+        return CursorPage(
+            rows[: self.per_page],
+            next_cursor=self._next(rows),
+            previous_cursor=self.encode(rows[0], backwards=True) if rows else None,
+        )
+
+    def encode(self, obj, backwards=False):
+        """
+        Build the token pointing just past ``obj`` in the given direction.
+
+        :param obj: Model instance from the paginated queryset.
+        :param backwards (bool): Point towards the start of the ordering.
+        :return: URL safe opaque token.
+        """
+        values = []
+        for field in self.fields:
+            value = getattr(obj, field.attname)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        payload = json.dumps({"v": values, "b": backwards}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode(self, cursor):
+        """
+        Turn a token back into typed ordering values.
+
+        :param cursor (string): Token produced by ``encode``.
+        :raises InvalidCursor: If the token is malformed.
+        :return: Tuple of (values, backwards).
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values = [
+                field.to_python(value)
+                for field, value in zip(self.fields, payload["v"], strict=True)
+            ]
+            # to_python lets nulls through, they can't be compared against
+            if None in values:
+                raise ValueError("Cursor values can't be null.")
+            return values, bool(payload["b"])
+        except (
+            AttributeError,
+            binascii.Error,
+            FieldDoesNotExist,
+            KeyError,
+            TypeError,
+            ValueError,
+            ValidationError,
+        ) as error:
+            raise InvalidCursor(cursor) from error
+
+    def _next(self, rows):
+        if len(rows) > self.per_page:
+            return self.encode(rows[self.per_page - 1])
+        return None
+
+    def _reversed(self):
+        return [
+            name[1:] if name.startswith("-") else f"-{name}" for name in self.ordering
+        ]
+
+    def _seek(self, values, backwards):
+        # (a, b) after (x, y) is: a past x, or a equal x and b past y
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            descending = name.startswith("-") != backwards
+            lookup = "lt" if descending else "gt"
+            step = Q(**{f"{name.lstrip('-')}__{lookup}": values[index]})
+            for previous, value in zip(self.ordering[:index], values):
+                step &= Q(**{previous.lstrip("-"): value})
+            condition |= step
+        return condition
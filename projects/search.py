@@ -0,0 +1,222 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Project
+
+# Columns indexed for every project, in FTS5 column order
+FIELDS = ("title", "overview", "description", "key_learning", "technologies")
+
+
+def terms(query):
+    """
+    Split a user query into plain word terms, dropping any search syntax.
+
+    :param query (string): Raw text typed by the user.
+    :return: List of terms, at most 10.
+    """
+    return re.findall(r"\w+", query.lower())[:10]
+
+
+def documents(project_ids=None):
+    """
+    Yield the searchable text of projects, technologies flattened to names.
+
+    :param project_ids (iterable): Limit to these projects, all when None.
+    :return: Iterator of (project id, dict of field text).
+    """
+    projects = Project.objects.order_by("pk").prefetch_related("technologies")
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+    for project in projects.iterator(chunk_size=500):
+        document = {field: getattr(project, field) for field in FIELDS[:-1]}
+        document["technologies"] = " ".join(
+            tech.name for tech in project.technologies.all()
+        )
+        yield project.pk, document
+
+
+# SQLite FTS5 virtual table whose rowid is the project id
+class SQLiteSearchBackend:
+    table = "projects_search"
+
+    def __init__(self, using):
+        self.using = using
+
+    def index(self, items):
+        rows = [(pk, *(doc[field] for field in FIELDS)) for pk, doc in items]
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE rowid = %s", [row[:1] for row in rows]
+            )
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, {', '.join(FIELDS)}) "
+                f"VALUES (%s, {', '.join(['%s'] * len(FIELDS))})",
+                rows,
+            )
+
+    def remove(self, project_ids):
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE rowid = %s",
+                [(pk,) for pk in project_ids],
+            )
+
+    def clear(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def search(self, words, user_id, limit, offset):
+        # Every term must match, as a prefix, ranked by weighted BM25
+        match = " ".join(f'"{word}"*' for word in words)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT s.rowid FROM {self.table} s "
+                f"JOIN {Project._meta.db_table} p ON p.id = s.rowid "
+                f"WHERE {self.table} MATCH %s AND (p.is_public OR p.owner_id = %s) "
+                f"ORDER BY bm25({self.table}, 10.0, 4.0, 1.0, 2.0, 8.0), s.rowid DESC "
+                "LIMIT %s OFFSET %s",
+                [match, user_id, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+# PostgreSQL tsvector column on the projects table with a GIN index
+class PostgresSearchBackend:
+    column = "search_document"
+    weights = {
+        "title": "A",
+        "technologies": "A",
+        "overview": "B",
+        "key_learning": "C",
+        "description": "D",
+    }
+
+    def __init__(self, using):
+        self.using = using
+
+    def index(self, items):
+        vector = " || ".join(
+            f"setweight(to_tsvector('english', %s), '{self.weights[field]}')"
+            for field in FIELDS
+        )
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {Project._meta.db_table} SET {self.column} = {vector} "
+                "WHERE id = %s",
+                [(*(doc[field] for field in FIELDS), pk) for pk, doc in items],
+            )
+
+    def remove(self, project_ids):
+        # The document is dropped together with the project row
+        pass
+
+    def clear(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"UPDATE {Project._meta.db_table} SET {self.column} = NULL")
+
+    def search(self, words, user_id, limit, offset):
+        # Every term must match, as a prefix, ranked by cover density
+        query = " & ".join(f"{word}:*" for word in words)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT p.id FROM {Project._meta.db_table} p, "
+                "to_tsquery('english', %s) q "
+                f"WHERE p.{self.column} @@ q AND (p.is_public OR p.owner_id = %s) "
+                f"ORDER BY ts_rank_cd(p.{self.column}, q) DESC, p.id DESC "
+                "LIMIT %s OFFSET %s",
+                [query, user_id, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_backend(using):
+    """
+    Return the search backend for a database alias.
+
+    :param using (string): Database alias.
+    :return: Backend instance, or None if the engine isn't supported.
+    """
+    backend = BACKENDS.get(connections[using].vendor)
+    return backend(using) if backend else None
+
+
+def index_projects(project_ids):
+    """
+    Write the search documents of the given projects.
+
+    :param project_ids (iterable): Primary keys of the projects to index.
+    """
+    backend = get_backend(router.db_for_write(Project))
+    if backend and project_ids:
+        backend.index(documents(project_ids))
+
+
+def remove_projects(project_ids):
+    """
+    Drop the search documents of deleted projects.
+
+    :param project_ids (iterable): Primary keys of the removed projects.
+    """
+    backend = get_backend(router.db_for_write(Project))
+    if backend and project_ids:
+        backend.remove(project_ids)
+
+
+def rebuild(batch_size=500):
+    """
+    Re-index every project from scratch.
+
+    :param batch_size (int): Number of projects written per batch.
+    :return: Number of projects indexed.
+    """
+    backend = get_backend(router.db_for_write(Project))
+    if backend is None:
+        return 0
+
+    backend.clear()
+    total, batch = 0, []
+    for item in documents():
+        batch.append(item)
+        if len(batch) >= batch_size:
+            backend.index(batch)
+            total, batch = total + len(batch), []
+    backend.index(batch)
+    return total + len(batch)
+
+
+def search(query, user, page=1, per_page=10):
+    """
+    Rank projects matching ``query`` that ``user`` is allowed to see.
+
+    :param query (string): Raw text typed by the user.
+    :param user: The requesting user, possibly anonymous.
+    :param page (int): 1-based page number.
+    :param per_page (int): Maximum number of projects on the page.
+    :return: Tuple of (projects in rank order, has next page).
+    """
+    words = terms(query)
+    backend = get_backend(router.db_for_read(Project))
+    if not words or backend is None:
+        return [], False
+
+    # Fetch one extra id to know whether another page exists, no COUNT
+    ids = backend.search(words, user.pk or 0, per_page + 1, (page - 1) * per_page)
+    more, ids = len(ids) > per_page, ids[:per_page]
+
+    # Re-check visibility on the loaded rows as well
+    visible = Q(is_public=True) | Q(owner_id=user.pk or 0)
+    loaded = (
+        Project.objects.filter(visible)
+        .select_related("owner")
+        .with_star_state(user)
+        .in_bulk(ids)
+    )
+    return [loaded[pk] for pk in ids if pk in loaded], more
@@ -0,0 +1,167 @@
+from django.db.models import Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import User
+from hub.conditional import touch
+from hub.counters import M2MCounter, adjusted
+
+from . import search, similar, timeline, trending
+from .models import (
+    Project,
+    Review,
+    SimilarProject,
+    Technology,
+    TimelineEntry,
+    TrendingEvent,
+)
+
+
+star_counter = M2MCounter(Project.stars.field, source_counter="star_count")
+# Views happen all the time and the feed doesn't show them, the pages showing
+# viewer_count read it in their version stamps
+viewer_counter = M2MCounter(
+    Project.viewers.field, source_counter="viewer_count", stamp=False
+)
+technology_counter = M2MCounter(
+    Project.technologies.field,
+    target_counter="public_project_count",
+    condition=Q(is_public=True),
+)
+
+star_counter.connect()
+viewer_counter.connect()
+technology_counter.connect()
+
+
+@receiver(post_save, sender=Review)
+def review_created(sender, instance, created, **kwargs):
+    if created:
+        Project.objects.filter(pk=instance.project_id).update(
+            review_count=adjusted("review_count", 1), **touch(Project)
+        )
+        trending.record(
+            TrendingEvent.Kind.REVIEW, [(instance.project_id, instance.user_id)]
+        )
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    Project.objects.filter(pk=instance.project_id).update(
+        review_count=adjusted("review_count", -1), **touch(Project)
+    )
+    trending.forget(
+        TrendingEvent.Kind.REVIEW,
+        instance.project_id,
+        instance.user_id,
+        after=instance.created_at,
+    )
+
+
+@receiver(m2m_changed, sender=User.followers.through)
+def follow_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Forward calls change the followers of instance, reverse calls change
+    # the users instance follows.
+    if action == "post_clear":
+        if reverse:
+            TimelineEntry.objects.filter(user=instance).delete()
+        else:
+            TimelineEntry.objects.filter(project__owner=instance).delete()
+        return
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+
+    update = timeline.subscribe if action == "post_add" else timeline.unsubscribe
+    if reverse:
+        for owner in User.objects.filter(pk__in=pk_set):
+            update(owner, [instance.pk])
+    else:
+        update(instance, pk_set)
+
+
+def count_technologies(project, delta, **filters):
+    Technology.objects.filter(projects=project, **filters).update(
+        public_project_count=adjusted("public_project_count", delta)
+    )
+
+
+@receiver(pre_save, sender=Project)
+def project_saving(sender, instance, update_fields=None, **kwargs):
+    # Full saves come from edits, their cached fragments are stale
+    if update_fields is None:
+        instance.edited_at = timezone.now()
+
+    # Remember the stored visibility to count the project's tags on changes
+    if instance.pk and (update_fields is None or "is_public" in update_fields):
+        instance._was_public = (
+            Project.objects.filter(pk=instance.pk)
+            .values_list("is_public", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, update_fields=None, **kwargs):
+    was_public = instance.__dict__.pop("_was_public", None)
+    if was_public is not None and was_public != instance.is_public:
+        count_technologies(instance, 1 if instance.is_public else -1)
+        # Keep the flag on the instance too, a later save writes it back
+        instance.similar_stale = True
+        similar.mark_stale([instance.pk])
+        # The feed stamps only see public projects, and other projects list
+        # this one as similar, bump the pages that show or hide it
+        User.objects.filter(pk=instance.owner_id).update(**touch(User))
+        Project.objects.filter(
+            pk__in=SimilarProject.objects.filter(similar=instance).values("project")
+        ).update(**touch(Project))
+
+    # Only the indexed text matters to search, not counters or visibility
+    if update_fields is None or set(update_fields) & set(search.FIELDS):
+        search.index_projects([instance.pk])
+
+
+@receiver(pre_delete, sender=Project)
+def project_deleting(sender, instance, **kwargs):
+    # Tag rows are deleted without m2m signals, uncount them beforehand
+    count_technologies(instance, -1, projects__is_public=True)
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    search.remove_projects([instance.pk])
+    # The owner's dashboard lost a project, no remaining row says so
+    User.objects.filter(pk=instance.owner_id).update(**touch(User))
+
+
+@receiver(m2m_changed, sender=Project.technologies.through)
+def technologies_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Reverse calls come from a technology and name the affected projects
+    if reverse and action == "pre_clear":
+        instance._cleared_projects = list(
+            instance.projects.values_list("pk", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        instance.similar_stale = True
+        changed = [instance.pk]
+    elif action == "post_clear":
+        changed = instance.__dict__.pop("_cleared_projects", [])
+    else:
+        changed = pk_set or []
+
+    search.index_projects(changed)
+    similar.mark_stale(changed)
+    if changed:
+        Project.objects.filter(pk__in=changed).update(
+            edited_at=timezone.now(), **touch(Project)
+        )
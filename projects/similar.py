@@ -0,0 +1,162 @@
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from hub.conditional import touch
+
+from .models import Project, SimilarProject
+
+# Neighbours stored per project
+NEIGHBOURS = 10
+
+# Scores are rounded to this many digits so equal similarities tie exactly
+PRECISION = 6
+
+
+def technology_matrix():
+    """
+    Build the public project × technology matrix from the tag rows.
+
+    Rows are scaled to unit length, so the product of two rows is the cosine
+    similarity of the projects: shared technologies over the geometric mean
+    of their technology counts.
+
+    :return: Tuple of (sorted project ids, CSR matrix with one row per id).
+    """
+    pairs = np.array(
+        Project.technologies.through.objects.filter(
+            project__is_public=True
+        ).values_list("project_id", "technology_id"),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    project_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    technology_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs)), (rows, columns)),
+        shape=(len(project_ids), len(technology_ids)),
+    )
+    lengths = np.sqrt(np.asarray(matrix.sum(axis=1)).ravel())
+    return project_ids, sparse.diags(1 / lengths) @ matrix
+
+
+def top_neighbours(matrix, rows, k=NEIGHBOURS, chunk_size=500):
+    """
+    Find the ``k`` most similar rows of ``matrix`` for each of ``rows``.
+
+    Similarities of a chunk of rows against every row are one sparse matrix
+    product, only pairs sharing a technology are ever materialized. Ties are
+    broken by the lower row index, so results are stable.
+
+    :param matrix: Row normalized CSR matrix from ``technology_matrix``.
+    :param rows: Indexes of the rows to compute.
+    :param k (int): Neighbours kept per row.
+    :param chunk_size (int): Rows multiplied at once, bounding memory.
+    :return: Iterator of (row, neighbour rows, scores), best first.
+    """
+    transposed = matrix.T.tocsc()
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start : start + chunk_size]
+        scores = (matrix[chunk] @ transposed).tocsr()
+        for offset, row in enumerate(chunk):
+            begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+            columns = scores.indices[begin:end]
+            values = np.rint(scores.data[begin:end] * 10**PRECISION).astype(np.int64)
+            keep = columns != row
+            columns, values = columns[keep], values[keep]
+
+            # Only candidates tying with the k-th best need to be sorted
+            if len(values) > k:
+                threshold = np.partition(values, len(values) - k)[len(values) - k]
+                keep = values >= threshold
+                columns, values = columns[keep], values[keep]
+            order = np.lexsort((columns, -values))[:k]
+            yield row, columns[order], values[order] / 10**PRECISION
+
+
+def refresh(rebuild=False, k=NEIGHBOURS, chunk_size=500):
+    """
+    Recompute the similar projects of stale projects.
+
+    Stale flags are cleared before the tags are read, so a project changed
+    during the run is picked up again by the next one. Projects that are
+    private or have no technologies lose their neighbours.
+
+    :param rebuild (bool): Recompute every project, not only stale ones.
+    :param k (int): Neighbours stored per project.
+    :param chunk_size (int): Projects computed and written per batch.
+    :return: Number of projects recomputed.
+    """
+    stale = (
+        Project.objects.all() if rebuild else Project.objects.filter(similar_stale=True)
+    )
+    stale_ids = np.array(stale.values_list("pk", flat=True), dtype=np.int64)
+    if not len(stale_ids):
+        return 0
+    for start in range(0, len(stale_ids), chunk_size):
+        Project.objects.filter(
+            pk__in=stale_ids[start : start + chunk_size].tolist()
+        ).update(similar_stale=False)
+
+    project_ids, matrix = technology_matrix()
+    rows = np.flatnonzero(np.isin(project_ids, stale_ids))
+
+    # Stale projects outside the matrix have no similar projects anymore
+    gone = np.setdiff1d(stale_ids, project_ids).tolist()
+    for start in range(0, len(gone), chunk_size):
+        SimilarProject.objects.filter(
+            project__in=gone[start : start + chunk_size]
+        ).delete()
+
+    batch = []
+    for row, neighbours, scores in top_neighbours(matrix, rows, k, chunk_size):
+        batch.append((int(project_ids[row]), project_ids[neighbours], scores))
+        if len(batch) >= chunk_size:
+            store(batch)
+            batch = []
+    store(batch)
+    return len(rows)
+
+
+def store(batch):
+    """
+    Replace the stored neighbours of a batch of projects, bumping their
+    ``updated_at`` since their detail page shows them.
+
+    :param batch: List of (project id, neighbour ids, scores).
+    """
+    project_ids = [project_id for project_id, _, _ in batch]
+    with transaction.atomic():
+        SimilarProject.objects.filter(project__in=project_ids).delete()
+        SimilarProject.objects.bulk_create(
+            SimilarProject(project_id=project_id, similar_id=int(similar), score=score)
+            for project_id, neighbours, scores in batch
+            for similar, score in zip(neighbours, scores.tolist())
+        )
+        Project.objects.filter(pk__in=project_ids).update(**touch(Project))
+
+
+def mark_stale(project_ids):
+    """
+    Flag projects whose similar projects must be recomputed.
+
+    :param project_ids (iterable): Primary keys of the changed projects.
+    """
+    if project_ids:
+        Project.objects.filter(pk__in=project_ids).update(similar_stale=True)
+
+
+def similar_to(project, limit=4):
+    """
+    Return the stored similar projects of ``project`` that are still public.
+
+    :param project: The displayed project.
+    :param limit (int): Maximum number of projects.
+    :return: List of projects with their owner joined in, best first.
+    """
+    rows = (
+        SimilarProject.objects.filter(project=project, similar__is_public=True)
+        .select_related("similar__owner")
+        .order_by("-score", "similar_id")[:limit]
+    )
+    return [row.similar for row in rows]
@@ -0,0 +1,62 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from . import trending
+from .models import Project, TrendingEvent
+from .signals import star_counter
+
+
+def toggle_star(project_id, user_id):
+    """
+    Star or unstar a project for a user.
+
+    The decision is one indexed DELETE on the stars through table: if it
+    removed a row the project was starred, otherwise a row is inserted. A
+    concurrent request inserting the same row first is treated as starred.
+
+    :param project_id (int): Primary key of the project.
+    :param user_id (int): Primary key of the user.
+    :return: Tuple of (starred, star count).
+    """
+    through = Project.stars.through
+    pair = [(project_id, user_id)]
+    with transaction.atomic():
+        removed, _ = through.objects.filter(
+            project_id=project_id, user_id=user_id
+        ).delete()
+        if removed:
+            star_counter.decrement(pair)
+            trending.forget(TrendingEvent.Kind.STAR, project_id, user_id)
+            starred = False
+        else:
+            try:
+                with transaction.atomic():
+                    through.objects.create(project_id=project_id, user_id=user_id)
+            except IntegrityError:
+                pass
+            else:
+                star_counter.increment(pair)
+                trending.record(TrendingEvent.Kind.STAR, pair)
+            starred = True
+
+        count = Project.objects.values_list("star_count", flat=True).get(pk=project_id)
+    return starred, count
+
+
+def star_states(user, project_ids):
+    """
+    Look up star state and counts for many projects in one query.
+
+    :param user: The requesting user, possibly anonymous.
+    :param project_ids (iterable): Primary keys of the projects.
+    :return: Dictionary mapping project id to {"starred", "count"}.
+    """
+    visible = Q(is_public=True)
+    if user.is_authenticated:
+        visible |= Q(owner=user)
+    rows = (
+        Project.objects.filter(visible, pk__in=project_ids)
+        .with_star_state(user)
+        .values_list("pk", "is_starred", "star_count")
+    )
+    return {pk: {"starred": starred, "count": count} for pk, starred, count in rows}
@@ -24,6 +24,12 @@ document.addEventListener('DOMContentLoaded', function () {
         reviewBtn.addEventListener('click', review);
     }
 
+    // Load more reviews on scroll
+    const reviewsContainer = document.querySelector('#reviews-container');
+    if (reviewsContainer) {
+        reviewsContainer.addEventListener('scroll', load_reviews);
+    }
+
     // Image Upload
     const photoForm = document.querySelector('#photo-form');
     if (photoForm) {
@@ -145,14 +151,69 @@ function review() {
     .then(resposne => resposne.json())
     .then(result => {
         console.log(result);
-        document.getElementById('review').value = '';
-        window.location.reload();
+        if (result.review) {
+            const container = document.getElementById('reviews-container');
+            const empty = document.getElementById('no-reviews');
+            if (empty) {
+                empty.remove();
+            }
+            container.prepend(review_element(result.review, container.dataset.defaultPhoto));
+            document.getElementById('review').value = '';
+        }
     })
     .catch(error => {
         console.log(error);
     });
 };
 
+function load_reviews() {
+    const container = this;
+
+    // Fetch the next page once the list is scrolled near its end
+    const nearEnd = container.scrollTop + container.clientHeight >= container.scrollHeight - 50;
+    if (!nearEnd || !container.dataset.next || container.dataset.loading) {
+        return;
+    }
+    container.dataset.loading = 'true';
+
+    fetch(`/project/${container.dataset.id}/reviews/?cursor=${container.dataset.next}`)
+    .then(response => response.json())
+    .then(result => {
+        result.reviews.forEach(item => {
+            container.append(review_element(item, container.dataset.defaultPhoto));
+        });
+        container.dataset.next = result.next || '';
+        delete container.dataset.loading;
+    })
+    .catch(error => {
+        console.log('Error:', error);
+        delete container.dataset.loading;
+    });
+};
+
+function review_element(item, defaultPhoto) {
+    const element = document.createElement('div');
+    element.className = 'p-3 border-bottom';
+    element.innerHTML = `
+        <div class="d-flex justify-content-between align-items-center mb-2">
+            <div>
+                <img class="rounded-circle me-2" style="width: 32px; height: 32px; object-fit: cover;">
+                <span class="mb-0 fw-semibold small"></span>
+            </div>
+            <small class="text-muted"></small>
+        </div>
+        <p class="mb-0 small"></p>`;
+
+    // Fill user supplied values as text so they are never parsed as HTML
+    const image = element.querySelector('img');
+    image.src = item.user.photo || defaultPhoto;
+    image.alt = item.user.username;
+    element.querySelector('span').textContent = item.user.username;
+    element.querySelector('small').textContent = `${item.timesince} ago`;
+    element.querySelector('p').textContent = item.content;
+    return element;
+};
+
 function upload_photo() {
     const image = document.querySelector('#photo-upload')
 
@@ -0,0 +1,89 @@
+from .models import Technology
+
+
+def normalize(text):
+    """
+    Parse a comma separated list of technology names.
+
+    Whitespace is collapsed and names that only differ by case are merged,
+    keeping the first spelling.
+
+    :param text (string): Raw value of the technologies form field.
+    :return: Dictionary mapping ``Technology.key`` to display name, in input
+        order.
+    """
+    names = {}
+    for raw in (text or "").split(","):
+        name = " ".join(raw.split())[:200]
+        if name:
+            names.setdefault(Technology.make_key(name), name)
+    return names
+
+
+def technology_ids(names):
+    """
+    Resolve technology names to primary keys, creating the missing ones.
+
+    :param names (dict): Key to display name, as from ``normalize``.
+    :return: Set of technology primary keys.
+    """
+    if not names:
+        return set()
+
+    def lookup(keys):
+        return dict(Technology.objects.filter(key__in=keys).values_list("key", "pk"))
+
+    found = lookup(names)
+    missing = [key for key in names if key not in found]
+    if missing:
+        # Another request may create the same names, conflicts are ignored
+        Technology.objects.bulk_create(
+            [Technology(name=names[key], key=key) for key in missing],
+            ignore_conflicts=True,
+        )
+        found.update(lookup(missing))
+    return set(found.values())
+
+
+def sync_technologies(project, text):
+    """
+    Make a project's technologies match the form input, writing only the diff.
+
+    :param project: The saved project.
+    :param text (string): Raw value of the technologies form field.
+    """
+    wanted = technology_ids(normalize(text))
+    current = set(project.technologies.values_list("pk", flat=True))
+    if removed := current - wanted:
+        project.technologies.remove(*removed)
+    if added := wanted - current:
+        project.technologies.add(*added)
+
+
+def find_technologies(names):
+    """
+    Look up technologies by name, ignoring case.
+
+    :param names (iterable): Names as typed or linked.
+    :return: List of technologies in the given order, unknown names skipped.
+    """
+    keys = normalize(",".join(names))
+    found = {tech.key: tech for tech in Technology.objects.filter(key__in=keys)}
+    return [found[key] for key in keys if key in found]
+
+
+def popular(limit=30):
+    """
+    Return the technologies used by the most public projects.
+
+    Reads the materialized counts through ``technology_popular_idx``, no
+    aggregation over the tag rows.
+
+    :param limit (int): Maximum number of technologies.
+    :return: QuerySet of (name, public_project_count) tuples.
+    """
+    return (
+        Technology.objects.filter(public_project_count__gt=0)
+        .order_by("-public_project_count", "name")
+        .values_list("name", "public_project_count")[:limit]
+    )
@@ -0,0 +1,32 @@
+from hub import images
+from jobs.queue import register
+
+from . import timeline
+from .models import Project
+
+
+@register
+def render_image(project_id):
+    """
+    Render the preview renditions of a project's image.
+
+    :param project_id (int): Primary key of the project, gone projects are skipped.
+    """
+    project = Project.objects.filter(pk=project_id).only("pk", "image").first()
+    if project is not None:
+        images.derive(project, "image", images.PREVIEW)
+
+
+@register
+def fan_out(project_id):
+    """
+    Push a project into its owner's followers' timelines.
+
+    Visibility is read when the job runs, a project made private in the
+    meantime is not distributed.
+
+    :param project_id (int): Primary key of the project.
+    """
+    project = Project.objects.select_related("owner").filter(pk=project_id).first()
+    if project is not None:
+        timeline.fan_out(project)
@@ -0,0 +1,39 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(field_file, derivatives, width, sizes=None, **attrs):
+    """
+    Render an image with WebP and JPEG renditions in ``srcset``.
+
+    Falls back to the original file when no renditions exist yet.
+
+    Usage: {% picture user.photo user.photo_derivatives 40 alt="..." class="..." %}
+
+    :param field_file: FieldFile of the original image.
+    :param derivatives: Derivatives of the image, or None.
+    :param width (int): Displayed width in CSS pixels.
+    :param sizes (string): ``sizes`` attribute, defaults to the fixed width.
+    :param attrs: Extra attributes of the <img> element.
+    :return: Safe HTML.
+    """
+    if derivatives is None:
+        return format_html("<img{}>", flatatt({"src": field_file.url, **attrs}))
+
+    sizes = sizes or f"{width}px"
+    return format_html(
+        '<picture><source type="image/webp"{}><img{}></picture>',
+        flatatt({"srcset": derivatives.srcset("webp"), "sizes": sizes}),
+        flatatt(
+            {
+                "src": derivatives.url(width * 2),
+                "srcset": derivatives.srcset(),
+                "sizes": sizes,
+                **attrs,
+            }
+        ),
+    )
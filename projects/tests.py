@@ -1,8 +1,61 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
 
-from .models import Project, Technology, Review
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import (
+    AsyncRequestFactory,
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+from scipy import sparse
+
+from . import async_views, search, similar, timeline, tracking, trending, views
+from .hll import HyperLogLog
+from .management.commands import benchmark
+from .models import (
+    Project,
+    Review,
+    SimilarProject,
+    Technology,
+    TimelineEntry,
+    TrendingEvent,
+    ViewSketch,
+)
+from .pagination import CursorPaginator
+from .stars import toggle_star
+from .tags import find_technologies, normalize, sync_technologies
+from .tracking import ViewBuffer, record_views, unique_viewers, view_buffer
 
 from accounts.models import User
+from hub import images
+from hub.instrumentation import (
+    QueryBudgetExceeded,
+    QueryInstrumentationMiddleware,
+    QueryRecorder,
+)
+from hub.routers import RequestState, StickyPrimaryMiddleware, request_state
+from jobs.models import Job
 
 
 class ProjectTestCase(TestCase):
@@ -82,3 +135,1670 @@ class ProjectTestCase(TestCase):
         project = Project.objects.get(owner=foo)
         reviews = Review.objects.filter(project=project)
         self.assertTrue(reviews.count() == 3)
+
+
+class CounterTestCase(TestCase):
+    def setUp(self):
+        # Create users and a project
+        self.foo = User.objects.create(username="foo")
+        self.bar = User.objects.create(username="bar")
+        self.baz = User.objects.create(username="baz")
+        self.project = Project.objects.create(owner=self.foo, title="counted")
+
+    def test_star_counter(self):
+        """Adding and removing stars keeps star_count in step."""
+        self.project.stars.add(self.bar, self.baz)
+        self.project.stars.add(self.bar)
+        self.baz.starred_projects.remove(self.project)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.star_count, 1)
+
+        self.project.stars.clear()
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.star_count, 0)
+
+    def test_viewer_and_review_counters(self):
+        """Viewers and reviews are counted on the project row."""
+        self.project.viewers.add(self.bar)
+        review = Review.objects.create(
+            user=self.bar, project=self.project, content="nice"
+        )
+        Review.objects.create(user=self.baz, project=self.project, content="cool")
+        review.delete()
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.viewer_count, 1)
+        self.assertEqual(self.project.review_count, 1)
+
+    def test_reconcile_counters(self):
+        """The reconcile command repairs drifted counters."""
+        self.project.stars.add(self.bar)
+        Project.objects.filter(pk=self.project.pk).update(star_count=42)
+        User.objects.filter(pk=self.foo.pk).update(follower_count=7)
+
+        call_command("reconcile_counters", stdout=StringIO())
+
+        self.project.refresh_from_db()
+        self.foo.refresh_from_db()
+        self.assertEqual(self.project.star_count, 1)
+        self.assertEqual(self.foo.follower_count, 0)
+
+
+class FeedTestCase(TestCase):
+    def setUp(self):
+        # Create a reader and a few authors with starred projects
+        self.reader = User.objects.create(username="reader")
+        stargazers = [User.objects.create(username=f"fan{i}") for i in range(20)]
+        for i in range(12):
+            author = User.objects.create(username=f"author{i}")
+            project = Project.objects.create(owner=author, title=f"project {i}")
+            project.stars.add(*stargazers[: i + 1])
+        project.stars.add(self.reader)
+
+    def test_feed_star_state(self):
+        """The feed annotates star state for the requesting user."""
+        projects = Project.objects.feed(self.reader)
+        starred = [project.title for project in projects if project.is_starred]
+        self.assertEqual(starred, ["project 11"])
+
+    def test_feed_query_count(self):
+        """A feed page costs the same number of queries however many stars."""
+        self.client.force_login(self.reader)
+
+        # Session, user, version stamps and page rows
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("projects:index"))
+        self.assertContains(response, "bi-star-fill", count=1)
+
+        Project.objects.first().stars.add(
+            *[User.objects.create(username=f"late{i}") for i in range(30)]
+        )
+        with self.assertNumQueries(4):
+            self.client.get(reverse("projects:index"))
+
+    def test_anonymous_feed_query_count(self):
+        """Anonymous visitors get the feed without a star lookup."""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("projects:index"))
+        self.assertNotContains(response, "star-btn")
+
+
+class CursorPaginatorTestCase(TestCase):
+    def setUp(self):
+        # Create projects sharing timestamps so ids break the ties
+        owner = User.objects.create(username="owner")
+        for i in range(7):
+            Project.objects.create(owner=owner, title=f"project {i}")
+        Project.objects.filter(title__in=["project 2", "project 3"]).update(
+            timestamp=Project.objects.get(title="project 4").timestamp
+        )
+        self.expected = list(Project.objects.values_list("title", flat=True))
+
+    def test_walk_forward_and_back(self):
+        """Next and previous cursors visit every project exactly once."""
+        paginator = CursorPaginator(Project.objects.all(), 3)
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        titles = [project.title for page in pages for project in page]
+        self.assertEqual(titles, self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(list(previous), list(pages[-2]))
+        first = paginator.get_page(previous.previous_cursor)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous())
+
+    def test_invalid_cursor(self):
+        """A malformed cursor falls back to the first page."""
+        page = CursorPaginator(Project.objects.all(), 3).get_page("not-a-cursor")
+        self.assertEqual([project.title for project in page], self.expected[:3])
+
+        # Well formed tokens with values no ordering column can hold
+        for payload in ('{"v":[null,null],"b":false}', '{"v":[{},[]],"b":false}'):
+            cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+            page = CursorPaginator(Project.objects.all(), 3).get_page(cursor)
+            self.assertEqual([project.title for project in page], self.expected[:3])
+        response = self.client.get(reverse("projects:index"), {"cursor": cursor})
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed_cursor_links(self):
+        """The feed renders older/newer links instead of page numbers."""
+        owner = User.objects.get(username="owner")
+        for i in range(7, 12):
+            Project.objects.create(owner=owner, title=f"project {i}")
+        response = self.client.get(reverse("projects:index"))
+        next_cursor = response.context["page_obj"].next_cursor
+        self.assertContains(response, f"?cursor={next_cursor}")
+        response = self.client.get(reverse("projects:index"), {"cursor": next_cursor})
+        self.assertTrue(response.context["page_obj"].has_previous())
+
+
+class TimelineTestCase(TestCase):
+    def setUp(self):
+        # reader follows author and star, star has more followers
+        self.reader = User.objects.create(username="reader")
+        self.author = User.objects.create(username="author")
+        self.star = User.objects.create(username="star")
+        self.other = User.objects.create(username="other")
+        self.author.followers.add(self.reader)
+        self.star.followers.add(self.reader, self.other, self.author)
+        self.star.refresh_from_db()
+        self.client.force_login(self.reader)
+
+    def titles(self, cursor=None):
+        page = timeline.timeline_page(self.reader, cursor, per_page=2)
+        return [project.title for project in page], page
+
+    def test_create_fans_out(self):
+        """Creating a public project pushes it to followers only."""
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse("projects:create"),
+            {"title": "fresh", "overview": "new", "is_public": "True"},
+        )
+        project = Project.objects.get(title="fresh")
+        self.assertEqual(
+            list(project.timeline_entries.values_list("user__username", flat=True)),
+            ["reader"],
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Following copies recent projects, unfollowing removes them."""
+        Project.objects.create(owner=self.other, title="older")
+        self.other.followers.add(self.reader)
+        self.assertEqual(self.titles()[0], ["older"])
+
+        self.reader.following.remove(self.other)
+        self.assertEqual(self.titles()[0], [])
+
+    def test_visibility_retracts(self):
+        """Making a project private removes it from timelines."""
+        project = Project.objects.create(owner=self.author, title="hidden")
+        timeline.fan_out(project)
+        self.client.force_login(self.author)
+        self.client.put(
+            reverse("projects:visibility", args=[project.id]),
+            data='{"visibility": "private"}',
+            content_type="application/json",
+        )
+        self.assertFalse(TimelineEntry.objects.filter(project=project).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_heavy_owner_read_on_fetch(self):
+        """High-follower owners are merged in at read time."""
+        for title in ["a1", "s1", "a2", "s2", "a3"]:
+            owner = self.author if title.startswith("a") else self.star
+            project = Project.objects.create(owner=owner, title=title)
+            timeline.fan_out(project)
+        self.assertFalse(TimelineEntry.objects.filter(project__owner=self.star))
+
+        first, page = self.titles()
+        second, page = self.titles(page.next_cursor)
+        third, page = self.titles(page.next_cursor)
+        self.assertEqual(first + second + third, ["a3", "s2", "a2", "s1", "a1"])
+        self.assertFalse(page.has_next())
+
+        back, page = self.titles(page.previous_cursor)
+        self.assertEqual(back, ["a2", "s1"])
+
+    def test_timeline_view(self):
+        """The timeline view renders the followed projects."""
+        project = Project.objects.create(owner=self.author, title="shown")
+        timeline.fan_out(project)
+        response = self.client.get(reverse("projects:timeline"))
+        self.assertContains(response, "author/shown")
+
+
+@override_settings(VIEW_BUFFER_SIZE=3, VIEW_BUFFER_INTERVAL=3600)
+class ViewTrackingTestCase(TestCase):
+    def setUp(self):
+        # Create an owner, a project and some readers
+        self.owner = User.objects.create(username="owner")
+        self.project = Project.objects.create(owner=self.owner, title="viewed")
+        self.readers = [User.objects.create(username=f"r{i}") for i in range(3)]
+        self.addCleanup(view_buffer.flush)
+
+    def test_views_are_buffered(self):
+        """Views are written in one batch once the buffer is full."""
+        for reader in self.readers[:2]:
+            self.client.force_login(reader)
+            self.client.get(reverse("projects:detail", args=[self.project.id]))
+            self.client.get(reverse("projects:detail", args=[self.project.id]))
+        self.assertEqual(self.project.viewers.count(), 0)
+
+        self.client.force_login(self.readers[2])
+        self.client.get(reverse("projects:detail", args=[self.project.id]))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.viewers.count(), 3)
+        self.assertEqual(self.project.viewer_count, 3)
+
+    def test_flush_skips_known_views(self):
+        """Views that are already stored are not counted twice."""
+        self.project.viewers.add(self.readers[0])
+        view_buffer.record(self.project.pk, self.readers[0].pk)
+        view_buffer.record(self.project.pk, self.readers[1].pk)
+        self.assertEqual(view_buffer.flush(), 1)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.viewer_count, 2)
+
+    def test_owner_views_ignored(self):
+        """The owner's visits are never recorded."""
+        self.client.force_login(self.owner)
+        self.client.get(reverse("projects:detail", args=[self.project.id]))
+        self.assertEqual(len(view_buffer), 0)
+
+
+class HyperLogLogTestCase(TestCase):
+    def test_estimate_accuracy(self):
+        """Estimates stay within a few percent of the true cardinality."""
+        for total in (100, 5000, 60000):
+            sketch = HyperLogLog()
+            sketch.update(range(total))
+            sketch.update(range(total // 2))
+            self.assertLess(abs(sketch.count() - total) / total, 0.03)
+
+    def test_serialization_and_merge(self):
+        """Sketches round-trip through bytes and merge into a union."""
+        small, large = HyperLogLog(), HyperLogLog()
+        small.update(range(50))
+        large.update(range(25, 20000))
+        self.assertLess(len(small.to_bytes()), 200)
+        self.assertEqual(len(large.to_bytes()), 2**14 + 2)
+
+        merged = HyperLogLog.from_bytes(small.to_bytes())
+        merged.merge(HyperLogLog.from_bytes(large.to_bytes()))
+        self.assertLess(abs(merged.count() - 20000) / 20000, 0.03)
+
+
+@override_settings(VIEW_BUFFER_SIZE=1000, VIEW_BUFFER_INTERVAL=0.05)
+class BackgroundFlushTestCase(TransactionTestCase):
+    def test_idle_process_flushes(self):
+        """Started buffers write views from their thread, even when idle."""
+        owner = User.objects.create(username="owner")
+        reader = User.objects.create(username="reader")
+        project = Project.objects.create(owner=owner, title="viewed")
+        buffer = ViewBuffer()
+        buffer.start()
+        self.addCleanup(buffer.stop)
+
+        threads, flushed = [], threading.Event()
+
+        def record(pairs):
+            threads.append(threading.current_thread().name)
+            try:
+                return record_views(pairs)
+            finally:
+                flushed.set()
+
+        with patch.object(tracking, "record_views", side_effect=record):
+            buffer.record(project.pk, reader.pk)
+            self.assertTrue(flushed.wait(5))
+        self.assertEqual(threads, ["view-buffer"])
+        self.assertTrue(project.viewers.exists())
+
+
+@override_settings(
+    VIEW_COUNTING="approximate", VIEW_BUFFER_SIZE=1000, VIEW_BUFFER_INTERVAL=3600
+)
+class SketchedViewsTestCase(TestCase):
+    def setUp(self):
+        owner = User.objects.create(username="owner")
+        self.project = Project.objects.create(owner=owner, title="sketched")
+        self.addCleanup(view_buffer.flush)
+
+    def test_approximate_counting(self):
+        """Approximate mode counts viewers without storing viewer rows."""
+        for user_id in range(1, 301):
+            view_buffer.record(self.project.pk, user_id)
+        view_buffer.flush()
+        view_buffer.record(self.project.pk, 1)
+        view_buffer.flush()
+
+        self.project.refresh_from_db()
+        self.assertFalse(self.project.viewers.exists())
+        self.assertAlmostEqual(self.project.viewer_count, 300, delta=9)
+        self.assertAlmostEqual(unique_viewers(self.project.pk), 300, delta=9)
+        self.assertEqual(self.project.view_sketches.count(), 2)
+
+    def test_weekly_window(self):
+        """Daily sketches outside the window are not merged."""
+        old = HyperLogLog()
+        old.update(range(1000, 1100))
+        ViewSketch.objects.create(
+            project=self.project,
+            day=timezone.now().date() - timedelta(days=8),
+            sketch=old.to_bytes(),
+        )
+        view_buffer.record(self.project.pk, 1)
+        view_buffer.flush()
+        self.assertEqual(unique_viewers(self.project.pk), 1)
+        self.assertAlmostEqual(unique_viewers(self.project.pk, days=9), 101, delta=3)
+
+    def test_starts_from_viewer_rows(self):
+        """Viewers counted exactly before the switch are kept."""
+        users = [User.objects.create(username=f"u{i}") for i in range(50)]
+        self.project.viewers.add(*users)
+        view_buffer.record(self.project.pk, users[0].pk)
+        view_buffer.flush()
+        self.project.refresh_from_db()
+        self.assertAlmostEqual(self.project.viewer_count, 50, delta=2)
+
+    def test_prune_folds_viewer_rows(self):
+        users = [User.objects.create(username=f"u{i}") for i in range(50)]
+        self.project.viewers.add(*users)
+        out = StringIO()
+        call_command("prune_viewers", batch_size=1, stdout=out)
+        self.assertIn("Deleted 50 viewer rows.", out.getvalue())
+        self.assertFalse(self.project.viewers.exists())
+
+        view_buffer.record(self.project.pk, users[0].pk)
+        view_buffer.flush()
+        self.project.refresh_from_db()
+        self.assertAlmostEqual(self.project.viewer_count, 50, delta=2)
+
+    @override_settings(VIEW_COUNTING="both")
+    def test_prune_needs_approximate_counting(self):
+        self.project.viewers.add(self.project.owner)
+        ViewSketch.objects.create(project=self.project, day=date(2000, 1, 1))
+        call_command("prune_viewers", stdout=StringIO())
+        self.assertTrue(self.project.viewers.exists())
+        self.assertTrue(self.project.view_sketches.exists())
+
+
+class StarTestCase(TestCase):
+    def setUp(self):
+        # Create a fan and some projects
+        self.owner = User.objects.create(username="owner")
+        self.fan = User.objects.create(username="fan")
+        self.projects = [
+            Project.objects.create(owner=self.owner, title=f"p{i}") for i in range(3)
+        ]
+        self.hidden = Project.objects.create(
+            owner=self.owner, title="hidden", is_public=False
+        )
+        self.projects[0].stars.add(self.owner)
+        self.client.force_login(self.fan)
+
+    def test_toggle_star(self):
+        """Starring twice toggles the star and returns the stored count."""
+        url = reverse("projects:stars", args=[self.projects[0].id])
+        self.assertEqual(self.client.post(url).json(), {"starred": True, "count": 2})
+        self.assertEqual(self.client.post(url).json(), {"starred": False, "count": 1})
+        self.assertFalse(self.projects[0].stars.filter(pk=self.fan.pk).exists())
+
+    def test_toggle_star_race(self):
+        """A star inserted concurrently is kept and counted once."""
+        with patch.object(
+            Project.stars.through.objects, "create", side_effect=IntegrityError
+        ):
+            starred, count = toggle_star(self.projects[1].pk, self.fan.pk)
+        self.assertTrue(starred)
+        self.assertEqual(count, 0)
+
+    def test_star_status(self):
+        """Star state for many projects comes back in a single query."""
+        self.projects[2].stars.add(self.fan)
+        ids = ",".join(str(p.id) for p in self.projects + [self.hidden])
+
+        # Session, user and star states
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("projects:star_status"), {"ids": ids})
+        projects = response.json()["projects"]
+        self.assertNotIn(str(self.hidden.id), projects)
+        self.assertEqual(
+            projects[str(self.projects[0].id)], {"starred": False, "count": 1}
+        )
+        self.assertEqual(
+            projects[str(self.projects[2].id)], {"starred": True, "count": 1}
+        )
+
+    def test_star_status_bad_ids(self):
+        """Non-numeric ids are rejected."""
+        response = self.client.get(reverse("projects:star_status"), {"ids": "1,x"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReviewApiTestCase(TestCase):
+    def setUp(self):
+        # Create a project with reviews from several users
+        self.owner = User.objects.create(username="owner")
+        self.project = Project.objects.create(owner=self.owner, title="reviewed")
+        for i in range(7):
+            user = User.objects.create(username=f"critic{i}")
+            Review.objects.create(user=user, project=self.project, content=f"r{i}")
+        self.url = reverse("projects:reviews", args=[self.project.id])
+        self.client.force_login(self.owner)
+
+    def test_review_pages(self):
+        """Reviews come back newest first in client sized pages."""
+        # Session, user, project and one page of reviews with their users
+        with self.assertNumQueries(4):
+            first = self.client.get(self.url, {"limit": 4}).json()
+        second = self.client.get(self.url, {"limit": 4, "cursor": first["next"]}).json()
+        contents = [review["content"] for review in first["reviews"]]
+        contents += [review["content"] for review in second["reviews"]]
+        self.assertEqual(contents, [f"r{i}" for i in range(6, -1, -1)])
+        self.assertEqual(first["reviews"][0]["user"]["username"], "critic6")
+        self.assertIsNone(second["next"])
+
+    def test_private_reviews(self):
+        """Reviews of a private project are hidden from other users."""
+        Project.objects.filter(pk=self.project.pk).update(is_public=False)
+        self.client.force_login(User.objects.get(username="critic0"))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_post_returns_review(self):
+        """Posting a review returns it ready to render."""
+        response = self.client.post(
+            self.url, data='{"content": "great"}', content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["review"]["content"], "great")
+        self.assertEqual(response.json()["review"]["user"]["username"], "owner")
+
+    def test_detail_renders_first_page(self):
+        """The detail page renders only the first page of reviews."""
+        for i in range(7, 12):
+            Review.objects.create(
+                user=self.owner, project=self.project, content=f"r{i}"
+            )
+        response = self.client.get(reverse("projects:detail", args=[self.project.id]))
+        self.assertEqual(len(response.context["reviews"]), 10)
+        self.assertContains(response, response.context["reviews"].next_cursor)
+
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        # Create projects whose text matches in different fields
+        self.owner = User.objects.create(username="owner")
+        self.reader = User.objects.create(username="reader")
+        self.api = Project.objects.create(
+            owner=self.owner, title="Weather API", description="A forecast service"
+        )
+        self.blog = Project.objects.create(
+            owner=self.owner,
+            title="Blog",
+            description="Posts served from a weather station API",
+        )
+        self.secret = Project.objects.create(
+            owner=self.owner, title="Weather secret", is_public=False
+        )
+        self.blog.technologies.add(Technology.objects.create(name="Django"))
+
+    def titles(self, query, user=None):
+        projects, _ = search.search(query, user or self.reader)
+        return [project.title for project in projects]
+
+    def test_ranked_results(self):
+        """Title matches outrank description matches, prefixes match."""
+        self.assertEqual(self.titles("weath api"), ["Weather API", "Blog"])
+        self.assertEqual(self.titles("django"), ["Blog"])
+        self.assertEqual(self.titles("!!"), [])
+
+    def test_visibility(self):
+        """Private projects are only found by their owner."""
+        self.assertNotIn("Weather secret", self.titles("weather"))
+        self.assertIn("Weather secret", self.titles("weather", self.owner))
+
+    def test_index_follows_changes(self):
+        """Edits, tag changes and deletes keep the index in sync."""
+        self.api.title = "Climate API"
+        self.api.save()
+        self.blog.technologies.clear()
+        self.secret.delete()
+        self.assertEqual(self.titles("climate"), ["Climate API"])
+        self.assertEqual(self.titles("django"), [])
+        self.assertEqual(self.titles("secret", self.owner), [])
+
+    def test_rebuild_command(self):
+        """The rebuild command restores a wiped index."""
+        search.get_backend("default").clear()
+        self.assertEqual(self.titles("weather"), [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.titles("weather"), ["Weather API", "Blog"])
+
+    def test_search_view(self):
+        """The search view renders matching projects."""
+        response = self.client.get(reverse("projects:search"), {"q": "forecast"})
+        self.assertContains(response, "owner/Weather API")
+        self.assertNotContains(response, "owner/Blog")
+
+
+class TagTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username="owner")
+        self.project = Project.objects.create(owner=self.owner, title="Tagged")
+        Technology.objects.create(name="Django")
+
+    def names(self):
+        return sorted(self.project.technologies.values_list("name", flat=True))
+
+    def test_normalize(self):
+        """Names are trimmed, collapsed and deduplicated ignoring case."""
+        self.assertEqual(
+            list(normalize(" Django ,react,,  Vue  js, django, REACT").values()),
+            ["Django", "react", "Vue js"],
+        )
+        self.assertEqual(normalize(""), {})
+
+    def test_sync_writes_diff(self):
+        """Existing names are reused whatever their case, only changes are written."""
+        sync_technologies(self.project, "django, React, Vue")
+        self.assertEqual(self.names(), ["Django", "React", "Vue"])
+        self.assertEqual(Technology.objects.count(), 3)
+
+        # Removing one tag leaves the other rows untouched
+        through = Project.technologies.through.objects
+        kept = set(through.filter(technology__name="Django").values_list("pk"))
+        sync_technologies(self.project, "Django, Vue, Svelte")
+        self.assertEqual(self.names(), ["Django", "Svelte", "Vue"])
+        self.assertEqual(
+            kept, set(through.filter(technology__name="Django").values_list("pk"))
+        )
+
+        # Unchanged input writes nothing
+        with self.assertNumQueries(2):
+            sync_technologies(self.project, "vue, svelte, django")
+
+    def test_sync_query_count_is_constant(self):
+        """The number of queries doesn't grow with the number of tags."""
+        counts = []
+        for size in (2, 30):
+            project = Project.objects.create(owner=self.owner, title=f"P{size}")
+            names = ", ".join(f"Tech {size}-{i}" for i in range(size))
+            with CaptureQueriesContext(connection) as queries:
+                sync_technologies(project, names)
+            counts.append(len(queries))
+            self.assertEqual(project.technologies.count(), size)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_case_insensitive_unique(self):
+        """The database rejects names differing only by case."""
+        with self.assertRaises(IntegrityError):
+            Technology.objects.create(name="DJANGO")
+
+    def test_non_ascii_names(self):
+        """Case is ignored beyond ASCII letters too."""
+        sync_technologies(self.project, "Élixir, Django")
+        self.assertEqual(self.names(), ["Django", "Élixir"])
+
+        other = Project.objects.create(owner=self.owner, title="Other")
+        sync_technologies(other, "élixir")
+        self.assertEqual(
+            list(other.technologies.values_list("name", flat=True)), ["Élixir"]
+        )
+        self.assertEqual(find_technologies(["ÉLIXIR"]), [other.technologies.get()])
+        with self.assertRaises(IntegrityError):
+            Technology.objects.create(name="ÉLIXIR")
+
+    def test_update_view(self):
+        """Editing a project only changes the tags that differ."""
+        self.client.force_login(self.owner)
+        sync_technologies(self.project, "Django, React")
+        self.client.post(
+            reverse("projects:update", args=[self.project.id]),
+            {
+                "title": "Tagged",
+                "overview": "o",
+                "description": "d",
+                "objectives": "j",
+                "key_learning": "k",
+                "technologies": "react, Go",
+                "is_public": "True",
+            },
+        )
+        self.assertEqual(self.names(), ["Go", "React"])
+
+
+class TechnologyFacetTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username="owner")
+        self.django = Technology.objects.create(name="Django")
+        self.react = Technology.objects.create(name="React")
+        self.api = Project.objects.create(owner=self.owner, title="API")
+        self.app = Project.objects.create(owner=self.owner, title="App")
+        self.secret = Project.objects.create(
+            owner=self.owner, title="Secret", is_public=False
+        )
+        self.api.technologies.add(self.django)
+        self.app.technologies.add(self.django, self.react)
+        self.secret.technologies.add(self.django)
+
+    def counts(self):
+        return dict(Technology.objects.values_list("name", "public_project_count"))
+
+    def test_counts_follow_tags_and_visibility(self):
+        """Only public projects are counted, through every kind of change."""
+        self.assertEqual(self.counts(), {"Django": 2, "React": 1})
+
+        self.secret.is_public = True
+        self.secret.save()
+        self.assertEqual(self.counts(), {"Django": 3, "React": 1})
+
+        self.app.technologies.remove(self.react)
+        self.react.projects.add(self.api, self.secret)
+        self.assertEqual(self.counts(), {"Django": 3, "React": 2})
+
+        self.api.is_public = False
+        self.api.save(update_fields=["is_public"])
+        self.django.projects.clear()
+        self.assertEqual(self.counts(), {"Django": 0, "React": 1})
+
+        self.secret.delete()
+        self.assertEqual(self.counts(), {"Django": 0, "React": 0})
+
+    def test_reconcile_counts(self):
+        """The reconcile command recounts technologies from the tag rows."""
+        Technology.objects.update(public_project_count=7)
+        call_command("reconcile_counters", stdout=StringIO())
+        self.assertEqual(self.counts(), {"Django": 2, "React": 1})
+
+    def test_facet_view(self):
+        """Projects must use every selected technology and be public."""
+        url = reverse("projects:technologies")
+        response = self.client.get(url, {"name": "django"})
+        self.assertEqual(
+            [project.title for project in response.context["page_obj"]],
+            ["App", "API"],
+        )
+        response = self.client.get(url, {"name": ["Django", "react"]})
+        self.assertEqual(
+            [project.title for project in response.context["page_obj"]], ["App"]
+        )
+        response = self.client.get(url, {"name": ["Django", "Cobol"]})
+        self.assertEqual(len(response.context["page_obj"]), 0)
+
+    def test_top_technologies(self):
+        """The tag cloud is read from the counts in a single query."""
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("projects:top_technologies"), {"limit": 1}
+            )
+        self.assertEqual(
+            response.json(), {"technologies": [{"name": "Django", "count": 2}]}
+        )
+        response = self.client.get(reverse("projects:technologies"))
+        self.assertContains(response, "React (1)")
+
+
+def image_file(name="photo.png", size=(300, 200), mode="RGBA", format="PNG"):
+    buffer = BytesIO()
+    Image.new(mode, size, "orange").save(buffer, format=format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ImageTestCase(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        settings = override_settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create(username="owner")
+
+    def test_render(self):
+        """Every width is written in both formats under a content hash."""
+        self.user.photo = image_file()
+        self.user.save()
+        digest = images.derive(self.user, "photo", images.AVATAR)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.photo_digest, digest)
+
+        derivatives = self.user.photo_derivatives
+        self.assertEqual(
+            derivatives.url(40), f"/media/derivatives/avatar/{digest}-48.jpeg"
+        )
+        self.assertIn(f"{digest}-160.webp 160w", derivatives.srcset("webp"))
+        with Image.open(f"{self.media}/derivatives/avatar/{digest}-96.webp") as image:
+            self.assertEqual(image.size, (96, 96))
+
+        # Same content gives the same names and is not rendered again
+        self.assertEqual(images.render(self.user.photo, images.AVATAR), digest)
+
+    def test_preview_never_upscales(self):
+        """Previews keep their aspect ratio and are not enlarged."""
+        project = Project.objects.create(
+            owner=self.user, title="Pic", image=image_file(size=(600, 300), mode="RGB")
+        )
+        digest = images.derive(project, "image", images.PREVIEW)
+        for width, size in ((480, (480, 240)), (960, (600, 300))):
+            path = f"{self.media}/derivatives/preview/{digest}-{width}.jpeg"
+            with Image.open(path) as image:
+                self.assertEqual(image.size, size)
+
+    def test_broken_image(self):
+        """Unreadable files leave the original in place of renditions."""
+        self.user.photo = SimpleUploadedFile("photo.png", b"not an image")
+        self.user.save()
+        with self.assertLogs("hub.images", "WARNING"):
+            self.assertEqual(images.derive(self.user, "photo", images.AVATAR), "")
+        self.assertIsNone(self.user.photo_derivatives)
+        self.assertEqual(self.user.photo_url(40), self.user.photo.url)
+
+    def test_templates_use_srcset(self):
+        """Feed cards serve WebP renditions with a JPEG fallback."""
+        self.user.photo = image_file()
+        self.user.save()
+        images.derive(self.user, "photo", images.AVATAR)
+        Project.objects.create(owner=self.user, title="Pic")
+
+        response = self.client.get(reverse("projects:index"))
+        self.assertContains(response, '<source type="image/webp" sizes="40px" srcset="')
+        self.assertContains(response, 'sizes="40px"')
+        self.assertNotContains(response, self.user.photo.url + '"')
+
+    def test_dashboard_photo(self):
+        """Other users' dashboards show the rendered photo."""
+        self.user.photo = image_file()
+        self.user.save()
+        digest = images.derive(self.user, "photo", images.AVATAR)
+        self.client.force_login(User.objects.create(username="visitor"))
+
+        response = self.client.get(reverse("accounts:dashboard", args=["owner"]))
+        self.assertContains(response, f"{digest}-160.jpeg")
+
+    def test_render_command(self):
+        """The command renders images that have no renditions yet."""
+        project = Project.objects.create(
+            owner=self.user, title="Pic", image=image_file(mode="RGB")
+        )
+        call_command("render_images", stdout=StringIO())
+        project.refresh_from_db()
+        self.assertTrue(project.image_derivatives)
+
+    def test_form_rejects_bad_images(self):
+        """Project images go through the same upload checks."""
+        self.client.force_login(self.user)
+        data = {
+            "title": "Pic",
+            "overview": "o",
+            "objectives": "j",
+            "key_learning": "k",
+            "is_public": "True",
+        }
+        response = self.client.post(
+            reverse("projects:create"),
+            {**data, "image": SimpleUploadedFile("pic.png", b"GIF89a-not-really")},
+        )
+        self.assertTrue(response.context["form"].errors["image"])
+
+        with override_settings(MAX_IMAGE_PIXELS=100):
+            response = self.client.post(
+                reverse("projects:create"), {**data, "image": image_file()}
+            )
+        self.assertEqual(
+            response.context["form"].errors["image"],
+            ["Image dimensions are too large."],
+        )
+        self.assertFalse(Project.objects.exists())
+
+        self.client.post(reverse("projects:create"), {**data, "image": image_file()})
+        project = Project.objects.get()
+        self.assertTrue(project.image.name.endswith(".png"))
+        self.assertTrue(project.image_digest)
+
+    @override_settings(MAX_UPLOAD_SIZE=2**20, DATA_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_too_large_keeps_form(self):
+        """The other fields, CSRF token included, survive a dropped file."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        token = client.get(reverse("projects:create")).context["csrf_token"]
+        response = client.post(
+            reverse("projects:create"),
+            {
+                "image": SimpleUploadedFile("pic.png", b"\x89PNG\r\n\x1a\n" * 2**18),
+                "title": "Pic",
+                "csrfmiddlewaretoken": str(token),
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        form = response.context["form"]
+        self.assertEqual(form.errors["image"], ["File is larger than 1 MB."])
+        self.assertEqual(form["title"].value(), "Pic")
+        self.assertFalse(Project.objects.exists())
+
+    @override_settings(JOBS_EAGER=False)
+    def test_rendered_by_worker(self):
+        """Uploads are rendered by the worker, not in the request."""
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("projects:create"),
+            {
+                "title": "Pic",
+                "overview": "o",
+                "objectives": "j",
+                "key_learning": "k",
+                "is_public": "True",
+                "image": image_file(),
+            },
+        )
+        project = Project.objects.get()
+        self.assertFalse(project.image_digest)
+        self.assertEqual(
+            sorted(Job.objects.values_list("name", flat=True)),
+            ["projects.tasks.fan_out", "projects.tasks.render_image"],
+        )
+
+        call_command("worker", once=True, stdout=StringIO())
+        project.refresh_from_db()
+        self.assertTrue(project.image_digest)
+
+
+def async_request(method, path, user, data=None):
+    factory = AsyncRequestFactory()
+    request = getattr(factory, method)(path, data, content_type="application/json")
+
+    async def auser():
+        return user
+
+    request.user, request.auser = user, auser
+    return request
+
+
+class AsyncViewTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username="owner")
+        self.fan = User.objects.create(username="fan")
+        self.project = Project.objects.create(owner=self.owner, title="Async")
+
+    async def test_stars(self):
+        """Starring twice toggles the star back off."""
+        request = async_request("post", "/", self.fan)
+        response = await async_views.stars(request, self.project.pk)
+        self.assertEqual(json.loads(response.content), {"starred": True, "count": 1})
+        response = await async_views.stars(request, self.project.pk)
+        self.assertEqual(json.loads(response.content), {"starred": False, "count": 0})
+
+    async def test_reviews(self):
+        """Reviews are created and paged like the sync endpoint."""
+        request = async_request("post", "/", self.fan, {"content": "Nice"})
+        response = await async_views.reviews(request, self.project.pk)
+        self.assertEqual(response.status_code, 201)
+
+        request = async_request("get", "/", self.fan, {"limit": 5})
+        response = await async_views.reviews(request, self.project.pk)
+        data = json.loads(response.content)
+        self.assertEqual([review["content"] for review in data["reviews"]], ["Nice"])
+        self.assertIsNone(data["next"])
+
+    async def test_visibility(self):
+        """Only the owner can hide a project."""
+        data = {"visibility": "private"}
+        request = async_request("put", "/", self.fan, data)
+        response = await async_views.visibility(request, self.project.pk)
+        self.assertEqual(response.status_code, 403)
+
+        updated_at = self.project.updated_at
+        request = async_request("put", "/", self.owner, data)
+        response = await async_views.visibility(request, self.project.pk)
+        self.assertEqual(json.loads(response.content)["is_public"], False)
+        await self.project.arefresh_from_db()
+        self.assertFalse(self.project.is_public)
+        self.assertGreater(self.project.updated_at, updated_at)
+
+
+@override_settings(
+    QUERY_INSTRUMENTATION=True, QUERY_SAMPLE_RATE=1.0, QUERY_BUDGET_ACTION="raise"
+)
+class InstrumentationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.visitor = User.objects.create(username="visitor")
+        self.client.force_login(self.visitor)
+        for index in range(12):
+            project = Project.objects.create(owner=self.user, title=f"P{index}")
+            Review.objects.create(user=self.visitor, project=project, content="Nice")
+            sync_technologies(project, "Django, React")
+        self.project = project
+
+    def test_server_timing(self):
+        """Sampled requests report their queries in a header and a log line."""
+        with self.assertLogs("hub.queries", "INFO") as logs:
+            response = self.client.get(reverse("projects:index"))
+        self.assertRegex(
+            response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur='
+        )
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["view"], "projects:index")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["repeated"], {})
+
+    @override_settings(QUERY_INSTRUMENTATION=False)
+    def test_disabled(self):
+        response = self.client.get(reverse("projects:index"))
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(QUERY_BUDGET_ACTION="warn", QUERY_SAMPLE_RATE=0.0)
+    def test_sampling(self):
+        """Unsampled requests are not recorded."""
+        response = self.client.get(reverse("projects:index"))
+        self.assertNotIn("Server-Timing", response)
+
+    def test_new_connection(self):
+        """Queries of a connection first opened in the request are recorded."""
+
+        def get_response(request):
+            with connections["default"].cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connections["default"].close()
+            return HttpResponse()
+
+        middleware = QueryInstrumentationMiddleware(get_response)
+        responses = []
+        thread = threading.Thread(
+            target=lambda: responses.append(middleware(RequestFactory().get("/")))
+        )
+        with self.assertLogs("hub.queries", "INFO"):
+            thread.start()
+            thread.join()
+        self.assertIn('desc="1 queries"', responses[0]["Server-Timing"])
+
+    async def test_async_view(self):
+        """Async views stay async, their queries in other threads are recorded."""
+
+        def query():
+            with connections["default"].cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connections["default"].close()
+
+        async def get_response(request):
+            # A fresh thread, with its own connection
+            await sync_to_async(query, thread_sensitive=False)()
+            return HttpResponse()
+
+        middleware = QueryInstrumentationMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with self.assertLogs("hub.queries", "INFO"):
+            response = await middleware(AsyncRequestFactory().get("/"))
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+    def test_repeated_shapes(self):
+        """Queries differing only by their values count as one shape."""
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for project in Project.objects.all():
+                project.owner
+            list(Project.objects.filter(pk__in=[1, 2, 3]))
+            list(Project.objects.filter(pk__in=[4, 5]))
+        self.assertEqual(recorder.count, 15)
+        self.assertEqual(list(recorder.repeated(5).values()), [12])
+        self.assertEqual(len(recorder.repeated(2)), 2)
+
+    def test_budgets(self):
+        """The feed, detail and dashboard stay within their query budgets."""
+        with self.assertLogs("hub.queries", "INFO"):
+            for url in (
+                reverse("projects:index"),
+                reverse("projects:detail", args=[self.project.pk]),
+                reverse("accounts:dashboard", args=[self.user.username]),
+            ):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_over_budget(self):
+        with patch.object(views.index, "query_budget", 1):
+            with self.assertLogs("hub.queries", "INFO"):
+                with self.assertRaises(QueryBudgetExceeded):
+                    self.client.get(reverse("projects:index"))
+
+    @override_settings(QUERY_BUDGET_ACTION="warn")
+    def test_over_budget_warns(self):
+        with patch.object(views.index, "query_budget", 1):
+            with self.assertLogs("hub.queries", "WARNING") as logs:
+                self.client.get(reverse("projects:index"))
+        self.assertIn("its budget is 1", logs.output[-1])
+
+
+class BenchmarkTestCase(TestCase):
+    def fingerprint(self):
+        return (
+            list(
+                Project.objects.order_by("title").values_list(
+                    "title", "owner__username"
+                )
+            ),
+            list(
+                Project.stars.through.objects.order_by("pk").values_list(
+                    "project__title", "user__username"
+                )
+            ),
+            list(User.objects.order_by("pk").values_list("username", "follower_count")),
+        )
+
+    def test_seed_is_deterministic(self):
+        """The same scale and seed always give the same rows."""
+        fingerprints = []
+        for _ in range(2):
+            with transaction.atomic():
+                sizes = benchmark.seed(scale=0.0005, seed=3)
+                fingerprints.append(self.fingerprint())
+                transaction.set_rollback(True)
+        self.assertEqual(fingerprints[0], fingerprints[1])
+        self.assertEqual(len(fingerprints[0][1]), sizes["stars"])
+
+    def test_counters_rebuilt(self):
+        """Counters agree with the bulk created rows."""
+        benchmark.seed(scale=0.0005)
+        project = Project.objects.order_by("pk").first()
+        self.assertEqual(project.star_count, project.stars.count())
+        self.assertEqual(project.review_count, project.reviews.count())
+
+    def test_run(self):
+        """Every view is timed and none of the requests fail."""
+        benchmark.seed(scale=0.0005)
+        results = benchmark.run_benchmarks(requests=3)
+        self.assertEqual(
+            set(results), {"index", "detail", "dashboard", "stars", "follow"}
+        )
+        for result in results.values():
+            self.assertEqual(result["errors"], 0)
+            self.assertGreater(result["queries_max"], 0)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+
+
+def query_plan(queryset):
+    """
+    Return the EXPLAIN output of ``queryset``.
+
+    PostgreSQL is told to avoid sequential scans, which it prefers for the
+    tiny test tables, so the plan shows whether an index can serve the query.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain()
+
+
+# Plan lines reading a whole table or sorting rows instead of using an index
+FULL_SCANS = {
+    "sqlite": r"SCAN (?!.*USING (COVERING )?INDEX)|USE TEMP B-TREE",
+    "postgresql": r"Seq Scan|Sort",
+}
+
+
+class QueryPlanTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="foo")
+        self.other = User.objects.create(username="bar")
+        for index in range(3):
+            project = Project.objects.create(owner=self.other, title=f"P{index}")
+            Review.objects.create(user=self.user, project=project, content="Nice")
+        self.project = project
+
+    def assertIndexed(self, queryset):
+        if connection.vendor not in FULL_SCANS:
+            self.skipTest(f"No plan checks for {connection.vendor}.")
+        plan = query_plan(queryset)
+        self.assertNotRegex(plan, FULL_SCANS[connection.vendor], msg=plan)
+
+    def pages(self, queryset, ordering=("-timestamp", "-id"), per_page=10):
+        """
+        Build the querysets CursorPaginator runs for the first page and for
+        pages after and before a cursor.
+        """
+        paginator = CursorPaginator(queryset, per_page, ordering)
+        values = [getattr(queryset.first(), name.lstrip("-")) for name in ordering]
+        reversed_ordering = paginator._reversed()
+        return [
+            queryset.order_by(*ordering)[: per_page + 1],
+            queryset.filter(paginator._seek(values, False)).order_by(*ordering)[
+                : per_page + 1
+            ],
+            queryset.filter(paginator._seek(values, True)).order_by(*reversed_ordering)[
+                : per_page + 1
+            ],
+        ]
+
+    def test_feed(self):
+        """Feed pages walk the partial index of public projects."""
+        for user in (self.user, AnonymousUser()):
+            for queryset in self.pages(Project.objects.feed(user)):
+                self.assertIndexed(queryset)
+
+    def test_owner_projects(self):
+        """Dashboards read a user's projects in order from one index."""
+        self.assertIndexed(
+            Project.objects.filter(owner=self.other).select_related("owner")
+        )
+
+    def test_project_reviews(self):
+        """Review pages of a project come from one index range."""
+        for queryset in self.pages(
+            Review.objects.filter(project=self.project).select_related("user"),
+            ordering=("-created_at", "-id"),
+        ):
+            self.assertIndexed(queryset)
+
+    def test_versions(self):
+        """Page version stamps are read from the end of an index."""
+        self.assertIndexed(Project.objects.public().order_by("-updated_at")[:1])
+        self.assertIndexed(User.objects.order_by("-updated_at")[:1])
+
+    def test_trending(self):
+        """Trending pages read the precomputed score index, no aggregation."""
+        Project.objects.update(trending_score=1)
+        projects = (
+            Project.objects.public()
+            .filter(trending_score__gt=0)
+            .select_related("owner")
+            .with_star_state(self.user)
+        )
+        for queryset in self.pages(projects, ordering=("-trending_score", "-id")):
+            self.assertIndexed(queryset)
+
+
+class SimilarProjectTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username="owner")
+        self.projects = {}
+        for title, tags, public in (
+            ("a", "Django, React", True),
+            ("b", "Django, React", True),
+            ("c", "Django", True),
+            ("d", "Vue", True),
+            ("e", "Django, React", False),
+        ):
+            project = Project.objects.create(
+                owner=self.owner, title=title, is_public=public
+            )
+            sync_technologies(project, tags)
+            self.projects[title] = project
+
+    def similar(self, title):
+        return [
+            (row.similar.title, round(row.score, 3))
+            for row in SimilarProject.objects.filter(project=self.projects[title])
+        ]
+
+    def test_cosine_neighbours(self):
+        """Public projects sharing technologies are ranked by cosine."""
+        self.assertEqual(similar.refresh(), 4)
+        self.assertEqual(self.similar("a"), [("b", 1.0), ("c", 0.707)])
+        self.assertEqual(self.similar("c"), [("a", 0.707), ("b", 0.707)])
+        self.assertEqual(self.similar("d"), [])
+        self.assertEqual(self.similar("e"), [])
+        self.assertFalse(Project.objects.filter(similar_stale=True).exists())
+
+    def test_only_changed_projects(self):
+        """Changing tags or visibility flags only that project."""
+        similar.refresh()
+        sync_technologies(self.projects["d"], "Django")
+        self.assertEqual(
+            list(Project.objects.filter(similar_stale=True)), [self.projects["d"]]
+        )
+        self.assertEqual(similar.refresh(), 1)
+        self.assertEqual(self.similar("d")[0], ("c", 1.0))
+
+        # Made private, b stops being served at once and loses its own list
+        b = self.projects["b"]
+        b.is_public = False
+        b.save()
+        self.assertNotIn(b, similar.similar_to(self.projects["a"]))
+        similar.refresh()
+        self.assertEqual(self.similar("b"), [])
+
+    def test_matches_brute_force(self):
+        """The sparse product agrees with a per pair computation."""
+        rng = np.random.default_rng(0)
+        dense = (rng.random((40, 12)) < 0.25).astype(float)
+        dense[dense.sum(axis=1) == 0, 0] = 1
+        matrix = sparse.csr_matrix(dense / np.linalg.norm(dense, axis=1)[:, None])
+
+        for row, neighbours, scores in similar.top_neighbours(
+            matrix, np.arange(40), k=5, chunk_size=7
+        ):
+            expected = sorted(
+                (
+                    -round(
+                        float(dense[row] @ dense[other])
+                        / (np.linalg.norm(dense[row]) * np.linalg.norm(dense[other])),
+                        6,
+                    ),
+                    other,
+                )
+                for other in range(40)
+                if other != row and dense[row] @ dense[other]
+            )[:5]
+            self.assertEqual(
+                list(zip(neighbours.tolist(), scores.tolist())),
+                [(other, -score) for score, other in expected],
+            )
+
+    def test_detail_panel(self):
+        call_command("similar_projects", "--all", stdout=StringIO())
+        self.client.force_login(self.owner)
+        response = self.client.get(
+            reverse("projects:detail", args=[self.projects["a"].pk])
+        )
+        self.assertEqual(
+            [p.title for p in response.context["similar_projects"]], ["b", "c"]
+        )
+        self.assertContains(response, "Similar Projects")
+
+
+class TrendingTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username="owner")
+        self.user = User.objects.create(username="user")
+        self.projects = {
+            title: Project.objects.create(owner=self.owner, title=title)
+            for title in ("starred", "reviewed", "viewed", "quiet")
+        }
+
+    def ranking(self):
+        response = self.client.get(reverse("projects:trending"))
+        return [project.title for project in response.context["page_obj"]]
+
+    def test_events_update_scores(self):
+        """Stars, reviews and views count at once, weighted by kind."""
+        toggle_star(self.projects["starred"].pk, self.user.pk)
+        Review.objects.create(
+            project=self.projects["reviewed"], user=self.user, content="Nice"
+        )
+        view_buffer.record(self.projects["viewed"].pk, self.user.pk)
+        view_buffer.flush()
+        # Already viewed, not unique
+        view_buffer.record(self.projects["viewed"].pk, self.user.pk)
+        view_buffer.flush()
+
+        self.assertEqual(self.ranking(), ["reviewed", "starred", "viewed"])
+        self.assertEqual(
+            TrendingEvent.objects.filter(kind=TrendingEvent.Kind.VIEW).count(), 1
+        )
+
+    def test_unstar_forgets_event(self):
+        project = self.projects["starred"]
+        for _ in range(3):
+            toggle_star(project.pk, self.user.pk)
+        project.refresh_from_db()
+        one_star = project.trending_score
+        toggle_star(project.pk, self.user.pk)
+        project.refresh_from_db()
+        self.assertEqual(project.trending_score, 0)
+        self.assertFalse(TrendingEvent.objects.exists())
+        self.assertGreater(one_star, 0)
+
+    def test_deleted_review_forgets_event(self):
+        """Reviewing and deleting repeatedly doesn't inflate a score."""
+        project = self.projects["reviewed"]
+        kept = Review.objects.create(project=project, user=self.user, content="A")
+        project.refresh_from_db()
+        one_review = project.trending_score
+        for _ in range(3):
+            Review.objects.create(project=project, user=self.user, content="B").delete()
+
+        project.refresh_from_db()
+        self.assertAlmostEqual(project.trending_score, one_review)
+        event = TrendingEvent.objects.get()
+        self.assertGreaterEqual(event.created_at, kept.created_at)
+
+        kept.delete()
+        project.refresh_from_db()
+        self.assertEqual(project.trending_score, 0)
+        self.assertFalse(TrendingEvent.objects.exists())
+
+    def test_recompute_decays_and_prunes(self):
+        """Older activity weighs less and leaves the window entirely."""
+        now = timezone.now()
+        for title, age, count in (
+            ("starred", timedelta(hours=1), 1),
+            ("reviewed", timedelta(days=2), 3),
+            ("viewed", timedelta(days=30), 10),
+        ):
+            TrendingEvent.objects.bulk_create(
+                TrendingEvent(
+                    project=self.projects[title],
+                    kind=TrendingEvent.Kind.STAR,
+                    created_at=now - age,
+                )
+                for _ in range(count)
+            )
+
+        call_command("trending", stdout=StringIO())
+        # 3 stars two half-lives ago are worth less than 1 star now
+        self.assertEqual(self.ranking(), ["starred", "reviewed"])
+        self.assertEqual(TrendingEvent.objects.count(), 4)
+
+        # Live events are weighed against the new epoch
+        toggle_star(self.projects["quiet"].pk, self.user.pk)
+        starred, quiet = Project.objects.filter(
+            title__in=["starred", "quiet"]
+        ).order_by("title")[::-1]
+        self.assertAlmostEqual(starred.trending_score / quiet.trending_score, 0.97, 1)
+
+    def test_recompute_matches_incremental(self):
+        toggle_star(self.projects["starred"].pk, self.user.pk)
+        Review.objects.create(
+            project=self.projects["reviewed"], user=self.user, content="Nice"
+        )
+        before = dict(Project.objects.values_list("title", "trending_score"))
+        trending.recompute()
+        after = dict(Project.objects.values_list("title", "trending_score"))
+        # Same epoch and events to the hour, scores agree within 2%
+        for title in ("starred", "reviewed"):
+            self.assertAlmostEqual(after[title] / before[title], 1, delta=0.02)
+        self.assertEqual(after["quiet"], 0)
+
+    def test_private_and_page_queries(self):
+        """The page is one indexed query, private projects never show."""
+        for project in self.projects.values():
+            toggle_star(project.pk, self.user.pk)
+        quiet = self.projects["quiet"]
+        quiet.is_public = False
+        quiet.save()
+
+        with self.assertNumQueries(1):
+            self.assertNotIn("quiet", self.ranking())
+
+    @override_settings(VIEW_COUNTING="approximate")
+    def test_sketched_views(self):
+        view_buffer.record(self.projects["viewed"].pk, self.user.pk)
+        view_buffer.flush()
+        event = TrendingEvent.objects.get()
+        self.assertEqual(
+            (event.project, event.user, event.kind),
+            (self.projects["viewed"], None, TrendingEvent.Kind.VIEW),
+        )
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        # Detail visits queue views, write them to the test database
+        self.addCleanup(view_buffer.flush)
+        self.owner = User.objects.create(username="owner")
+        self.reader = User.objects.create(username="reader")
+        self.project = Project.objects.create(owner=self.owner, title="P")
+        self.client.force_login(self.reader)
+
+    def assertChanged(self, url, etag, changed=True):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200 if changed else 304)
+        return response["ETag"]
+
+    def test_feed(self):
+        """The feed is only rendered again once a project or user changes."""
+        url = reverse("projects:index")
+        response = self.client.get(url)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        etag = response["ETag"]
+
+        # Session, user and stamps, no page query
+        with self.assertNumQueries(3):
+            etag = self.assertChanged(url, etag, changed=False)
+        toggle_star(self.project.pk, self.owner.pk)
+        etag = self.assertChanged(url, etag)
+        self.owner.first_name = "Owner"
+        self.owner.save()
+        self.assertChanged(url, etag)
+
+    def test_visibility_changes(self):
+        """Hiding a project changes the feed and the pages listing it."""
+        other = Project.objects.create(owner=self.reader, title="Other")
+        SimilarProject.objects.create(project=other, similar=self.project, score=1)
+        urls = [reverse("projects:index"), reverse("projects:detail", args=[other.pk])]
+        etags = [self.client.get(url)["ETag"] for url in urls]
+
+        self.client.force_login(self.owner)
+        response = self.client.put(
+            reverse("projects:visibility", args=[self.project.pk]),
+            data='{"visibility": "private"}',
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_login(self.reader)
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotContains(response, "owner/P")
+        self.assertEqual(response.context["similar_projects"], [])
+
+    def test_detail(self):
+        url = reverse("projects:detail", args=[self.project.pk])
+        response = self.client.get(url)
+        etag, modified = response["ETag"], response["Last-Modified"]
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified).status_code, 304
+        )
+
+        etag = self.assertChanged(url, etag, changed=False)
+        Review.objects.create(user=self.reader, project=self.project, content="Hi")
+        etag = self.assertChanged(url, etag)
+        sync_technologies(self.project, "Django")
+        etag = self.assertChanged(url, etag)
+        self.project.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_user_specific(self):
+        """Another user or a pending message never gets someone else's page."""
+        url = reverse("projects:index")
+        etag = self.client.get(url)["ETag"]
+        self.client.force_login(self.owner)
+        self.assertChanged(url, etag)
+
+        # Logging out leaves a message for the next page
+        self.client.get(reverse("accounts:logout"))
+        self.assertFalse(self.client.get(url).has_header("ETag"))
+        self.assertTrue(self.client.get(url).has_header("ETag"))
+
+    def test_counters_bump_updated_at(self):
+        """Stars are on the feed, views and follows are not."""
+        before = timezone.now() - timedelta(days=1)
+        Project.objects.filter(pk=self.project.pk).update(updated_at=before)
+        User.objects.update(updated_at=before)
+        url = reverse("projects:index")
+        etag = self.client.get(url)["ETag"]
+
+        self.project.viewers.add(self.reader)
+        self.owner.followers.add(self.reader)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.updated_at, before)
+        self.assertFalse(User.objects.exclude(updated_at=before).exists())
+        etag = self.assertChanged(url, etag, changed=False)
+
+        self.project.stars.add(self.reader)
+        self.project.refresh_from_db()
+        self.assertGreater(self.project.updated_at, before)
+        self.assertChanged(url, etag)
+
+    def test_detail_people(self):
+        """Views, reviewers and the visitor's own profile change the page."""
+        url = reverse("projects:detail", args=[self.project.pk])
+        reviewer = User.objects.create(username="reviewer")
+        Review.objects.create(user=reviewer, project=self.project, content="Hi")
+        etag = self.client.get(url)["ETag"]
+
+        self.project.viewers.add(self.owner)
+        etag = self.assertChanged(url, etag)
+        reviewer.first_name = "Reviewer"
+        reviewer.save()
+        etag = self.assertChanged(url, etag)
+        self.reader.first_name = "Reader"
+        self.reader.save()
+        self.assertChanged(url, etag)
+
+
+class FragmentCacheTestCase(TestCase):
+    def setUp(self):
+        # Detail visits queue views, write them to the test database
+        self.addCleanup(view_buffer.flush)
+        self.owner = User.objects.create(username="owner")
+        self.fan = User.objects.create(username="fan")
+        self.reader = User.objects.create(username="reader")
+        self.project = Project.objects.create(
+            owner=self.owner, title="Cached", description="First version"
+        )
+        sync_technologies(self.project, "Django")
+        self.project.refresh_from_db()
+        self.url = reverse("projects:detail", args=[self.project.pk])
+
+    def detail(self, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, [query["sql"] for query in queries]
+
+    def test_static_sections_cached(self):
+        """Later viewers skip the technology query, stars stay per viewer."""
+        toggle_star(self.project.pk, self.fan.pk)
+        response, queries = self.detail(self.fan)
+        self.assertTrue(any("projects_technology" in sql for sql in queries))
+        self.assertContains(response, "bi-star-fill")
+
+        response, queries = self.detail(self.reader)
+        self.assertFalse(any("projects_technology" in sql for sql in queries))
+        self.assertContains(response, "Django")
+        self.assertNotContains(response, "bi-star-fill")
+
+    def test_edits_invalidate(self):
+        self.detail(self.reader)
+        self.project.description = "Second version"
+        self.project.save()
+        self.assertContains(self.detail(self.reader)[0], "Second version")
+
+        sync_technologies(self.project, "Django, React")
+        self.assertContains(self.detail(self.reader)[0], "React")
+
+        # Stars bump updated_at for 304s but keep the cached fragments
+        edited_at = Project.objects.get(pk=self.project.pk).edited_at
+        toggle_star(self.project.pk, self.fan.pk)
+        self.assertEqual(Project.objects.get(pk=self.project.pk).edited_at, edited_at)
+
+    def test_feed_cards(self):
+        self.client.force_login(self.reader)
+        self.client.get(reverse("projects:index"))
+        Project.objects.filter(pk=self.project.pk).update(
+            title="Renamed quietly", overview="Quiet overview"
+        )
+        # Not edited through the model, the cached card is still served
+        response = self.client.get(reverse("projects:index"))
+        self.assertContains(response, "owner/Cached")
+        self.assertNotContains(response, "Quiet overview")
+
+        self.project.title = "Renamed"
+        self.project.save()
+        self.assertContains(self.client.get(reverse("projects:index")), "owner/Renamed")
+
+    def test_file_based_backend(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        backend = "django.core.cache.backends.filebased.FileBasedCache"
+        with override_settings(
+            CACHES={
+                "default": {"BACKEND": backend, "LOCATION": directory},
+                "fragments": {"BACKEND": backend, "LOCATION": directory},
+            }
+        ):
+            self.detail(self.fan)
+            response, queries = self.detail(self.reader)
+        self.assertFalse(any("projects_technology" in sql for sql in queries))
+        self.assertContains(response, "First version")
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_STICKY_SECONDS=30)
+class ReplicaRouterTestCase(TransactionTestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username="owner")
+        self.reader = User.objects.create(username="reader")
+        self.project = Project.objects.create(owner=self.owner, title="Before")
+        self.client.force_login(self.reader)
+
+        # The replica is a second SQLite file copied from the primary
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        name = os.path.join(directory, "replica.sqlite3")
+        primary = connections["default"]
+        primary.ensure_connection()
+        with sqlite3.connect(name) as copy:
+            primary.connection.backup(copy)
+        copy.close()
+        replica = primary.__class__(
+            {**primary.settings_dict, "NAME": name}, alias="replica"
+        )
+        connections["replica"] = replica
+        self.addCleanup(connections.__delitem__, "replica")
+        self.addCleanup(replica.close)
+
+        # Changed on the primary only, the replica lags behind
+        self.project.title = "After"
+        self.project.save()
+
+    def feed(self):
+        return self.client.get(reverse("projects:index"))
+
+    def test_reads_from_replica(self):
+        self.assertContains(self.feed(), "owner/Before")
+        self.assertNotIn(StickyPrimaryMiddleware.cookie_name, self.client.cookies)
+        # Outside requests everything goes to the primary
+        self.assertEqual(Project.objects.get().title, "After")
+
+    def test_sticky_after_write(self):
+        """A user who writes reads their own changes for a while."""
+        response = self.client.post(reverse("projects:stars", args=[self.project.pk]))
+        self.assertTrue(json.loads(response.content)["starred"])
+        cookie = response.cookies[StickyPrimaryMiddleware.cookie_name]
+        self.assertEqual(cookie["max-age"], 30)
+
+        response = self.feed()
+        self.assertContains(response, "owner/After")
+        self.assertContains(response, "bi-star-fill")
+
+        # Once the cookie expired, reads go back to the replica
+        del self.client.cookies[StickyPrimaryMiddleware.cookie_name]
+        self.assertContains(self.feed(), "owner/Before")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertContains(self.feed(), "owner/After")
+
+    async def test_async_requests(self):
+        """Async views are served in the loop and routed the same way."""
+
+        async def get_response(request):
+            project = await Project.objects.aget()
+            if request.method == "POST":
+                await project.asave(update_fields=["title"])
+            return HttpResponse(project.title)
+
+        middleware = StickyPrimaryMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(AsyncRequestFactory().get("/"))
+        self.assertEqual(response.content, b"Before")
+        self.assertNotIn(StickyPrimaryMiddleware.cookie_name, response.cookies)
+
+        response = await middleware(AsyncRequestFactory().post("/"))
+        self.assertEqual(response.content, b"After")
+        self.assertIn(StickyPrimaryMiddleware.cookie_name, response.cookies)
+
+    def test_transactions_read_primary(self):
+        token = request_state.set(RequestState("replica"))
+        self.addCleanup(request_state.reset, token)
+        self.assertEqual(Project.objects.get().title, "Before")
+        with transaction.atomic():
+            self.assertEqual(Project.objects.get().title, "After")
+
+    def test_unsafe_methods_read_primary(self):
+        response = self.client.post(reverse("projects:stars", args=[self.project.pk]))
+        self.assertTrue(json.loads(response.content)["starred"])
+        # The star is read from the primary, a second post removes it
+        self.client.cookies.clear()
+        self.client.force_login(self.reader)
+        response = self.client.post(reverse("projects:stars", args=[self.project.pk]))
+        self.assertFalse(json.loads(response.content)["starred"])
+
+    @override_settings(VIEW_COUNTING="both", VIEW_BUFFER_SIZE=1)
+    def test_flush_reads_primary(self):
+        """A request reading the lagging replica flushes against the primary."""
+        self.addCleanup(view_buffer.flush)
+        view_buffer.record(self.project.pk, self.reader.pk)
+
+        # The same view again, flushed by a request using the replica
+        with self.assertNoLogs("projects.tracking", "ERROR"):
+            self.client.get(reverse("projects:detail", args=[self.project.pk]))
+
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.viewer_count, 1)
+        self.assertEqual(self.project.viewers.count(), 1)
+        self.assertEqual(
+            TrendingEvent.objects.filter(kind=TrendingEvent.Kind.VIEW).count(), 1
+        )
+        self.assertEqual(unique_viewers(self.project.pk), 1)
@@ -0,0 +1,144 @@
+from django.conf import settings
+
+from .models import Project, TimelineEntry
+from .pagination import CursorPage, CursorPaginator, InvalidCursor
+
+
+def is_fanned_out(owner):
+    """
+    Tell whether projects of ``owner`` are pushed to followers on write.
+
+    :param owner: The project owner.
+    :return: False for high-follower accounts that are read at query time.
+    """
+    return owner.follower_count <= settings.TIMELINE_FANOUT_LIMIT
+
+
+def fan_out(project, batch_size=1000):
+    """
+    Push a public project into the timeline of each of its owner's followers.
+
+    :param project: The project to distribute.
+    :param batch_size (int): Number of timeline rows inserted per statement.
+    """
+    if not project.is_public or not is_fanned_out(project.owner):
+        return
+
+    followers = project.owner.followers.values_list("pk", flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=pk, project=project, timestamp=project.timestamp)
+            for pk in followers.iterator()
+        ),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
+
+def retract(project):
+    """
+    Remove a project from every timeline, e.g. when it becomes private.
+
+    :param project: The project to withdraw.
+    """
+    TimelineEntry.objects.filter(project=project).delete()
+
+
+def subscribe(owner, follower_ids):
+    """
+    Copy the most recent public projects of ``owner`` into new followers'
+    timelines.
+
+    :param owner: The user being followed.
+    :param follower_ids (iterable): Primary keys of the new followers.
+    """
+    if not is_fanned_out(owner):
+        return
+
+    recent = list(
+        Project.objects.public()
+        .filter(owner=owner)
+        .values_list("pk", "timestamp")[: settings.TIMELINE_BACKFILL]
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, project_id=pk, timestamp=timestamp)
+            for user_id in follower_ids
+            for pk, timestamp in recent
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def unsubscribe(owner, follower_ids):
+    """
+    Drop projects of ``owner`` from the timelines of former followers.
+
+    :param owner: The user being unfollowed.
+    :param follower_ids (iterable): Primary keys of the former followers.
+    """
+    TimelineEntry.objects.filter(user__in=follower_ids, project__owner=owner).delete()
+
+
+def timeline_page(user, cursor=None, per_page=10):
+    """
+    Return one page of projects from the people ``user`` follows.
+
+    Fanned-out projects come from one range scan over the user's timeline rows.
+    Projects of high-follower accounts are read from their owners directly
+    with the same cursor and merged in.
+
+    :param user: The authenticated user reading their timeline.
+    :param cursor (string): Opaque token from a previous page.
+    :param per_page (int): Maximum number of projects on the page.
+    :return: CursorPage of projects with owner and star state loaded.
+    """
+    feed = CursorPaginator(Project.objects.all(), per_page)
+    try:
+        backwards = feed.decode(cursor)[1] if cursor else False
+    except InvalidCursor:
+        cursor, backwards = None, False
+
+    entries = TimelineEntry.objects.filter(user=user).only("timestamp", "project")
+    ordering = ("-timestamp", "-project_id")
+    pages = [CursorPaginator(entries, per_page, ordering=ordering).page(cursor)]
+    heavy = user.following.filter(
+        follower_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list("pk", flat=True)
+    if heavy_ids := list(heavy):
+        projects = Project.objects.public().filter(owner__in=heavy_ids)
+        pages.append(CursorPaginator(projects, per_page).page(cursor))
+
+    # Merge the sources on (timestamp, project id), newest first
+    keys = sorted(
+        {
+            (row.timestamp, getattr(row, "project_id", row.pk))
+            for page in pages
+            for row in page
+        },
+        reverse=True,
+    )
+    if backwards:
+        more = len(keys) > per_page or any(page.has_previous() for page in pages)
+        keys = keys[-per_page:]
+    else:
+        more = len(keys) > per_page or any(page.has_next() for page in pages)
+        keys = keys[:per_page]
+
+    # Load the page's projects in one query and restore the merged order
+    ids = [pk for _, pk in keys]
+    loaded = Project.objects.select_related("owner").with_star_state(user)
+    loaded = loaded.in_bulk(ids)
+    projects = [loaded[pk] for pk in ids if pk in loaded]
+    if not projects:
+        return CursorPage([])
+
+    has_next = more if not backwards else True
+    has_previous = more if backwards else cursor is not None
+    return CursorPage(
+        projects,
+        next_cursor=feed.encode(projects[-1]) if has_next else None,
+        previous_cursor=feed.encode(projects[0], backwards=True)
+        if has_previous
+        else None,
+    )
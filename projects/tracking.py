@@ -0,0 +1,325 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import User
+from hub.routers import primary
+
+from . import trending
+from .hll import HyperLogLog
+from .models import Project, TrendingEvent, ViewSketch
+from .signals import viewer_counter
+
+logger = logging.getLogger(__name__)
+
+
+def record_views(pairs):
+    """
+    Store a batch of (project, user) views according to ``VIEW_COUNTING``.
+
+    :param pairs (iterable): (project id, user id) tuples to record.
+    :return: Number of views that were new, estimated for sketches only.
+    """
+    pairs = set(pairs)
+    new = 0
+    if settings.VIEW_COUNTING in ("exact", "both"):
+        new = record_exact_views(pairs)
+    if settings.VIEW_COUNTING in ("approximate", "both"):
+        added = record_sketched_views(pairs)
+        if settings.VIEW_COUNTING == "approximate":
+            new = added
+    return new
+
+
+def record_exact_views(pairs):
+    """
+    Store unique (project, user) views in bulk, bump viewer counters and
+    count them towards trending scores.
+
+    :param pairs (set): (project id, user id) tuples to record.
+    :return: Number of views that were new.
+    """
+    through = Project.viewers.through
+    project_ids = {project_id for project_id, _ in pairs}
+    user_ids = {user_id for _, user_id in pairs}
+
+    # Skip views already stored and rows deleted since they were buffered
+    seen = set(
+        through.objects.filter(
+            project_id__in=project_ids, user_id__in=user_ids
+        ).values_list("project_id", "user_id")
+    )
+    projects = set(
+        Project.objects.filter(pk__in=project_ids).values_list("pk", flat=True)
+    )
+    users = set(User.objects.filter(pk__in=user_ids).values_list("pk", flat=True))
+    new = [
+        (project_id, user_id)
+        for project_id, user_id in pairs
+        if (project_id, user_id) not in seen
+        and project_id in projects
+        and user_id in users
+    ]
+    if not new:
+        return 0
+
+    with transaction.atomic():
+        through.objects.bulk_create(
+            [through(project_id=pid, user_id=uid) for pid, uid in new],
+            ignore_conflicts=True,
+        )
+        viewer_counter.increment(new)
+        trending.record(TrendingEvent.Kind.VIEW, new)
+    return len(new)
+
+
+def stored_viewers(project_ids):
+    """
+    Read the exact viewers stored for some projects.
+
+    :param project_ids (iterable): Primary keys of the projects.
+    :return: Dictionary of project id to the set of its viewers' ids.
+    """
+    viewers = defaultdict(set)
+    for project_id, user_id in Project.viewers.through.objects.filter(
+        project_id__in=project_ids
+    ).values_list("project_id", "user_id"):
+        viewers[project_id].add(user_id)
+    return viewers
+
+
+def fold_viewers(project_ids):
+    """
+    Fold the exact viewers of projects into their all-time sketches, e.g.
+    before the viewer rows are deleted. Adding a viewer twice changes
+    nothing, so this can run any number of times.
+
+    :param project_ids (iterable): Primary keys of the projects.
+    :return: Number of sketches written.
+    """
+    viewers = stored_viewers(project_ids)
+    with transaction.atomic():
+        existing = {
+            sketch.project_id: sketch
+            for sketch in ViewSketch.objects.select_for_update().filter(
+                project_id__in=viewers, day__isnull=True
+            )
+        }
+        created, changed = [], []
+        for project_id, user_ids in viewers.items():
+            row = existing.get(project_id)
+            if row is None:
+                row = ViewSketch(project_id=project_id, day=None)
+                created.append(row)
+            else:
+                changed.append(row)
+            sketch = HyperLogLog.from_bytes(row.sketch)
+            sketch.update(user_ids)
+            row.sketch = sketch.to_bytes()
+        ViewSketch.objects.bulk_create(created)
+        ViewSketch.objects.bulk_update(changed, ["sketch"])
+    return len(viewers)
+
+
+def record_sketched_views(pairs):
+    """
+    Fold views into each project's all-time and daily HyperLogLog sketches.
+
+    A new all-time sketch starts from the project's exact viewer rows, so
+    switching to approximate mode keeps the viewers counted until then. In
+    approximate mode the all-time estimate also becomes the project's
+    ``viewer_count`` and the views, unique within the batch only, count
+    towards trending scores.
+
+    :param pairs (set): (project id, user id) tuples to record.
+    :return: Increase of the summed all-time estimates.
+    """
+    viewers = defaultdict(set)
+    for project_id, user_id in pairs:
+        viewers[project_id].add(user_id)
+    today = timezone.now().date()
+
+    with transaction.atomic():
+        existing = {
+            (sketch.project_id, sketch.day): sketch
+            for sketch in ViewSketch.objects.select_for_update().filter(
+                Q(day=today) | Q(day__isnull=True), project_id__in=viewers
+            )
+        }
+        live = Project.objects.filter(pk__in=viewers).values_list("pk", flat=True)
+        # New all-time sketches start from the viewers stored until now
+        seeds = stored_viewers([pk for pk in viewers if (pk, None) not in existing])
+
+        created, changed, counts, added = [], [], {}, 0
+        for project_id in live:
+            for day in (None, today):
+                row = existing.get((project_id, day))
+                if row is None:
+                    row = ViewSketch(project_id=project_id, day=day)
+                    created.append(row)
+                else:
+                    changed.append(row)
+                sketch = HyperLogLog.from_bytes(row.sketch)
+                if day is None and project_id in seeds:
+                    sketch.update(seeds[project_id])
+                before = sketch.count()
+                sketch.update(viewers[project_id])
+                row.sketch = sketch.to_bytes()
+                if day is None:
+                    counts[project_id] = sketch.count()
+                    added += counts[project_id] - before
+
+        ViewSketch.objects.bulk_create(created)
+        ViewSketch.objects.bulk_update(changed, ["sketch"])
+        if settings.VIEW_COUNTING == "approximate":
+            # Like viewer_counter, views leave updated_at alone
+            Project.objects.bulk_update(
+                [Project(pk=pk, viewer_count=count) for pk, count in counts.items()],
+                ["viewer_count"],
+            )
+            # Viewers may be deleted since buffered, events don't keep them
+            trending.record(
+                TrendingEvent.Kind.VIEW,
+                [(pk, None) for pk in counts for _ in viewers[pk]],
+            )
+    return added
+
+
+def unique_viewers(project_id, days=7):
+    """
+    Estimate distinct viewers of a project over the last ``days`` days by
+    merging its daily sketches.
+
+    :param project_id (int): Primary key of the project.
+    :param days (int): Length of the window, today included.
+    :return: Estimated number of distinct viewers.
+    """
+    since = timezone.now().date() - timedelta(days=days - 1)
+    merged = HyperLogLog()
+    for data in ViewSketch.objects.filter(
+        project_id=project_id, day__gte=since
+    ).values_list("sketch", flat=True):
+        merged.merge(HyperLogLog.from_bytes(data))
+    return merged.count()
+
+
+class ViewBuffer:
+    """
+    Collect unique project views in memory and write them in batches.
+
+    A flush happens once ``VIEW_BUFFER_SIZE`` distinct views are pending,
+    every ``VIEW_BUFFER_INTERVAL`` seconds, and when the process exits. Once
+    ``start`` was called a background thread flushes, so an idle process
+    still writes its views and no request pays for a batch. Otherwise, e.g.
+    in commands, the view completing a batch or recorded after the interval
+    flushes it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._last_flush = time.monotonic()
+        self._wake = threading.Event()
+        self._background = False
+        self._stopping = False
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def start(self):
+        """
+        Flush from a daemon thread from now on, called by the WSGI and ASGI
+        entry points. A process forked afterwards starts its own thread on
+        its first view.
+        """
+        with self._lock:
+            self._background = True
+            self._stopping = False
+            self._ensure_thread()
+
+    def stop(self):
+        """
+        Stop the background thread, flushing the views still pending.
+        """
+        with self._lock:
+            self._background = False
+            self._stopping = True
+            thread = self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def record(self, project_id, user_id):
+        """
+        Queue a view of ``project_id`` by ``user_id``.
+
+        :param project_id (int): Primary key of the viewed project.
+        :param user_id (int): Primary key of the viewer.
+        """
+        with self._lock:
+            self._pending.add((project_id, user_id))
+            full = len(self._pending) >= settings.VIEW_BUFFER_SIZE
+            background = self._background
+            if background:
+                self._ensure_thread()
+            late = time.monotonic() - self._last_flush >= settings.VIEW_BUFFER_INTERVAL
+        if background:
+            # The thread writes the batch, not this request
+            if full:
+                self._wake.set()
+        elif full or late:
+            self.flush()
+
+    def _ensure_thread(self):
+        # Threads don't survive a fork, a preloading server forks after start
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="view-buffer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(settings.VIEW_BUFFER_INTERVAL)
+            self._wake.clear()
+            if self._stopping:
+                return
+            # Like a request, don't keep a connection past its lifetime
+            close_old_connections()
+            self.flush()
+            close_old_connections()
+
+    def flush(self):
+        """
+        Write every pending view to the database.
+
+        :return: Number of views that were new.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            # Existing views and sketches must be read where they are written
+            with primary():
+                return record_views(pending)
+        except Exception:
+            # Losing a batch of view counts must never break a request
+            logger.exception("Failed to record %d project views", len(pending))
+            return 0
+
+
+view_buffer = ViewBuffer()
+atexit.register(view_buffer.flush)
@@ -0,0 +1,159 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import Project, TrendingEpoch, TrendingEvent
+
+# Weight of each kind of event at the moment it happens
+WEIGHTS = {
+    TrendingEvent.Kind.STAR: 3,
+    TrendingEvent.Kind.VIEW: 1,
+    TrendingEvent.Kind.REVIEW: 5,
+}
+
+
+def window():
+    return timedelta(days=settings.TRENDING_WINDOW_DAYS)
+
+
+def epoch():
+    """
+    Return the time the stored scores are relative to.
+
+    :return: Datetime set by the last ``recompute``, the start of the current
+        window before the first one.
+    """
+    row, _ = TrendingEpoch.objects.get_or_create(
+        pk=1, defaults={"started_at": timezone.now() - window()}
+    )
+    return row.started_at
+
+
+def weight(kind, at, since):
+    """
+    Value of an event happening at ``at`` in scores relative to ``since``.
+
+    Every score loses half its value each half-life, the same factor for all
+    projects, so rather than decaying stored scores an event is worth more
+    the later it happens. Ordering by the stored sums always equals ordering
+    by the decayed scores, and a new event is a plain addition.
+
+    :param kind: TrendingEvent.Kind of the event.
+    :param at (datetime): Time of the event.
+    :param since (datetime): Epoch of the scores.
+    :return: Weight of the event.
+    """
+    hours = (at - since).total_seconds() / 3600
+    return WEIGHTS[kind] * 2 ** (hours / settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def record(kind, pairs):
+    """
+    Log events and add their weight to the projects' scores.
+
+    :param kind: TrendingEvent.Kind of every event.
+    :param pairs (iterable): (project id, user id) tuples of existing rows.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return
+
+    now = timezone.now()
+    value = weight(kind, now, epoch())
+    projects = defaultdict(list)
+    for project_id, count in Counter(project_id for project_id, _ in pairs).items():
+        projects[count].append(project_id)
+
+    with transaction.atomic():
+        TrendingEvent.objects.bulk_create(
+            TrendingEvent(
+                project_id=project_id, user_id=user_id, kind=kind, created_at=now
+            )
+            for project_id, user_id in pairs
+        )
+        # One UPDATE per distinct number of events, usually just one
+        for count, project_ids in projects.items():
+            Project.objects.filter(pk__in=project_ids).update(
+                trending_score=F("trending_score") + value * count
+            )
+
+
+def forget(kind, project_id, user_id, after=None):
+    """
+    Drop a user's events of one kind on a project, e.g. when unstarring or
+    deleting a review, so repeating them can't inflate a score.
+
+    :param kind: TrendingEvent.Kind of the events.
+    :param project_id (int): Primary key of the project.
+    :param user_id (int): Primary key of the user.
+    :param after (datetime): Only drop the first event recorded at or after
+        this time, the one of a given review among the user's others.
+    """
+    events = TrendingEvent.objects.filter(
+        project_id=project_id, user_id=user_id, kind=kind
+    )
+    if after is not None:
+        first = (
+            events.filter(created_at__gte=after)
+            .order_by("created_at", "pk")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        events = events.filter(pk=first)
+    since = epoch()
+    removed = sum(
+        weight(kind, at, since) for at in events.values_list("created_at", flat=True)
+    )
+    if removed:
+        events.delete()
+        # Rounding may leave a tiny positive rest, which would keep the
+        # project on the trending page
+        Project.objects.filter(pk=project_id).update(
+            trending_score=Case(
+                When(trending_score__lt=removed * (1 + 1e-9), then=Value(0.0)),
+                default=F("trending_score") - removed,
+            )
+        )
+
+
+def recompute(batch_size=1000):
+    """
+    Rebuild every score from the events of the current window.
+
+    Older events are deleted and the epoch moves to the start of the window,
+    which keeps the weights small. Events are summed per project, kind and
+    hour in the database, each hour weighted at its middle.
+
+    :param batch_size (int): Projects written per UPDATE.
+    :return: Number of projects with a score.
+    """
+    now = timezone.now()
+    since = now - window()
+    TrendingEvent.objects.filter(created_at__lt=since).delete()
+
+    hours = (
+        TrendingEvent.objects.filter(created_at__gte=since)
+        .annotate(hour=TruncHour("created_at"))
+        .values_list("project_id", "kind", "hour")
+        .annotate(events=Count("*"))
+        .order_by()
+    )
+    scores = defaultdict(float)
+    for project_id, kind, hour, events in hours:
+        middle = min(hour + timedelta(minutes=30), now)
+        scores[project_id] += events * weight(kind, middle, since)
+
+    with transaction.atomic():
+        TrendingEpoch.objects.update_or_create(pk=1, defaults={"started_at": since})
+        Project.objects.filter(trending_score__gt=0).update(trending_score=0)
+        Project.objects.bulk_update(
+            [Project(pk=pk, trending_score=score) for pk, score in scores.items()],
+            ["trending_score"],
+            batch_size=batch_size,
+        )
+    return len(scores)
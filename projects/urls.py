@@ -1,17 +1,27 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 app_name = "projects"
 
+# Frequent JSON endpoints have async versions for ASGI deployments
+api = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
     path("", views.index, name="index"),
+    path("search/", views.search_view, name="search"),
+    path("trending/", views.trending, name="trending"),
+    path("timeline/", views.timeline_view, name="timeline"),
+    path("technologies/", views.technologies, name="technologies"),
     # API Routes
     path("project/create/", views.create, name="create"),
     path("project/<int:pk>/update/", views.update, name="update"),
     path("project/<int:pk>/delete/", views.delete, name="delete"),
     path("project/<int:pk>/detail/", views.detail, name="detail"),
-    path("project/<int:pk>/stars/", views.stars, name="stars"),
-    path("project/<int:pk>/reviews/", views.reviews, name="reviews"),
-    path("project/<int:pk>/visibility/", views.visibility, name="visibility"),
+    path("technologies/top/", views.top_technologies, name="top_technologies"),
+    path("project/stars/", views.star_status, name="star_status"),
+    path("project/<int:pk>/stars/", api.stars, name="stars"),
+    path("project/<int:pk>/reviews/", api.reviews, name="reviews"),
+    path("project/<int:pk>/visibility/", api.visibility, name="visibility"),
 ]
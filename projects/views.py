@@ -1,18 +1,44 @@
 import json
+from urllib.parse import urlencode
+from django.conf import settings
 from django.shortcuts import get_object_or_404, render
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
-from django.core.paginator import Paginator
+from django.db.models import Max, Subquery
 
+from accounts.models import User
+from accounts.suggestions import suggestions_for
+from hub import uploads
+from hub.conditional import versioned
+from hub.instrumentation import query_budget
 
+from . import search, similar, tasks, timeline
 from .forms import ProjectForm
 
-from .models import Project, Technology, Review
+from .models import Project, Review
+from .pagination import CursorPage, CursorPaginator
+from .stars import star_states, toggle_star
+from .tags import find_technologies, normalize, popular, sync_technologies
+from .tracking import unique_viewers, view_buffer
+
+
+def feed_versions(request):
+    # Any public project or user may be on the page, both latest changes are
+    # read from the end of an index in one query
+    latest_user = User.objects.order_by("-updated_at").values("updated_at")[:1]
+    return (
+        Project.objects.public()
+        .order_by("-updated_at")
+        .values_list("updated_at", Subquery(latest_user))
+        .first()
+    )
 
 
+@query_budget(5)
+@versioned(feed_versions)
 def index(request):
     """
     Display public projects in the main feed.
@@ -20,17 +46,144 @@ def index(request):
     :param request: The HTTP request object.
     :return: Rendered index template with public projects.
     """
-    projects = Project.objects.filter(is_public=True)
-    if request.user.is_authenticated:
-        projects = projects.exclude(owner=request.user)
-
-    # Pagination
-    page_number = request.GET.get("page")
-    paginator = Paginator(projects, 10)  # Show 10 projects per page.
-    page_obj = paginator.get_page(page_number)
+    projects = Project.objects.feed(request.user)
+
+    # Keyset pagination on (timestamp, id), no COUNT or OFFSET
+    paginator = CursorPaginator(projects, 10)  # Show 10 projects per page.
+    page_obj = paginator.get_page(request.GET.get("cursor"))
     return render(request, "projects/index.html", {"page_obj": page_obj})
 
 
+@query_budget(4)
+def trending(request):
+    """
+    Display public projects by their precomputed trending score.
+
+    :param request: The HTTP request object.
+    :return: Rendered trending template with a page of projects.
+    """
+    # Scores are kept by projects.trending, the page is an index range scan
+    projects = (
+        Project.objects.public()
+        .filter(trending_score__gt=0)
+        .select_related("owner")
+        .with_star_state(request.user)
+    )
+    paginator = CursorPaginator(projects, 10, ordering=("-trending_score", "-id"))
+    page_obj = paginator.get_page(request.GET.get("cursor"))
+    return render(request, "projects/trending.html", {"page_obj": page_obj})
+
+
+def search_view(request):
+    """
+    Display projects matching a full-text query, best matches first.
+
+    :param request: The HTTP request object with ``q`` and ``page``.
+    :return: Rendered search template with a page of visible projects.
+    """
+    query = request.GET.get("q", "").strip()
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+
+    projects, has_next = search.search(query, request.user, page)
+    return render(
+        request,
+        "projects/search.html",
+        {
+            "query": query,
+            "projects": projects,
+            "page": page,
+            "has_next": has_next,
+        },
+    )
+
+
+def technologies(request):
+    """
+    Display public projects tagged with every selected technology.
+
+    :param request: The HTTP request object with up to 5 ``name`` and ``cursor``.
+    :return: Rendered technologies template with a page of matching projects,
+        or the most used technologies when none is selected.
+    """
+    names = request.GET.getlist("name")[:5]
+    if not names:
+        return render(request, "projects/technologies.html", {"popular": popular(50)})
+
+    # Unknown names can't match any project
+    selected = find_technologies(names)
+    if len(selected) < len(normalize(",".join(names))):
+        return render(
+            request,
+            "projects/technologies.html",
+            {"selected": selected, "page_obj": CursorPage([])},
+        )
+
+    # One join per technology keeps only projects having all of them
+    projects = Project.objects.public().select_related("owner")
+    for technology in selected:
+        projects = projects.filter(technologies=technology)
+    projects = projects.with_star_state(request.user)
+
+    paginator = CursorPaginator(projects, 10)
+    page_obj = paginator.get_page(request.GET.get("cursor"))
+    return render(
+        request,
+        "projects/technologies.html",
+        {
+            "selected": selected,
+            "page_obj": page_obj,
+            "pager_query": urlencode([("name", tech.name) for tech in selected]),
+        },
+    )
+
+
+def top_technologies(request):
+    """
+    List the technologies used by the most public projects.
+
+    :param request: The HTTP request object with an optional ``limit``.
+    :return: JsonResponse with technology names and public project counts.
+    :return: JsonResponse with error message on bad input or non-GET requests.
+    """
+    # Allow only GET request
+    if request.method != "GET":
+        return JsonResponse({"error": "GET request required."}, status=405)
+
+    try:
+        limit = min(max(int(request.GET.get("limit", 30)), 1), 100)
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer."}, status=400)
+
+    return JsonResponse(
+        {
+            "technologies": [
+                {"name": name, "count": count} for name, count in popular(limit)
+            ]
+        },
+        status=200,
+    )
+
+
+@login_required
+def timeline_view(request):
+    """
+    Display public projects from the users the current user follows, next to
+    who they could follow.
+
+    :param request: The HTTP request object.
+    :return: Rendered timeline template with a page of projects.
+    """
+    page_obj = timeline.timeline_page(request.user, request.GET.get("cursor"))
+    return render(
+        request,
+        "projects/timeline.html",
+        {"page_obj": page_obj, "suggestions": suggestions_for(request.user, 5)},
+    )
+
+
 @login_required
 def create(request):
     """
@@ -44,6 +197,10 @@ def create(request):
     if request.method == "POST":
         form = ProjectForm(request.POST, request.FILES)
 
+        # Files dropped while reading the request never reach the form
+        if error := uploads.upload_error(request):
+            form.add_error("image", error)
+
         # Validate form data
         if form.is_valid():
             project = form.save(commit=False)
@@ -52,14 +209,15 @@ def create(request):
             project.save()
 
             # Process technologies
-            technologies = form.cleaned_data.get("technologies", "")
-            if technologies:
-                skills = [
-                    name.strip() for name in technologies.split(",") if name.strip()
-                ]
-                for name in skills:
-                    technology, created = Technology.objects.get_or_create(name=name)
-                    project.technologies.add(technology)
+            sync_technologies(project, form.cleaned_data.get("technologies", ""))
+
+            # Render the resized preview images in the background
+            if project.image:
+                tasks.render_image.enqueue(project_id=project.pk)
+
+            # Push the project into followers' timelines in the background
+            if project.is_public:
+                tasks.fan_out.enqueue(project_id=project.pk)
 
             messages.success(
                 request, f"Project '{project.title}' have been created successfully!"
@@ -91,24 +249,29 @@ def update(request, pk):
     if request.method == "POST":
         # Initialize form with POST data, FILES and existing project instance
         form = ProjectForm(request.POST, request.FILES, instance=project)
+        if error := uploads.upload_error(request):
+            form.add_error("image", error)
 
         # Check the form data is valid
         if form.is_valid():
             # save the project data into database
             project = form.save(commit=False)
+            was_public = Project.objects.filter(pk=pk, is_public=True).exists()
             project.is_public = form.cleaned_data["is_public"] == "True"
             project.save()
 
-            # Update project's technologies
-            project.technologies.clear()
-            technologies = form.cleaned_data.get("technologies", "")
-            if technologies:
-                skills = [
-                    name.strip() for name in technologies.split(",") if name.strip()
-                ]
-                for name in skills:
-                    technology, created = Technology.objects.get_or_create(name=name)
-                    project.technologies.add(technology)
+            # Keep followers' timelines in step with the visibility
+            if project.is_public and not was_public:
+                tasks.fan_out.enqueue(project_id=project.pk)
+            elif was_public and not project.is_public:
+                timeline.retract(project)
+
+            # Update project's technologies, only the changes are written
+            sync_technologies(project, form.cleaned_data.get("technologies", ""))
+
+            # Render the preview images again when a new one was uploaded
+            if "image" in form.changed_data:
+                tasks.render_image.enqueue(project_id=project.pk)
 
             messages.success(
                 request, f"Project '{project.title}' was updated successfully!"
@@ -150,7 +313,37 @@ def delete(request, pk):
     return HttpResponse(status=204)
 
 
+def review_page(project, cursor=None, per_page=10):
+    """
+    Return one page of a project's reviews, newest first, with users joined.
+
+    :param project: The reviewed project.
+    :param cursor (string): Opaque token from a previous page.
+    :param per_page (int): Maximum number of reviews on the page.
+    :return: CursorPage of reviews.
+    """
+    reviews = Review.objects.filter(project=project).select_related("user")
+    paginator = CursorPaginator(reviews, per_page, ordering=("-created_at", "-id"))
+    return paginator.get_page(cursor)
+
+
+def detail_versions(request, pk):
+    # Views leave updated_at alone, their count is a stamp of its own. The
+    # reviewers' and the visitor's own profiles are on the page too.
+    row = (
+        Project.objects.filter(pk=pk)
+        .annotate(reviewers_updated=Max("reviews__user__updated_at"))
+        .values_list(
+            "updated_at", "owner__updated_at", "viewer_count", "reviewers_updated"
+        )
+        .first()
+    )
+    return row and (*row, request.user.updated_at)
+
+
+@query_budget(8)
 @login_required
+@versioned(detail_versions)
 def detail(request, pk):
     """
     Display the details of a specific project.
@@ -161,38 +354,78 @@ def detail(request, pk):
     :return: HttpResponse with status 403 if user can't access the project.
     :return: Rendered detail template with project data.
     """
-    # Get project object
-    project = get_object_or_404(Project, pk=pk)
+    # Get project object with its owner and the user's star state
+    project = get_object_or_404(
+        Project.objects.select_related("owner").with_star_state(request.user), pk=pk
+    )
 
     # Check project visibility.
     if not project.is_public and request.user != project.owner:
         return render(request, "projects/detail.html")
 
-    # Add unique viewer if they are not the owner
-    if request.user not in project.viewers.all() and request.user != project.owner:
-        project.viewers.add(request.user)
-
-    return render(request, "projects/detail.html", {"project": project})
+    # Record a unique viewer if they are not the owner, written in batches
+    if request.user != project.owner:
+        view_buffer.record(project.pk, request.user.pk)
+
+    # Owners see this week's unique viewers merged from daily sketches
+    weekly_viewers = None
+    if request.user == project.owner and settings.VIEW_COUNTING != "exact":
+        weekly_viewers = unique_viewers(project.pk)
+
+    return render(
+        request,
+        "projects/detail.html",
+        {
+            "project": project,
+            "reviews": review_page(project),
+            "similar_projects": similar.similar_to(project),
+            "weekly_viewers": weekly_viewers,
+        },
+    )
 
 
 @csrf_exempt
 @login_required
 def reviews(request, pk):
     """
-    Add a review to a specific project.
+    List the reviews of a specific project or add a new one.
 
-    :param request: The HTTP request object containing review content.
-    :param pk (int): Primary key of the project to review.
+    :param request: The HTTP request object, GET takes ``cursor`` and ``limit``,
+        POST carries the review content.
+    :param pk (int): Primary key of the project.
     :raises Http404: If the project doesn't exist.
-    :return: JsonResponse with success message and status 201 on successful creation.
-    :return: JsonResponse with error message on failure or non-POST requests.
+    :return: JsonResponse with a page of reviews and the next cursor on GET.
+    :return: JsonResponse with the created review and status 201 on POST.
+    :return: JsonResponse with error message on failure or other methods.
     """
-    # Allow only POST request
-    if request.method != "POST":
-        return JsonResponse({"error": "POST request is required."}, status=400)
-
     # Get the project or return a 404 error
-    project = get_object_or_404(Project, pk=pk)
+    project = get_object_or_404(
+        Project.objects.only("pk", "is_public", "owner_id"), pk=pk
+    )
+
+    if request.method == "GET":
+        # Private projects are only readable by their owner
+        if not project.is_public and request.user.pk != project.owner_id:
+            return JsonResponse({"error": "This project is private."}, status=403)
+
+        # Let the client choose the page size within bounds
+        try:
+            limit = min(max(int(request.GET.get("limit", 10)), 1), 50)
+        except ValueError:
+            return JsonResponse({"error": "limit must be an integer."}, status=400)
+
+        page_obj = review_page(project, request.GET.get("cursor"), limit)
+        return JsonResponse(
+            {
+                "reviews": [review.serializer() for review in page_obj],
+                "next": page_obj.next_cursor,
+            },
+            status=200,
+        )
+
+    # Allow only GET and POST requests
+    if request.method != "POST":
+        return JsonResponse({"error": "GET or POST request is required."}, status=400)
 
     # Load and validate the review content
     data = json.loads(request.body)
@@ -203,10 +436,13 @@ def reviews(request, pk):
         )
 
     # Create the new review
-    Review.objects.create(user=request.user, project=project, content=content)
+    review = Review.objects.create(user=request.user, project=project, content=content)
 
-    # Return a success response
-    return JsonResponse({"message": "Review added successfully."}, status=201)
+    # Return the created review so the client can render it
+    return JsonResponse(
+        {"message": "Review added successfully.", "review": review.serializer()},
+        status=201,
+    )
 
 
 @csrf_exempt
@@ -226,19 +462,34 @@ def stars(request, pk):
         return JsonResponse({"error": "POST request required."}, status=400)
 
     # Check if the project exists
-    project = get_object_or_404(Project, pk=pk)
+    project = get_object_or_404(Project.objects.only("pk"), pk=pk)
 
-    # Toggle between star and starred
-    if request.user in project.stars.all():
-        project.stars.remove(request.user)
-        return JsonResponse(
-            {"starred": False, "count": project.stars.count()}, status=200
-        )
-    else:
-        project.stars.add(request.user)
-        return JsonResponse(
-            {"starred": True, "count": project.stars.count()}, status=200
-        )
+    # Toggle between star and starred in one transaction
+    starred, count = toggle_star(project.pk, request.user.pk)
+    return JsonResponse({"starred": starred, "count": count}, status=200)
+
+
+def star_status(request):
+    """
+    Report the current user's star state and star counts for many projects.
+
+    :param request: The HTTP request object with comma separated ``ids``.
+    :return: JsonResponse mapping each visible project id to its star data.
+    :return: JsonResponse with error message on bad input or non-GET requests.
+    """
+    # Allow only GET request
+    if request.method != "GET":
+        return JsonResponse({"error": "GET request required."}, status=405)
+
+    # Parse the requested project ids
+    try:
+        ids = {int(pk) for pk in request.GET.get("ids", "").split(",") if pk}
+    except ValueError:
+        return JsonResponse({"error": "ids must be integers."}, status=400)
+    if len(ids) > 100:
+        return JsonResponse({"error": "At most 100 ids are allowed."}, status=400)
+
+    return JsonResponse({"projects": star_states(request.user, ids)}, status=200)
 
 
 @csrf_exempt
@@ -270,11 +521,18 @@ def visibility(request, pk):
     data = json.loads(request.body)
 
     # Change visibility
+    was_public = project.is_public
     project.is_public = data.get("visibility") == "public"
 
     # Save changes
     project.save()
 
+    # Keep followers' timelines in step with the visibility
+    if project.is_public and not was_public:
+        tasks.fan_out.enqueue(project_id=project.pk)
+    elif was_public and not project.is_public:
+        timeline.retract(project)
+
     return JsonResponse(
         {"message": "visibility changes successfully.", "is_public": project.is_public},
         status=200,